@@ -2,19 +2,26 @@
 API endpoints for REX
 Defines the REST API interface for interacting with the system
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Any, Optional
 import logging
 
-from models.conversation import ConversationInput, ConversationResponse
-from memory_system.memory_manager import MemoryManager
+from models.conversation import ConversationInput, ConversationResponse, BatchIngestInput, BatchItemResult
+from models.memory import MemoryCategory
+from memory_system.memory_interface import MemoryInterface
+from memory_system.transfer import MemoryImporter, check_format, export_memories
 from conversation_manager.context_manager import ContextManager
+from utils.executor import ComputeExecutor, ExecutorBusyError
 
 logger = logging.getLogger(__name__)
 
 # Create router
 router = APIRouter(prefix="/api", tags=["REX API"])
 
+# Largest page served by the memory listing
+MAX_PAGE_SIZE = 500
+
 def get_memory_manager():
     """Dependency to get memory manager instance"""
     # In a real app, this would be a singleton or dependency injection
@@ -27,22 +34,32 @@ def get_context_manager():
     from app import context_manager
     return context_manager
 
+def get_executor():
+    """Dependency to get the executor that runs blocking work off the event loop"""
+    from app import executor
+    return executor
+
 @router.post("/conversation", response_model=ConversationResponse)
 async def process_conversation(
     input_data: ConversationInput,
-    context_manager: ContextManager = Depends(get_context_manager)
+    context_manager: ContextManager = Depends(get_context_manager),
+    executor: ComputeExecutor = Depends(get_executor)
 ):
     """
     Process a conversation input and return a response with context awareness
     """
     try:
-        response = context_manager.process_conversation(
+        response = await executor.run(
+            context_manager.process_conversation,
             user_id=input_data.user_id,
             session_id=input_data.session_id,
             user_input=input_data.user_input,
             conversation_history=input_data.conversation_history
         )
         return response
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting conversation input, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Error processing conversation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -52,28 +69,62 @@ async def memory_trigger(
     user_id: str,
     trigger_phrase: str = Body(...),
     context: Optional[Dict[str, Any]] = Body({}),
-    memory_manager: MemoryManager = Depends(get_memory_manager)
+    memory_manager: MemoryInterface = Depends(get_memory_manager),
+    executor: ComputeExecutor = Depends(get_executor)
 ):
     """
     Endpoint to explicitly trigger memory recall
     """
     try:
-        recalled_memory = memory_manager.process_memory_trigger(
+        recalled_memory = await executor.run(
+            memory_manager.process_memory_trigger,
             user_id=user_id,
             trigger_phrase=trigger_phrase,
             context=context or {}
         )
         return {"recalled_memory": recalled_memory}
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting memory trigger, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Error processing memory trigger: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/memory/batch")
+async def ingest_batch(
+    input_data: BatchIngestInput,
+    context_manager: ContextManager = Depends(get_context_manager),
+    executor: ComputeExecutor = Depends(get_executor)
+):
+    """
+    Store many conversations in one request (e.g. a client's backlog after an outage)
+    
+    Items are stored at most once per idempotency key, so a failed request can be
+    retried as a whole. Returns one result per item, in order.
+    """
+    max_items = context_manager.config.get("ingestion", {}).get("max_batch_items", 1000)
+    if len(input_data.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} items per batch")
+    
+    try:
+        results = await executor.run(
+            context_manager.ingest_batch,
+            input_data.user_id,
+            [item.dict() for item in input_data.items]
+        )
+        return {"results": [BatchItemResult(**result) for result in results]}
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting batch ingestion, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+    except Exception as e:
+        logger.error(f"Error ingesting batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/memory/categories")
 async def get_memory_categories():
     """
     Get available memory categories
     """
-    from models.memory import MemoryCategory
     return {
         "categories": [category.value for category in MemoryCategory]
     }
@@ -83,35 +134,92 @@ async def get_user_memories(
     user_id: str,
     category: Optional[str] = None,
     limit: int = 10,
-    memory_manager: MemoryManager = Depends(get_memory_manager)
+    after: Optional[str] = None,
+    memory_manager: MemoryInterface = Depends(get_memory_manager),
+    executor: ComputeExecutor = Depends(get_executor)
 ):
     """
-    Get memories for a specific user
+    Get memories for a specific user, newest first
+    
+    Pass the returned next_cursor as after= to get the following page; it is
+    null on the last page.
     """
+    memory_category = None
+    if category:
+        try:
+            memory_category = MemoryCategory(category)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"Category {category} not found")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
     try:
-        if user_id not in memory_manager.memory_store:
-            return {"memories": []}
-            
-        if category:
-            if category not in memory_manager.memory_store[user_id]:
-                raise HTTPException(status_code=404, detail=f"Category {category} not found")
-                
-            memories = memory_manager.memory_store[user_id][category][:limit]
-            return {"memories": [memory.to_dict() for memory in memories]}
-        else:
-            # Return memories from all categories
-            all_memories = []
-            for cat in memory_manager.memory_store[user_id]:
-                all_memories.extend(memory_manager.memory_store[user_id][cat])
-            
-            # Sort by timestamp (newest first) and limit
-            sorted_memories = sorted(
-                all_memories, 
-                key=lambda x: x.timestamp, 
-                reverse=True
-            )[:limit]
-            
-            return {"memories": [memory.to_dict() for memory in sorted_memories]}
+        memories, next_cursor = await executor.run(
+            memory_manager.list_memories_page, user_id, category=memory_category, limit=limit, after=after
+        )
+        return {"memories": [memory.to_dict() for memory in memories], "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting memory listing, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Error retrieving memories: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/memory/{user_id}/export")
+async def export_user_memories(
+    user_id: str,
+    format: str = "ndjson",
+    memory_manager: MemoryInterface = Depends(get_memory_manager)
+):
+    """
+    Stream all of a user's memories with their embeddings as NDJSON or an Arrow IPC stream
+    """
+    try:
+        media_type = check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    # A sync iterator, so Starlette advances it in a worker thread chunk by chunk
+    return StreamingResponse(
+        export_memories(memory_manager, user_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{user_id}.{format}"'}
+    )
+
+@router.post("/memory/{user_id}/import")
+async def import_user_memories(
+    user_id: str,
+    request: Request,
+    format: str = "ndjson",
+    memory_manager: MemoryInterface = Depends(get_memory_manager),
+    executor: ComputeExecutor = Depends(get_executor)
+):
+    """
+    Import memories from a streamed export; stored embeddings are reused, not re-encoded
+    
+    Memories the user already has (by id or content) are skipped, so a failed
+    import can be retried with the same body.
+    """
+    try:
+        importer = MemoryImporter(memory_manager, user_id, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    try:
+        async for data in request.stream():
+            if data:
+                await executor.run(importer.feed, data)
+        return {"user_id": user_id, **await executor.run(importer.finish)}
+    except ExecutorBusyError as e:
+        logger.warning(f"Aborting memory import, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import data: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error importing memories: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,326 @@
+"""
+Shard router for REX
+Sharded deployment: one app process per shard on a unix socket, and a thin router
+forwarding /api calls to the shard that owns the user
+"""
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Dict, Any, List, Mapping, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import uvicorn
+
+from utils.config_loader import load_config
+from utils.sharding import SHARD_ENV, count_shards, shard_for, socket_path
+
+logger = logging.getLogger(__name__)
+
+# Fixed routes under /api/memory/ whose next path segment is not a user id
+_MEMORY_PREFIX = "/api/memory/"
+_MEMORY_ROUTES = {"categories", "trigger", "batch"}
+
+# Headers that describe one connection and are not forwarded
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade"
+}
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def routing_user_id(path: str, query_params: Mapping[str, str], body: Optional[bytes] = None) -> Optional[str]:
+    """
+    User whose shard serves a request
+
+    The user id is a query parameter (memory trigger), the path segment after
+    /api/memory/ (listing, export, import) or a field of the JSON body
+    (conversation, batch ingestion)
+
+    Args:
+        path: Request path
+        query_params: Query parameters
+        body: Request body, if it has been read
+
+    Returns:
+        The user id, or None for requests that are not tied to a user
+    """
+    if query_params.get("user_id"):
+        return query_params["user_id"]
+    if path.startswith(_MEMORY_PREFIX):
+        segment = path[len(_MEMORY_PREFIX):].split("/", 1)[0]
+        if segment and segment not in _MEMORY_ROUTES:
+            return segment
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(payload, dict) and isinstance(payload.get("user_id"), str):
+            return payload["user_id"]
+    return None
+
+class ShardRouter:
+    """
+    Forwards requests to shard processes over their unix sockets
+    Request and response bodies are streamed through, so exports and imports
+    are never buffered here; only JSON bodies of requests whose user id is not
+    in the URL are read to find the user
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the router
+
+        Args:
+            config: Application configuration; reads the "sharding" section
+        """
+        sharding_config = config.get("sharding", {})
+        self.shards = count_shards(config)
+        timeout = httpx.Timeout(sharding_config.get("request_timeout_seconds", 300), connect=5.0)
+        self.clients = [
+            httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=socket_path(config, shard)),
+                base_url="http://rex-shard",
+                timeout=timeout
+            )
+            for shard in range(self.shards)
+        ]
+        self.forwarded = [0] * self.shards
+        self.unavailable = 0
+
+    async def forward(self, request: Request) -> Response:
+        """Send a request to the shard owning its user (shard 0 if there is none) and stream back the response"""
+        path = request.url.path
+        body = None
+        user_id = routing_user_id(path, request.query_params)
+        has_body = request.headers.get("content-length", "0") != "0" or "transfer-encoding" in request.headers
+        if user_id is None and has_body:
+            body = await request.body()
+            user_id = routing_user_id(path, request.query_params, body)
+        shard = shard_for(user_id, self.shards) if user_id is not None else 0
+
+        headers = [
+            (name, value) for name, value in request.headers.items()
+            if name not in _HOP_BY_HOP and name not in ("host", "content-length")
+        ]
+        if body is None and has_body:
+            body = request.stream()
+        raw_path = request.scope.get("raw_path") or path.encode("utf-8")
+        url = raw_path.decode("latin-1") + (f"?{request.url.query}" if request.url.query else "")
+
+        client = self.clients[shard]
+        try:
+            response = await client.send(
+                client.build_request(request.method, url, headers=headers, content=body),
+                stream=True
+            )
+        except httpx.HTTPError as e:
+            self.unavailable += 1
+            logger.error(f"Error forwarding {request.method} {path} to shard {shard}: {str(e)}")
+            return JSONResponse({"detail": "Shard unavailable, please retry"}, status_code=503)
+        self.forwarded[shard] += 1
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={name: value for name, value in response.headers.items() if name not in _HOP_BY_HOP},
+            background=BackgroundTask(response.aclose)
+        )
+
+    async def ready(self) -> List[bool]:
+        """Readiness of every shard"""
+        async def probe(client: httpx.AsyncClient) -> bool:
+            try:
+                return (await client.get("/ready")).status_code == 200
+            except httpx.HTTPError:
+                return False
+        return list(await asyncio.gather(*(probe(client) for client in self.clients)))
+
+    async def close(self) -> None:
+        """Close the connections to the shards"""
+        await asyncio.gather(*(client.aclose() for client in self.clients))
+
+    def stats(self) -> Dict[str, Any]:
+        """Forwarding counters for monitoring"""
+        return {
+            "shards": self.shards,
+            "forwarded": list(self.forwarded),
+            "unavailable": self.unavailable
+        }
+
+def create_app(config: Dict[str, Any]) -> FastAPI:
+    """
+    Router application serving the same /api as app.py in front of the shards
+
+    Args:
+        config: Application configuration
+
+    Returns:
+        The FastAPI application
+    """
+    shard_router = ShardRouter(config)
+    app = FastAPI(
+        title="REX",
+        description="Enhanced Memory & Contextual Awareness System (shard router)",
+        version="1.0.0"
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, replace with specific origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.state.shard_router = shard_router
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await shard_router.close()
+
+    @app.get("/")
+    async def root():
+        """Root endpoint"""
+        return {"message": "REX API is running", **shard_router.stats()}
+
+    @app.get("/ready")
+    async def ready():
+        """Readiness probe: 200 once every shard is ready, 503 until then"""
+        shards = await shard_router.ready()
+        if not all(shards):
+            raise HTTPException(status_code=503, detail=f"Shards not ready: {[i for i, ok in enumerate(shards) if not ok]}")
+        return {"ready": True, "shards": len(shards)}
+
+    @app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def forward(request: Request):
+        return await shard_router.forward(request)
+
+    return app
+
+class ShardSupervisor:
+    """
+    Runs one app process per shard, each serving app.py on its unix socket
+    Shards load only their own data (see utils.sharding.shard_config) and have
+    their own embedding model and GIL, so throughput scales with cores. Shards
+    that exit are restarted
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the supervisor
+
+        Args:
+            config: Application configuration; reads the "sharding" section
+        """
+        self.config = config
+        self.shards = count_shards(config)
+        self.restarts = 0
+        self._processes: List[Optional[subprocess.Popen]] = [None] * self.shards
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the shard processes and a thread restarting those that exit"""
+        for shard in range(self.shards):
+            self._spawn(shard)
+        self._thread = threading.Thread(target=self._monitor, name="rex-shard-monitor", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Wait until every shard is listening on its socket
+
+        Returns:
+            True if all shards are listening, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(os.path.exists(socket_path(self.config, shard)) for shard in range(self.shards)):
+                return True
+            time.sleep(0.1)
+        return False
+
+    def stop(self) -> None:
+        """Stop the shard processes, letting each flush its memories"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for process in self._processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for shard, process in enumerate(self._processes):
+            if process is None:
+                continue
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Shard {shard} did not stop in time, killing it")
+                process.kill()
+
+    def _spawn(self, shard: int) -> None:
+        path = socket_path(self.config, shard)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)  # Left behind by a shard that crashed
+        # Own session, so Ctrl+C reaches only the router, which then stops the shards in order
+        self._processes[shard] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", _PROJECT_ROOT, "--uds", path],
+            env=dict(os.environ, **{SHARD_ENV: str(shard)}),
+            start_new_session=True
+        )
+        logger.info(f"Started shard {shard} on {path} (pid {self._processes[shard].pid})")
+
+    def _monitor(self) -> None:
+        while not self._stop.wait(1.0):
+            for shard, process in enumerate(self._processes):
+                if process is not None and process.poll() is not None and not self._stop.is_set():
+                    logger.warning(f"Shard {shard} exited with code {process.returncode}, restarting it")
+                    self.restarts += 1
+                    self._spawn(shard)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line interface: run the sharded deployment
+
+    python -m api.shard_router [--shards N] [--host HOST] [--port PORT]
+    """
+    parser = argparse.ArgumentParser(description="Run REX with users sharded across worker processes")
+    parser.add_argument("--shards", type=int, help="Shard processes (default: sharding.shards, 0 = one per CPU core)")
+    parser.add_argument("--host", help="Router address (default: sharding.host)")
+    parser.add_argument("--port", type=int, help="Router port (default: sharding.port)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    config = load_config()
+    sharding_config = dict(config.get("sharding", {}))
+    if args.shards is not None:
+        sharding_config["shards"] = args.shards
+    config["sharding"] = sharding_config
+
+    supervisor = ShardSupervisor(config)
+    supervisor.start()
+    try:
+        if not supervisor.wait_ready(sharding_config.get("start_timeout_seconds", 120)):
+            logger.warning("Not all shards are listening yet; their users get 503 until they are")
+        uvicorn.run(
+            create_app(config),
+            host=args.host or sharding_config.get("host", "0.0.0.0"),
+            port=args.port or sharding_config.get("port", 8000)
+        )
+    finally:
+        supervisor.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
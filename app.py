@@ -8,11 +8,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import logging
+import threading
 
-from memory_system.memory_manager import MemoryManager
+from memory_system.memory_service import RemoteMemoryManager, create_memory_manager
+from memory_system.compaction import Compactor
 from conversation_manager.context_manager import ContextManager
 from models.conversation import ConversationInput, ConversationResponse
 from utils.config_loader import load_config
+from utils.executor import ComputeExecutor, ExecutorBusyError
+from utils.sharding import current_shard, shard_config
 
 # Configure logging
 logging.basicConfig(
@@ -39,16 +43,56 @@ app.add_middleware(
 
 # Load configuration
 config = load_config()
+shard = current_shard()
+if shard is not None:
+    # A shard of the sharded deployment (api/shard_router.py) keeps its own data files
+    config = shard_config(config, shard)
+    logger.info(f"Running as shard {shard}")
 
 # Initialize core components
-memory_manager = MemoryManager(config)
+memory_manager = create_memory_manager(config)  # A client of the memory service when one is configured
 context_manager = ContextManager(memory_manager, config)
+compactor = Compactor(memory_manager, config)  # Retention and timeline roll-up in the background
+executor = ComputeExecutor(config)  # Retrieval and inference run here, off the event loop
+
+# REST API used by the browser extension
+from api.endpoints import router
+app.include_router(router)
+
+def warm_up():
+    """Load the embedding model and run a dummy batch so no real request is served cold"""
+    try:
+        memory_manager.warm_up()
+    except Exception as e:
+        logger.error(f"Error warming up embedding model: {str(e)}")
+
+@app.on_event("startup")
+async def startup():
+    """Start warming up in the background so the server can answer /ready probes meanwhile"""
+    threading.Thread(target=warm_up, name="rex-warm-up", daemon=True).start()
+    if not isinstance(memory_manager, RemoteMemoryManager):
+        compactor.start()  # With a memory service, compaction runs there
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush persisted memories before the process exits"""
+    executor.shutdown()
+    compactor.stop()
+    context_manager.close()  # Drains queued memories into the memory manager
+    memory_manager.close()
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"message": "REX API is running"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the embedding model is loaded and warm, 503 until then"""
+    if not memory_manager.ready:
+        raise HTTPException(status_code=503, detail="Embedding model is warming up")
+    return {"ready": True, "embedding_model": memory_manager.embedding_model_name}
+
 @app.post("/conversation", response_model=ConversationResponse)
 async def process_conversation(input_data: ConversationInput):
     """
@@ -59,7 +103,8 @@ async def process_conversation(input_data: ConversationInput):
         logger.info(f"Received conversation input: {input_data.user_input[:50]}...")
         
         # Process the conversation with context awareness
-        response = context_manager.process_conversation(
+        response = await executor.run(
+            context_manager.process_conversation,
             user_id=input_data.user_id,
             session_id=input_data.session_id,
             user_input=input_data.user_input,
@@ -67,6 +112,9 @@ async def process_conversation(input_data: ConversationInput):
         )
         
         return response
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting conversation input, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Error processing conversation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -77,12 +125,16 @@ async def memory_trigger(user_id: str, trigger_phrase: str, context: Optional[Di
     Endpoint to explicitly trigger memory recall
     """
     try:
-        recalled_memory = memory_manager.process_memory_trigger(
+        recalled_memory = await executor.run(
+            memory_manager.process_memory_trigger,
             user_id=user_id,
             trigger_phrase=trigger_phrase,
             context=context or {}
         )
         return {"recalled_memory": recalled_memory}
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting memory trigger, server busy: {str(e)}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Error processing memory trigger: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
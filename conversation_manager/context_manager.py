@@ -4,13 +4,14 @@ Handles conversation flow and context integration
 """
 from typing import Dict, List, Any, Optional
 import logging
-import re
 from datetime import datetime
 
-from memory_system.memory_manager import MemoryManager
+from memory_system.memory_interface import MemoryInterface
+from memory_system.ingestion import IngestionQueue
+from conversation_manager.session_cache import SessionCache
 from models.conversation import ConversationInput, ConversationResponse
 from models.memory import Memory, MemoryCategory
-from utils.text_processing import extract_entities, extract_keywords, detect_memory_triggers
+from utils.text_processing import extract_entities, extract_keywords, detect_memory_triggers, MEMORY_TRIGGER_PATTERN
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +21,17 @@ class ContextManager:
     Responsible for maintaining conversation flow and seamlessly integrating past context
     """
     
-    def __init__(self, memory_manager: MemoryManager, config: Dict[str, Any]):
+    def __init__(self, memory_manager: MemoryInterface, config: Dict[str, Any]):
         """Initialize the context manager with memory manager and configuration"""
         self.memory_manager = memory_manager
         self.config = config
-        self.session_contexts = {}  # Store active session contexts
-        self.memory_trigger_pattern = re.compile(r"REX,\s+(recall|remember|what did we say about|update on)\s+(.+)", re.IGNORECASE)
+        self.session_contexts = SessionCache(config)  # Active session contexts (bounded)
+        self.memory_trigger_pattern = MEMORY_TRIGGER_PATTERN
+        
+        # Write-behind storage of extracted and timeline memories (optional)
+        self.ingestion: Optional[IngestionQueue] = None
+        if config.get("ingestion", {}).get("enabled", True):
+            self.ingestion = IngestionQueue(memory_manager, config)
         logger.info("Context Manager initialized")
     
     def process_conversation(self, 
@@ -48,9 +54,13 @@ class ContextManager:
         # Initialize or retrieve session context
         session_context = self._get_session_context(user_id, session_id)
         
-        # Update conversation history in session context
+        # Read-your-writes: earlier turns of this session must be stored before retrieval
+        if self.ingestion is not None:
+            self.ingestion.wait_for_session(user_id, session_id)
+        
+        # Update conversation history in session context (keeps the last max_session_history messages)
         if conversation_history:
-            session_context["history"] = conversation_history
+            self.session_contexts.set_history(session_context, conversation_history)
         
         # Check for explicit memory triggers
         memory_trigger = self._check_memory_trigger(user_input)
@@ -62,31 +72,41 @@ class ContextManager:
                 context={"session_id": session_id}
             )
             # Store the memory recall event in timeline
-            self._store_memory_recall_event(user_id, trigger_type, topic)
+            self._store_memory_recall_event(user_id, trigger_type, topic, session_id)
             
             # Generate response based on recalled memory
             response = self._generate_response_with_memory(user_input, recalled_memory, session_context)
         else:
             # Process regular conversation input
-            # Extract and store potential memories from user input
-            self.memory_manager.extract_and_store_memories(
-                user_id=user_id,
+            # Extract potential memories from user input
+            extracted_memories = self.memory_manager.extract_memories(
                 text=user_input,
                 context={"session_id": session_id, "source": "user_input"}
             )
             
+            if self.ingestion is not None:
+                # Only the query is encoded before responding; the extracted memories
+                # are encoded and stored in the background
+                self.ingestion.submit(user_id, extracted_memories, session_id)
+                query_embedding, = self.memory_manager.encode_turn([], [user_input])
+            else:
+                # Encode the extracted memories and the retrieval query in one model call
+                query_embedding, = self.memory_manager.encode_turn(extracted_memories, [user_input])
+                self.memory_manager.store_memories(user_id, extracted_memories)
+            
             # Retrieve relevant memories based on user input
             relevant_memories = self.memory_manager.retrieve_memories(
                 user_id=user_id,
                 query=user_input,
-                limit=self.config.get("context_memory_limit", 3)
+                limit=self.config.get("context_memory_limit", 3),
+                query_embedding=query_embedding
             )
             
             # Generate response with context awareness
             response = self._generate_response(user_input, relevant_memories, session_context)
             
             # Store the conversation in timeline memory
-            self._store_conversation_memory(user_id, user_input, response.ai_response)
+            self._store_conversation_memory(user_id, user_input, response.ai_response, session_id)
         
         # Update session context with the latest interaction
         session_context["last_interaction"] = {
@@ -94,24 +114,75 @@ class ContextManager:
             "ai_response": response.ai_response,
             "timestamp": datetime.now().isoformat()
         }
+        # History holds client-style {role, content} messages, so the turn is added as two of them
+        session_context["history"].extend([
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": response.ai_response}
+        ])
         
         return response
     
+    def ingest_batch(self, user_id: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Store many conversations at once, e.g. a client's backlog after an outage
+        
+        Each item's user messages are mined for memories and every user message is
+        stored as a timeline entry with the assistant reply that follows it, as in a
+        live turn. All new items are encoded together and committed in one write.
+        
+        Args:
+            user_id: Unique identifier for the user
+            items: Dicts with idempotency_key, messages ({"role", "content"} dicts)
+                and optional session_id and timestamp
+            
+        Returns:
+            Per item: idempotency_key, status (stored, duplicate or failed), memory_ids
+            and error
+        """
+        results: List[Dict[str, Any]] = []
+        batch = []
+        for item in items:
+            result = {"idempotency_key": item["idempotency_key"], "status": "failed", "memory_ids": [], "error": None}
+            results.append(result)
+            try:
+                memories = self._memories_from_messages(item["messages"], item.get("session_id"), item.get("timestamp"))
+            except (KeyError, TypeError, ValueError) as e:
+                result["error"] = f"Invalid item: {str(e)}"
+                continue
+            if not memories:
+                result["error"] = "Item has no user messages"
+                continue
+            batch.append((result, memories))
+        
+        if batch:
+            outcomes = self.memory_manager.store_batch(
+                user_id, [(result["idempotency_key"], memories) for result, memories in batch]
+            )
+            for (result, _), (stored, memory_ids) in zip(batch, outcomes):
+                result["status"] = "stored" if stored else "duplicate"
+                result["memory_ids"] = memory_ids
+        return results
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued memory is stored
+        
+        Returns:
+            False if the timeout expired first
+        """
+        if self.ingestion is None:
+            return True
+        return self.ingestion.flush(timeout)
+    
+    def close(self) -> None:
+        """Store queued memories, stop the ingestion workers and spill active sessions"""
+        if self.ingestion is not None:
+            self.ingestion.close()
+        self.session_contexts.close()
+    
     def _get_session_context(self, user_id: str, session_id: str) -> Dict[str, Any]:
         """Get or initialize session context"""
-        context_key = f"{user_id}:{session_id}"
-        if context_key not in self.session_contexts:
-            self.session_contexts[context_key] = {
-                "user_id": user_id,
-                "session_id": session_id,
-                "start_time": datetime.now().isoformat(),
-                "history": [],
-                "active_topics": set(),
-                "active_projects": set(),
-                "identified_preferences": set(),
-                "last_interaction": None
-            }
-        return self.session_contexts[context_key]
+        return self.session_contexts.get(user_id, session_id)
     
     def _check_memory_trigger(self, text: str) -> Optional[tuple]:
         """Check if text contains a memory trigger phrase"""
@@ -206,7 +277,11 @@ class ContextManager:
             }
         )
     
-    def _store_conversation_memory(self, user_id: str, user_input: str, ai_response: str) -> str:
+    def _store_conversation_memory(self,
+                                   user_id: str,
+                                   user_input: str,
+                                   ai_response: str,
+                                   session_id: Optional[str] = None) -> Optional[str]:
         """Store conversation in timeline memory"""
         memory = Memory(
             category=MemoryCategory.TIMELINE,
@@ -214,12 +289,17 @@ class ContextManager:
             source="conversation",
             metadata={
                 "user_input": user_input,
-                "ai_response": ai_response
+                "ai_response": ai_response,
+                "session_id": session_id
             }
         )
-        return self.memory_manager.store_memory(user_id, memory)
+        return self._store(user_id, memory, session_id)
     
-    def _store_memory_recall_event(self, user_id: str, trigger_type: str, topic: str) -> str:
+    def _store_memory_recall_event(self,
+                                   user_id: str,
+                                   trigger_type: str,
+                                   topic: str,
+                                   session_id: Optional[str] = None) -> Optional[str]:
         """Store memory recall event in timeline"""
         memory = Memory(
             category=MemoryCategory.TIMELINE,
@@ -230,4 +310,49 @@ class ContextManager:
                 "topic": topic
             }
         )
+        return self._store(user_id, memory, session_id)
+    
+    def _memories_from_messages(self,
+                                messages: List[Dict[str, Any]],
+                                session_id: Optional[str],
+                                timestamp: Optional[str]) -> List[Memory]:
+        """Extracted and timeline memories for a recorded conversation"""
+        memories = []
+        for position, message in enumerate(messages):
+            if message["role"] != "user":
+                continue
+            user_input = str(message["content"])
+            following = messages[position + 1] if position + 1 < len(messages) else None
+            ai_response = str(following["content"]) if following and following.get("role") == "assistant" else ""
+            extracted = self.memory_manager.extract_memories(
+                text=user_input,
+                context={"session_id": session_id, "source": "backfill"}
+            )
+            if timestamp:
+                for memory in extracted:
+                    memory.timestamp = timestamp
+            memories.extend(extracted)
+            memories.append(Memory(
+                category=MemoryCategory.TIMELINE,
+                content=f"User: {user_input}\nAI: {ai_response}",
+                source="backfill",
+                metadata={
+                    "user_input": user_input,
+                    "ai_response": ai_response,
+                    "session_id": session_id
+                },
+                timestamp=timestamp
+            ))
+        return memories
+    
+    def _store(self, user_id: str, memory: Memory, session_id: Optional[str]) -> Optional[str]:
+        """
+        Store a memory through the ingestion queue when it is enabled
+
+        Returns:
+            ID of the stored memory, or None when it was queued (its ID is known once committed)
+        """
+        if self.ingestion is not None:
+            self.ingestion.submit(user_id, [memory], session_id)
+            return None
         return self.memory_manager.store_memory(user_id, memory)
@@ -0,0 +1,209 @@
+"""
+Session cache for REX
+Bounded store of active session contexts with idle expiry, LRU eviction and an optional spill file
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SessionContext = Dict[str, Any]
+
+class SessionCache:
+    """
+    Session contexts keyed by "user_id:session_id"
+    Entries are kept in least-recently-used order, so both idle expiry and
+    capacity eviction pop from the front. Each session's history is a ring
+    buffer of at most max_session_history messages. When spilling is enabled,
+    evicted sessions are written to a SQLite file next to the stored memories
+    and restored if the session comes back
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the cache
+
+        Args:
+            config: Application configuration; reads the "session_cache" section
+                and max_session_history
+        """
+        cache_config = config.get("session_cache", {})
+        self.max_sessions = cache_config.get("max_sessions", 10000)
+        self.idle_ttl = cache_config.get("idle_ttl_seconds", 3600)
+        self.max_history = config.get("max_session_history", 100)
+        self.spill_max_age = cache_config.get("spill_max_age_seconds", 7 * 24 * 3600)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.spilled = 0
+        self.restored = 0
+
+        self._entries: "OrderedDict[str, List[Any]]" = OrderedDict()  # key -> [context, last access]
+        self._lock = threading.Lock()
+        self._db = None
+
+        if cache_config.get("spill", False):
+            spill_path = cache_config.get("spill_path") or os.path.join(
+                config.get("memory_persistence", {}).get("file_path", "data/memories"), "sessions.sqlite3"
+            )
+            directory = os.path.dirname(spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, context TEXT NOT NULL, spilled_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM sessions WHERE spilled_at < ?", (time.time() - self.spill_max_age,))
+            self._db.commit()
+            logger.info(f"Session cache spilling evicted sessions to {spill_path}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __getitem__(self, key: str) -> SessionContext:
+        """Look up a cached session without refreshing it"""
+        return self._entries[key][0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, session_id: str) -> SessionContext:
+        """
+        Get a session context, restoring or creating it if it is not cached
+
+        Args:
+            user_id: Unique identifier for the user
+            session_id: Identifier for the conversation session
+
+        Returns:
+            The session context (a dict whose "history" is a bounded deque)
+        """
+        key = f"{user_id}:{session_id}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.idle_ttl:
+                self._evict([(key, self._entries.pop(key)[0])])
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self.hits += 1
+                entry[1] = now
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            self.misses += 1
+            context = self._restore(key)
+            if context is None:
+                context = self._new_context(user_id, session_id)
+            self._entries[key] = [context, now]
+            self._sweep(now)
+            return context
+
+    def set_history(self, context: SessionContext, history: List[Dict[str, Any]]) -> None:
+        """Replace a session's history with (the most recent part of) the client's history"""
+        context["history"].clear()
+        context["history"].extend(history)
+
+    def sweep(self) -> int:
+        """
+        Evict idle sessions now rather than on the next lookup
+
+        Returns:
+            Number of sessions evicted
+        """
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache and eviction counters for monitoring"""
+        return {
+            "sessions": len(self._entries),
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "spilled": self.spilled,
+            "restored": self.restored
+        }
+
+    def close(self) -> None:
+        """Spill the remaining sessions (if spilling) and close the spill file"""
+        with self._lock:
+            if self._db is not None:
+                self._evict([(key, entry[0]) for key, entry in self._entries.items()])
+                self._db.close()
+                self._db = None
+            self._entries.clear()
+
+    def _new_context(self, user_id: str, session_id: str) -> SessionContext:
+        return {
+            "user_id": user_id,
+            "session_id": session_id,
+            "start_time": datetime.now().isoformat(),
+            "history": deque(maxlen=self.max_history),
+            "active_topics": set(),
+            "active_projects": set(),
+            "identified_preferences": set(),
+            "last_interaction": None
+        }
+
+    def _sweep(self, now: float) -> int:
+        """Pop expired sessions, then the least recently used ones beyond max_sessions"""
+        removed = []
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            self._entries.popitem(last=False)
+            removed.append((key, entry[0]))
+        self.expired += len(removed)
+        while len(self._entries) > self.max_sessions:
+            key, entry = self._entries.popitem(last=False)
+            removed.append((key, entry[0]))
+            self.evicted += 1
+        self._evict(removed)
+        return len(removed)
+
+    def _evict(self, sessions: List[Any]) -> None:
+        """Write evicted (key, context) pairs to the spill file"""
+        if self._db is None or not sessions:
+            return
+        rows = []
+        for key, context in sessions:
+            data = dict(context, history=list(context["history"]))
+            for field in ("active_topics", "active_projects", "identified_preferences"):
+                data[field] = sorted(context[field])
+            rows.append((key, json.dumps(data, default=str), time.time()))
+        try:
+            self._db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            self.spilled += len(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error spilling sessions: {str(e)}")
+
+    def _restore(self, key: str) -> Optional[SessionContext]:
+        """Take a session back out of the spill file"""
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT context FROM sessions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+        self._db.commit()
+        context = json.loads(row[0])
+        context["history"] = deque(context["history"], maxlen=self.max_history)
+        for field in ("active_topics", "active_projects", "identified_preferences"):
+            context[field] = set(context[field])
+        self.restored += 1
+        return context
@@ -76,14 +76,45 @@ const RexAPI = {
     }
   },
   
+  /**
+   * Store many conversations in one request
+   * @param {string} userId - User identifier
+   * @param {Array} items - Items with idempotency_key, session_id, messages and timestamp
+   * @returns {Promise<object>} - Per-item results from the API
+   */
+  async ingestBatch(userId, items) {
+    try {
+      const response = await fetch(`${API_ENDPOINT}/api/memory/batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+          user_id: userId,
+          items
+        })
+      });
+      
+      if (!response.ok) {
+        throw new Error(`API error: ${response.status}`);
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('REX API Error:', error);
+      return { error: error.message };
+    }
+  },
+  
   /**
    * Get user memories
    * @param {string} userId - User identifier
    * @param {string} category - Optional category filter
    * @param {number} limit - Maximum number of memories to retrieve
-   * @returns {Promise<object>} - Response from the API
+   * @param {string} after - next_cursor of the previous page (optional)
+   * @returns {Promise<object>} - Memories (newest first) and the next page's cursor
    */
-  async getUserMemories(userId, category = null, limit = 10) {
+  async getUserMemories(userId, category = null, limit = 10, after = null) {
     try {
       let url = `${API_ENDPOINT}/api/memory/${userId}`;
       
@@ -91,6 +122,7 @@ const RexAPI = {
       const params = new URLSearchParams();
       if (category) params.append('category', category);
       if (limit) params.append('limit', limit.toString());
+      if (after) params.append('after', after);
       
       if (params.toString()) {
         url += `?${params.toString()}`;
@@ -72,6 +72,9 @@ function init() {
   
   // Set up listeners
   setupListeners();
+  
+  // Push conversations that could not be sent last time
+  syncPendingConversations();
 }
 
 /**
@@ -354,19 +357,90 @@ async function storeConversation(conversation) {
   // Send to API
   const userId = await getUserId();
   
-  try {
-    // Process the conversation with the API
-    await RexAPI.processConversation(
-      userId,
-      conversation.id,
-      '', // No user input for this call
-      conversation.messages
-    );
+  // Process the conversation with the API
+  const apiResponse = await RexAPI.processConversation(
+    userId,
+    conversation.id,
+    '', // No user input for this call
+    conversation.messages
+  );
+  
+  if (apiResponse.error) {
+    console.error('REX: Error sending conversation to API', apiResponse.error);
+    // Keep it for the next sync
+    await updatePendingSync(pending => pending.includes(conversation.id) ? pending : [...pending, conversation.id]);
+    return;
+  }
+  
+  console.log('REX: Conversation sent to API');
+  syncPendingConversations();
+}
+
+/**
+ * Update the list of conversation IDs waiting to be sent to the API
+ * @param {function} update - Maps the current list to the new one
+ * @returns {Promise<Array>} - The new list
+ */
+function updatePendingSync(update) {
+  return new Promise((resolve) => {
+    chrome.storage.local.get(['pendingSync'], (result) => {
+      const pending = update(result.pendingSync || []);
+      chrome.storage.local.set({ pendingSync: pending }, () => resolve(pending));
+    });
+  });
+}
+
+/**
+ * Send conversations that were only stored locally to the API, many per request
+ * Items are keyed by conversation ID and message count, so resending one is harmless
+ */
+async function syncPendingConversations() {
+  const { conversations = [], pendingSync = [], syncFailures = {} } = await new Promise((resolve) => {
+    chrome.storage.local.get(['conversations', 'pendingSync', 'syncFailures'], resolve);
+  });
+  if (pendingSync.length === 0) {
+    return;
+  }
+  
+  // Conversations that fell out of local storage can no longer be sent
+  const pending = conversations.filter(conversation => pendingSync.includes(conversation.id));
+  const userId = await getUserId();
+  const synced = new Set(pendingSync.filter(id => !pending.some(conversation => conversation.id === id)));
+  const batchSize = REX_CONFIG.syncBatchSize || 100;
+  const maxAttempts = REX_CONFIG.syncMaxAttempts || 5;
+  
+  for (let start = 0; start < pending.length; start += batchSize) {
+    const chunk = pending.slice(start, start + batchSize);
+    const apiResponse = await RexAPI.ingestBatch(userId, chunk.map(conversation => ({
+      idempotency_key: `${conversation.id}:${conversation.messages ? conversation.messages.length : 0}`,
+      session_id: conversation.id,
+      messages: conversation.messages || [],
+      timestamp: conversation.timestamp
+    })));
+    
+    if (apiResponse.error) {
+      console.error('REX: Error syncing conversations', apiResponse.error);
+      break;
+    }
     
-    console.log('REX: Conversation sent to API');
-  } catch (error) {
-    console.error('REX: Error sending conversation to API', error);
+    apiResponse.results.forEach((result, position) => {
+      const id = chunk[position].id;
+      if (result.status === 'failed') {
+        // Kept for the next sync (e.g. after a server fix) until it has failed maxAttempts times
+        syncFailures[id] = (syncFailures[id] || 0) + 1;
+        console.error(`REX: Conversation rejected by API (attempt ${syncFailures[id]} of ${maxAttempts})`, result.error);
+        if (syncFailures[id] < maxAttempts) {
+          return;
+        }
+      }
+      delete syncFailures[id];
+      synced.add(id);
+    });
   }
+  
+  await new Promise((resolve) => chrome.storage.local.set({ syncFailures }, resolve));
+  await updatePendingSync(current => current.filter(id => !synced.has(id)));
+  console.log(`REX: Synced ${synced.size} pending conversations`);
 }
 
 /**
@@ -413,6 +487,7 @@ if (typeof module !== 'undefined') {
     handleActivationTrigger,
     retrieveContext,
     extractRelevantSection,
-    storeConversation
+    storeConversation,
+    syncPendingConversations
   };
 }
@@ -7,6 +7,12 @@ const REX_CONFIG = {
   // API endpoint for the REX backend
   apiEndpoint: 'http://localhost:8000',
   
+  // Conversations sent per request when syncing the offline backlog
+  syncBatchSize: 100,
+  
+  // Times a conversation rejected by the API is resent before it is dropped from the backlog
+  syncMaxAttempts: 5,
+  
   // Analytics endpoint (set to null to disable)
   analyticsEndpoint: 'https://us-central1-rexai-2c417.cloudfunctions.net/trackEvent', // Firebase function URL
   
@@ -23,6 +23,11 @@ const clearAllBtn = document.getElementById('clear-all-btn');
 const deleteConfirmation = document.getElementById('delete-confirmation');
 const cancelDelete = document.getElementById('cancel-delete');
 const confirmDelete = document.getElementById('confirm-delete');
+const serverMemoriesList = document.getElementById('server-memories-list');
+const serverMemoriesStatus = document.getElementById('server-memories-status');
+
+// Server memories fetched per request while scrolling
+const SERVER_PAGE_SIZE = 50;
 
 // State
 let state = {
@@ -33,7 +38,13 @@ let state = {
   searchQuery: '',
   platformFilter: 'all',
   categoryFilter: 'all',
-  sortOrder: 'date-desc'
+  sortOrder: 'date-desc',
+  server: {
+    cursor: null,
+    loading: false,
+    done: false,
+    generation: 0 // Bumped on reset so responses for an old filter are ignored
+  }
 };
 
 /**
@@ -45,6 +56,9 @@ function init() {
   // Load conversations from storage
   loadConversations();
   
+  // Load the first page of memories stored on the server
+  loadServerMemories(true);
+  
   // Set up event listeners
   setupEventListeners();
 }
@@ -93,6 +107,15 @@ function setupEventListeners() {
   categoryFilter.addEventListener('change', () => {
     state.categoryFilter = categoryFilter.value;
     applyFilters();
+    loadServerMemories(true);
+  });
+  
+  // Fetch the next page of server memories when the list is scrolled near its end
+  serverMemoriesList.addEventListener('scroll', () => {
+    const remaining = serverMemoriesList.scrollHeight - serverMemoriesList.scrollTop - serverMemoriesList.clientHeight;
+    if (remaining < 200) {
+      loadServerMemories(false);
+    }
   });
   
   sortBy.addEventListener('change', () => {
@@ -244,6 +267,88 @@ function applyFilters() {
   renderMemoriesList();
 }
 
+/**
+ * Load the next page of memories from the server and append it to the list
+ * Each request returns one page and a cursor for the next, so scrolling costs
+ * the same per page however many memories the user has
+ * @param {boolean} reset - Start again from the newest memory (e.g. after a filter change)
+ */
+async function loadServerMemories(reset) {
+  const server = state.server;
+  if (reset) {
+    server.cursor = null;
+    server.done = false;
+    server.loading = false;
+    server.generation += 1;
+    serverMemoriesList.innerHTML = '';
+    serverMemoriesStatus.textContent = '';
+  }
+  if (server.loading || server.done) {
+    return;
+  }
+  
+  server.loading = true;
+  const generation = server.generation;
+  const userId = await new Promise((resolve) => {
+    chrome.storage.local.get(['userId'], (result) => resolve(result.userId));
+  });
+  if (!userId) {
+    server.loading = false;
+    server.done = true;
+    serverMemoriesStatus.textContent = 'No memories on the server yet.';
+    return;
+  }
+  
+  const category = state.categoryFilter !== 'all' ? state.categoryFilter : null;
+  const response = await RexAPI.getUserMemories(userId, category, SERVER_PAGE_SIZE, server.cursor);
+  if (generation !== server.generation) {
+    return; // The filter changed while this page was loading
+  }
+  server.loading = false;
+  
+  if (response.error) {
+    serverMemoriesStatus.textContent = 'Could not reach the REX server.';
+    return;
+  }
+  
+  renderServerMemories(response.memories);
+  server.cursor = response.next_cursor;
+  server.done = !response.next_cursor;
+  if (server.done) {
+    serverMemoriesStatus.textContent = serverMemoriesList.children.length ? '' : 'No memories on the server yet.';
+  } else if (serverMemoriesList.scrollHeight <= serverMemoriesList.clientHeight) {
+    loadServerMemories(false); // Fill the visible area
+  }
+}
+
+/**
+ * Append a page of server memories to the list
+ * @param {Array} memories - Memories in the order returned by the API
+ */
+function renderServerMemories(memories) {
+  const fragment = document.createDocumentFragment();
+  memories.forEach(memory => {
+    const memoryItem = document.createElement('div');
+    memoryItem.className = 'memory-item';
+    
+    const title = document.createElement('div');
+    title.className = 'memory-title';
+    title.textContent = memory.content;
+    
+    const meta = document.createElement('div');
+    meta.className = 'memory-meta';
+    meta.innerHTML = `
+      <span class="memory-date">${formatDate(new Date(memory.timestamp))}</span>
+      <span class="server-memory-category">${memory.category}</span>
+    `;
+    
+    memoryItem.appendChild(title);
+    memoryItem.appendChild(meta);
+    fragment.appendChild(memoryItem);
+  });
+  serverMemoriesList.appendChild(fragment);
+}
+
 /**
  * Render the memories list
  */
@@ -0,0 +1,95 @@
+"""
+Approximate nearest-neighbour index for REX
+Inverted-file (IVF) partitioning of normalized embeddings for large memory stores
+"""
+from typing import List
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a VectorIndex
+    Embeddings are clustered with spherical k-means; a query only scores the rows
+    assigned to the nprobe clusters whose centroids are closest to it
+    """
+
+    def __init__(self, nlist: int, nprobe: int, train_iterations: int = 10, seed: int = 0):
+        """
+        Initialize an untrained IVF index
+
+        Args:
+            nlist: Number of clusters (inverted lists)
+            nprobe: Number of clusters scanned per query
+            train_iterations: k-means iterations used when training
+            seed: Random seed for centroid initialization and training samples
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.trained_size = 0
+        self._lists: List[np.ndarray] = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        """
+        Cluster the given normalized vectors and rebuild all inverted lists
+
+        Args:
+            vectors: Every row currently in the parent index, in row order
+        """
+        size = vectors.shape[0]
+        nlist = max(1, min(self.nlist, size))
+
+        # Train on a bounded sample so retraining cost does not grow with the store
+        sample_size = min(size, nlist * 64)
+        sample = vectors[self.rng.choice(size, sample_size, replace=False)]
+        centroids = sample[self.rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            # Keep the previous centroid for clusters that lost all members
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = sums
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = size
+        self._lists = [np.zeros(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self.add(np.arange(size), vectors)
+        logger.info(f"Trained IVF index with {nlist} lists on {sample_size} of {size} vectors")
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Assign new rows to their nearest cluster"""
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for cluster in np.unique(assignment):
+            members = np.asarray(rows)[assignment == cluster]
+            start = self._list_sizes[cluster]
+            end = start + members.shape[0]
+            inverted = self._lists[cluster]
+            if end > inverted.shape[0]:
+                grown = np.zeros(max(end, inverted.shape[0] * 2), dtype=np.int64)
+                grown[:start] = inverted[:start]
+                self._lists[cluster] = inverted = grown
+            inverted[start:end] = members
+            self._list_sizes[cluster] = end
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Rows in the nprobe clusters closest to a normalized query"""
+        centroid_scores = self.centroids @ query
+        nprobe = min(self.nprobe, centroid_scores.shape[0])
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[cluster][:self._list_sizes[cluster]] for cluster in probe])
@@ -0,0 +1,212 @@
+"""
+Memory compaction for REX
+Background job applying retention rules and rolling old conversation turns up into digests
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+import logging
+import threading
+
+from models.memory import Memory, MemoryCategory, to_timestamp_us
+from memory_system.memory_manager import MemoryManager
+from utils.text_processing import extract_keywords
+
+logger = logging.getLogger(__name__)
+
+# Sources of timeline memories written by the system rather than by a conversation
+RECALL_EVENT_SOURCE = "memory_trigger"
+DIGEST_SOURCE = "compaction"
+
+# Keywords listed as a digest's topics
+_DIGEST_TOPICS = 10
+
+class Compactor:
+    """
+    Periodic retention and compaction of every user's memories
+    Each run, per user:
+    - memory recall events older than recall_event_max_age_hours are dropped
+    - conversation turns older than timeline_rollup_after_days are replaced by one
+      digest memory per session (or per day for turns without a session), with a
+      single embedding; a later run merges newly old turns into that digest
+    - per-category rules drop memories older than max_age_days and all but the
+      newest max_count
+    The memory manager then rebuilds the user's indexes without the removed rows,
+    so store size and query cost stay bounded however long a user keeps chatting
+    """
+
+    def __init__(self, memory_manager: MemoryManager, config: Dict[str, Any]):
+        """
+        Initialize the job
+
+        Args:
+            memory_manager: Memory manager whose users are compacted
+            config: Application configuration; reads the "retention" section
+        """
+        retention_config = config.get("retention", {})
+        self.memory_manager = memory_manager
+        self.enabled = retention_config.get("enabled", False)
+        self.interval = retention_config.get("interval_seconds", 3600)
+        self.rollup_after = timedelta(days=retention_config.get("timeline_rollup_after_days", 7))
+        self.recall_event_max_age = timedelta(hours=retention_config.get("recall_event_max_age_hours", 24))
+        self.digest_max_chars = retention_config.get("digest_max_chars", 2000)
+        self.rules = {
+            MemoryCategory(category): rule
+            for category, rule in retention_config.get("rules", {}).items()
+        }
+        self.runs = 0
+        self.removed = 0
+        self.rolled_up = 0
+        self.digests = 0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Run the job in a background thread every interval_seconds"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_periodically, name="rex-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread (a run in progress finishes first)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Compact every user's memories once
+
+        Args:
+            now: Reference time for ages (defaults to the current local time)
+
+        Returns:
+            Counts of removed memories, rolled-up turns and digests written
+        """
+        totals = {"removed": 0, "rolled_up": 0, "digests": 0}
+        for user_id in list(self.memory_manager.memory_store):
+            try:
+                result = self.compact_user(user_id, now)
+            except Exception as e:
+                logger.error(f"Error compacting memories for user {user_id}: {str(e)}")
+                continue
+            for key in totals:
+                totals[key] += result[key]
+        if totals["removed"] or totals["digests"]:
+            # One snapshot for the whole run, instead of one per compacted user
+            self.memory_manager.snapshot()
+        self.runs += 1
+        return totals
+
+    def compact_user(self, user_id: str, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Apply the retention rules to one user
+
+        Args:
+            user_id: Unique identifier for the user
+            now: Reference time for ages (defaults to the current local time)
+
+        Returns:
+            Counts of removed memories, rolled-up turns and digests written
+        """
+        now = now or datetime.now()
+        store = self.memory_manager.category_lists(user_id)  # Copies: ingestion keeps appending
+        if store is None:
+            return {"removed": 0, "rolled_up": 0, "digests": 0}
+
+        doomed = set()
+        timeline = store[MemoryCategory.TIMELINE.value]  # Oldest first
+        recall_cutoff = to_timestamp_us(now - self.recall_event_max_age)
+        rollup_cutoff = to_timestamp_us(now - self.rollup_after)
+        sessions: Dict[str, List[Memory]] = {}
+        for memory in timeline:
+            if memory.source == RECALL_EVENT_SOURCE:
+                if memory.timestamp_us < recall_cutoff:
+                    doomed.add(memory.id)
+            elif memory.source != DIGEST_SOURCE and memory.timestamp_us < rollup_cutoff:
+                session = memory.metadata.get("session_id") or memory.timestamp[:10]
+                sessions.setdefault(session, []).append(memory)
+        # A session rolled up by an earlier run gets its digest replaced by a merged one
+        previous = {memory.metadata.get("session_id"): memory for memory in timeline if memory.source == DIGEST_SOURCE}
+        digests = []
+        for session, turns in sessions.items():
+            if session in previous:
+                doomed.add(previous[session].id)
+            digests.append(self._digest(session, turns, previous.get(session)))
+        rolled_up = sum(len(turns) for turns in sessions.values())
+        for turns in sessions.values():
+            doomed.update(memory.id for memory in turns)
+
+        for category, rule in self.rules.items():
+            # Category lists are in time order, so expired and surplus memories form a prefix
+            memories = [memory for memory in store[category.value] if memory.id not in doomed]
+            if category == MemoryCategory.TIMELINE:
+                memories = sorted(memories + digests, key=lambda memory: memory.timestamp_us)
+            cut = 0
+            if rule.get("max_age_days") is not None:
+                cutoff = to_timestamp_us(now - timedelta(days=rule["max_age_days"]))
+                cut = next((i for i, memory in enumerate(memories) if memory.timestamp_us >= cutoff), len(memories))
+            if rule.get("max_count") is not None:
+                cut = max(cut, len(memories) - rule["max_count"])
+            doomed.update(memory.id for memory in memories[:cut])
+        digests = [digest for digest in digests if digest.id not in doomed]
+
+        removed = 0
+        if doomed or digests:
+            removed = self.memory_manager.remove_memories(user_id, list(doomed), digests)
+        self.removed += removed
+        self.rolled_up += rolled_up
+        self.digests += len(digests)
+        if removed:
+            logger.info(f"Compacted memories for user {user_id}: {removed} removed, {len(digests)} digests")
+        return {"removed": removed, "rolled_up": rolled_up, "digests": len(digests)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counters for monitoring"""
+        return {
+            "runs": self.runs,
+            "removed": self.removed,
+            "rolled_up": self.rolled_up,
+            "digests": self.digests
+        }
+
+    def _digest(self, session: str, turns: List[Memory], previous: Optional[Memory] = None) -> Memory:
+        """One timeline memory summarizing a session's turns, merged with the session's previous digest if given"""
+        inputs = [turn.metadata.get("user_input") or turn.content.split("\n", 1)[0] for turn in turns]
+        keywords = extract_keywords(" ".join(turn.content for turn in turns), _DIGEST_TOPICS)
+        count, start = len(turns), turns[0].timestamp
+        if previous is not None:
+            inputs = list(previous.metadata.get("inputs", [])) + inputs
+            keywords = list(dict.fromkeys(keywords + list(previous.metadata.get("topics", []))))[:_DIGEST_TOPICS]
+            count += previous.metadata.get("turns", 0)
+            start = previous.metadata.get("start", start)
+        content = (
+            f"Conversation digest ({count} turns, {start[:16]} to {turns[-1].timestamp[:16]}). "
+            f"Topics: {', '.join(keywords)}. User said: {' | '.join(inputs)}"
+        )
+        if len(content) > self.digest_max_chars:
+            content = content[:self.digest_max_chars - 3] + "..."
+        return Memory(
+            category=MemoryCategory.TIMELINE,
+            content=content,
+            source=DIGEST_SOURCE,
+            metadata={
+                "session_id": session,
+                "turns": count,
+                "start": start,
+                "end": turns[-1].timestamp,
+                "topics": keywords,
+                "inputs": inputs  # Kept so a later run can merge into this digest
+            },
+            timestamp=turns[-1].timestamp
+        )
+
+    def _run_periodically(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                totals = self.run()
+                logger.info(f"Memory compaction run finished: {totals}")
+            except Exception as e:
+                logger.error(f"Error running memory compaction: {str(e)}")
@@ -0,0 +1,149 @@
+"""
+Embedding cache for REX
+Bounded LRU cache of text embeddings with an optional on-disk tier
+"""
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so whitespace-only differences share an entry"""
+    return " ".join(text.split())
+
+class EmbeddingCache:
+    """
+    Cache of embeddings keyed by (model name, hash of normalized text)
+    Recently used entries are kept in memory up to max_entries; when persist_path
+    is set, every entry is also written to a SQLite file that survives restarts
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 50000, persist_path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            model_name: Name of the embedding model; part of every key
+            max_entries: Maximum number of embeddings kept in memory
+            persist_path: Path of the SQLite file for the persistent tier (optional)
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if persist_path:
+            directory = os.path.dirname(persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, digest BLOB NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, digest))"
+            )
+            self._db.commit()
+            logger.info(f"Embedding cache persisting to {persist_path}")
+
+    def key(self, text: str) -> Tuple[str, bytes]:
+        """Cache key for a text"""
+        digest = hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+        return (self.model_name, digest)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up several texts
+
+        Returns:
+            Embedding for each text, or None where the text is not cached
+        """
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = []
+        missing = []
+
+        with self._lock:
+            for position, key in enumerate(keys):
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                else:
+                    missing.append(position)
+                results.append(embedding)
+
+            if missing and self._db is not None:
+                stored = self._load({keys[i][1] for i in missing})
+                for position in missing:
+                    embedding = stored.get(keys[position][1])
+                    if embedding is not None:
+                        results[position] = embedding
+                        self._remember(keys[position], embedding)
+
+            found = sum(embedding is not None for embedding in results)
+            self.hits += found
+            self.misses += len(results) - found
+
+        return results
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[np.ndarray]) -> None:
+        """Add embeddings for several texts to the cache"""
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                embedding = np.array(embedding, dtype=np.float32)
+                embedding.flags.writeable = False  # Cached arrays are shared between callers
+                self._remember(key, embedding)
+                rows.append((key[0], key[1], embedding.tobytes()))
+
+            if rows and self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None
+        }
+
+    def close(self) -> None:
+        """Close the persistent tier"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: Tuple[str, bytes], embedding: np.ndarray) -> None:
+        """Insert into the in-memory tier, evicting the least recently used entries"""
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, digests: Set[bytes]) -> Dict[bytes, np.ndarray]:
+        """Read embeddings for this model from the persistent tier, keyed by digest"""
+        found = {}
+        digests = list(digests)
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({','.join('?' * len(chunk))})",
+                [self.model_name] + chunk
+            )
+            for digest, vector in rows:
+                found[digest] = np.frombuffer(vector, dtype=np.float32)
+        return found
@@ -0,0 +1,205 @@
+"""
+Embedding storage for REX
+Growable float32 matrices kept in memory or in memory-mapped files
+"""
+from typing import Optional
+import logging
+import os
+import struct
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, format version, embedding dimension; padded to HEADER_SIZE bytes
+_MAGIC = b"REXEMB"
+_HEADER = struct.Struct("<6sHI")
+HEADER_SIZE = 64
+
+class EmbeddingMatrix:
+    """
+    Row storage for one index's embeddings
+    With a path, rows live in a raw float32 file mapped into memory, so opening an
+    existing store costs one mmap call and its pages are shared through the OS page
+    cache by every process that maps the same file
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None, initial_capacity: int = 256):
+        """
+        Create an empty matrix
+
+        Args:
+            dim: Embedding dimension
+            path: File to map (optional); any existing file is overwritten
+            initial_capacity: Number of rows to preallocate
+        """
+        self.dim = dim
+        self.path = path
+        self.array: np.ndarray = None
+
+        if path is None:
+            self.array = np.zeros((initial_capacity, dim), dtype=np.float32)
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, 1, dim).ljust(HEADER_SIZE, b"\0"))
+        self._map(initial_capacity)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["EmbeddingMatrix"]:
+        """
+        Map an existing embedding file
+
+        Returns:
+            The matrix, or None if the file is missing or not an embedding file
+        """
+        try:
+            with open(path, "rb") as f:
+                magic, version, dim = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != _MAGIC or version != 1 or dim <= 0:
+            logger.warning(f"Ignoring invalid embedding file {path}")
+            return None
+
+        matrix = cls.__new__(cls)
+        matrix.dim = dim
+        matrix.path = path
+        matrix.array = None
+        matrix._map((os.path.getsize(path) - HEADER_SIZE) // (dim * 4))
+        return matrix
+
+    @property
+    def capacity(self) -> int:
+        return self.array.shape[0]
+
+    @property
+    def mapped(self) -> bool:
+        """Whether rows are backed by a file"""
+        return self.path is not None
+
+    def row(self, row: int) -> np.ndarray:
+        """View of a single row"""
+        return self.array[row]
+
+    def reserve(self, rows: int) -> None:
+        """Grow (amortized doubling) so that at least rows rows fit"""
+        if rows <= self.capacity:
+            return
+        new_capacity = max(rows, self.capacity * 2)
+
+        if self.path is None:
+            array = np.zeros((new_capacity, self.dim), dtype=np.float32)
+            array[:self.capacity] = self.array
+            self.array = array
+        else:
+            # Views handed out earlier keep the old mapping alive until they are dropped
+            self.array.flush()
+            self._map(new_capacity)
+
+    def flush(self) -> None:
+        """Write dirty pages of a mapped matrix to its file"""
+        if self.path is not None:
+            self.array.flush()
+
+    def _map(self, capacity: int) -> None:
+        """(Re)map the file with room for capacity rows"""
+        capacity = max(capacity, 1)
+        size = HEADER_SIZE + capacity * self.dim * 4
+        if os.path.getsize(self.path) < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)  # Sparse on most filesystems until rows are written
+        self.array = np.memmap(self.path, dtype=np.float32, mode="r+", offset=HEADER_SIZE, shape=(capacity, self.dim))
+
+class QuantizedMatrix:
+    """
+    Compressed in-memory copy of an index's embeddings used for candidate scoring
+    float16 halves the footprint of float32 rows; int8 stores each row as signed
+    bytes with one float32 scale per row (max |value| / 127), a quarter of the size.
+    Scores are computed block by block so no full-size float32 copy is ever made
+    """
+
+    BLOCK_ROWS = 4096
+
+    def __init__(self, dim: int, dtype: str = "int8", initial_capacity: int = 256):
+        """
+        Create an empty matrix
+
+        Args:
+            dim: Embedding dimension
+            dtype: "float16" or "int8"
+            initial_capacity: Number of rows to preallocate
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported quantization {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.array = np.zeros((initial_capacity, dim), dtype=np.float16 if dtype == "float16" else np.int8)
+        self.scales = np.zeros(initial_capacity if dtype == "int8" else 0, dtype=np.float32)
+
+    @property
+    def capacity(self) -> int:
+        return self.array.shape[0]
+
+    @property
+    def mapped(self) -> bool:
+        return False
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated for codes and scales"""
+        return self.array.nbytes + self.scales.nbytes
+
+    def reserve(self, rows: int) -> None:
+        """Grow (amortized doubling) so that at least rows rows fit"""
+        if rows <= self.capacity:
+            return
+        new_capacity = max(rows, self.capacity * 2)
+        array = np.zeros((new_capacity, self.dim), dtype=self.array.dtype)
+        array[:self.capacity] = self.array
+        self.array = array
+        if self.dtype == "int8":
+            scales = np.zeros(new_capacity, dtype=np.float32)
+            scales[:self.scales.shape[0]] = self.scales
+            self.scales = scales
+
+    def set_rows(self, start: int, vectors: np.ndarray) -> None:
+        """Quantize vectors into rows start onwards"""
+        end = start + vectors.shape[0]
+        if self.dtype == "float16":
+            self.array[start:end] = vectors
+            return
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        self.array[start:end] = np.rint(vectors / scales[:, None])
+        self.scales[start:end] = scales
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Dequantized float32 copies of the given rows"""
+        vectors = self.array[rows].astype(np.float32)
+        if self.dtype == "int8":
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def row(self, row: int) -> np.ndarray:
+        """Dequantized copy of a single row"""
+        return self.take(np.array([row]))[0]
+
+    def scores(self, query: np.ndarray, size: int) -> np.ndarray:
+        """Dot products of the query with rows [0, size)"""
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, self.BLOCK_ROWS):
+            end = min(size, start + self.BLOCK_ROWS)
+            scores[start:end] = self.array[start:end].astype(np.float32) @ query
+        if self.dtype == "int8":
+            scores *= self.scales[:size]
+        return scores
+
+    def row_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot products of the query with the given rows"""
+        return self.take(rows) @ query
+
+    def flush(self) -> None:
+        """Nothing to write; the compressed matrix is rebuilt when the index is loaded"""
@@ -0,0 +1,198 @@
+"""
+Ingestion queue for REX
+Write-behind pipeline that encodes and stores memories outside the request path
+"""
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from models.memory import Memory
+from memory_system.memory_interface import MemoryInterface
+
+logger = logging.getLogger(__name__)
+
+# Queue item: (user id, session key or None, memories, future of their stored IDs)
+_Item = Tuple[str, Optional[str], List[Memory], "Future[List[str]]"]
+
+class IngestionQueue:
+    """
+    Bounded write-behind queue in front of MemoryManager.store_memories
+    Worker threads take whatever is queued (up to batch_size memories), encode it
+    in one model call and commit it per user. Writes are tracked per session so a
+    session can wait for its own earlier writes before reading (read-your-writes)
+    """
+
+    def __init__(self, memory_manager: MemoryInterface, config: Dict[str, Any]):
+        """
+        Start the workers
+
+        Args:
+            memory_manager: Memory manager the memories are committed to
+            config: Application configuration; reads the "ingestion" section
+        """
+        ingestion_config = config.get("ingestion", {})
+        self.memory_manager = memory_manager
+        self.batch_size = ingestion_config.get("batch_size", 64)
+        self.batch_wait = ingestion_config.get("batch_wait_ms", 5) / 1000.0
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue(maxsize=ingestion_config.get("max_queue", 1000))
+        self._condition = threading.Condition()
+        self._outstanding = 0  # Submitted memories not committed yet
+        self._sessions: Dict[str, int] = {}  # Session key -> outstanding memories
+        self._workers = [
+            threading.Thread(target=self._run, name=f"rex-ingest-{i}", daemon=True)
+            for i in range(max(1, ingestion_config.get("workers", 1)))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, user_id: str, memories: List[Memory], session_id: Optional[str] = None) -> "Future[List[str]]":
+        """
+        Queue memories for storage; blocks while the queue is full
+
+        Args:
+            user_id: Unique identifier for the user
+            memories: Memories to store
+            session_id: Session the memories came from, for read-your-writes (optional)
+
+        Returns:
+            Future of the IDs the memories are stored under, set once they are
+            committed; a repeat of a stored memory gets the existing memory's ID.
+            The future raises the storage error if the commit failed
+        """
+        future: "Future[List[str]]" = Future()
+        if not memories:
+            future.set_result([])
+            return future
+        session_key = f"{user_id}:{session_id}" if session_id is not None else None
+        with self._condition:
+            self._outstanding += len(memories)
+            self.submitted += len(memories)
+            if session_key is not None:
+                self._sessions[session_key] = self._sessions.get(session_key, 0) + len(memories)
+        self._queue.put((user_id, session_key, memories, future))
+        return future
+
+    def wait_for_session(self, user_id: str, session_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything a session submitted so far is stored
+
+        Returns:
+            False if the timeout expired first
+        """
+        session_key = f"{user_id}:{session_id}"
+        with self._condition:
+            return self._condition.wait_for(lambda: session_key not in self._sessions, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every submitted memory is stored
+
+        Returns:
+            False if the timeout expired first
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Drain the queue and stop the workers"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        logger.info(f"Ingestion queue closed ({self.committed} memories stored, {self.failed} failed)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue counters for monitoring"""
+        return {
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "failed": self.failed,
+            "outstanding": self._outstanding,
+            "queued_batches": self._queue.qsize()
+        }
+
+    def _run(self) -> None:
+        """Worker loop: collect a batch, commit it, repeat until told to stop"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = self._collect(batch)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _collect(self, batch: List[_Item]) -> bool:
+        """
+        Add queued items to the batch until it is full or nothing arrives within batch_wait
+
+        Returns:
+            True if the stop marker was taken from the queue
+        """
+        size = len(batch[0][2])
+        deadline = time.monotonic() + self.batch_wait
+        while size < self.batch_size:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                return True
+            batch.append(item)
+            size += len(item[2])
+        return False
+
+    def _commit(self, batch: List[_Item]) -> None:
+        """Encode a batch in one model call and store it per user, in submission order"""
+        stored = 0
+        results: Dict[int, List[str]] = {}  # Position in the batch -> stored IDs
+        error: Optional[Exception] = None
+        try:
+            by_user: Dict[str, List[int]] = {}
+            for position, (user_id, _, _, _) in enumerate(batch):
+                by_user.setdefault(user_id, []).append(position)
+            # Repeats of stored memories only bump a hit count, so they need no embedding
+            pending = []
+            for user_id, positions in by_user.items():
+                memories = [memory for position in positions for memory in batch[position][2]]
+                duplicates = self.memory_manager.find_duplicates(user_id, memories)
+                pending.extend(memory for memory, duplicate in zip(memories, duplicates) if duplicate is None)
+            self.memory_manager.encode_turn(pending, [])
+            for user_id, positions in by_user.items():
+                memory_ids = self.memory_manager.store_memories(
+                    user_id, [memory for position in positions for memory in batch[position][2]]
+                )
+                for position in positions:
+                    count = len(batch[position][2])
+                    results[position], memory_ids = memory_ids[:count], memory_ids[count:]
+                    stored += count
+        except Exception as e:
+            logger.error(f"Error storing queued memories: {str(e)}")
+            error = e
+
+        total = sum(len(memories) for _, _, memories, _ in batch)
+        with self._condition:
+            self.committed += stored
+            self.failed += total - stored
+            self._outstanding -= total
+            for _, session_key, memories, _ in batch:
+                if session_key is not None:
+                    remaining = self._sessions[session_key] - len(memories)
+                    if remaining:
+                        self._sessions[session_key] = remaining
+                    else:
+                        del self._sessions[session_key]
+            self._condition.notify_all()
+        for position, (_, _, _, future) in enumerate(batch):
+            if position in results:
+                future.set_result(results[position])
+            else:
+                future.set_exception(error)
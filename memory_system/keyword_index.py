@@ -0,0 +1,153 @@
+"""
+Keyword index for REX
+Per-user inverted index with BM25 scoring and rank fusion helpers for hybrid retrieval
+"""
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import logging
+import numpy as np
+
+from models.memory import Memory, MemoryCategory
+from memory_system.vector_index import CATEGORY_CODES
+from utils.text_processing import tokenize
+
+logger = logging.getLogger(__name__)
+
+class KeywordIndex:
+    """
+    Per-user inverted index
+    Maps each term to compact arrays of (row, term frequency) postings and keeps
+    document lengths and category codes in parallel arrays. Memories are only ever
+    appended, so postings stay sorted by row and indexing a memory touches just the
+    postings of its own terms
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize an empty index
+
+        Args:
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}  # term -> (rows, term frequencies)
+        self._lengths = array("i")  # Number of terms per memory
+        self._categories = array("b")
+        self._memories: List[Memory] = []
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._memories)
+
+    def add_batch(self, memories: Sequence[Memory]) -> None:
+        """Index several memories"""
+        for memory in memories:
+            row = len(self._memories)
+            terms = tokenize(memory.content)
+            for term, frequency in Counter(terms).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("i"), array("i"))
+                postings[0].append(row)
+                postings[1].append(frequency)
+            self._lengths.append(len(terms))
+            self._categories.append(CATEGORY_CODES[memory.category])
+            self._memories.append(memory)
+            self._total_length += len(terms)
+
+    def search(self,
+               terms: Sequence[str],
+               limit: int,
+               categories: Optional[Sequence[MemoryCategory]] = None,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[Memory, float, int]]:
+        """
+        Rank memories containing any of the terms by BM25
+
+        Args:
+            terms: Query terms (already tokenized)
+            limit: Maximum number of results
+            categories: Restrict the search to these categories (optional)
+            rows: Only rank these rows, e.g. a time window (optional); memories are
+                added to this index and the user's VectorIndex together, so rows match
+
+        Returns:
+            List of (memory, BM25 score, number of distinct query terms matched), best first
+        """
+        # Memories are appended last, so rows below this size are fully indexed even
+        # while another thread adds more. Arrays are read through copies: a buffer
+        # exported to numpy would make a concurrent append fail
+        size = len(self._memories)
+        if size == 0 or limit <= 0:
+            return []
+
+        lengths = np.frombuffer(self._lengths[:size], dtype=np.int32)
+        average_length = self._total_length / size or 1.0
+        term_postings, contributions = [], []
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            term_rows = np.frombuffer(postings[0][:len(postings[1])], dtype=np.int32)
+            count = int(np.searchsorted(term_rows, size))
+            if count == 0:
+                continue
+            term_rows = term_rows[:count]
+            frequencies = np.frombuffer(postings[1][:count], dtype=np.int32).astype(np.float32)
+            idf = math.log(1.0 + (size - term_rows.shape[0] + 0.5) / (term_rows.shape[0] + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[term_rows] / average_length)
+            term_postings.append(term_rows)
+            contributions.append(idf * frequencies * (self.k1 + 1.0) / (frequencies + norm))
+        if not term_postings:
+            return []
+
+        # Sum per-term contributions for every matching row
+        matched_rows, inverse = np.unique(np.concatenate(term_postings), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        matches = np.bincount(inverse)
+
+        if rows is not None:
+            keep = np.isin(matched_rows, rows, assume_unique=True)
+            matched_rows, scores, matches = matched_rows[keep], scores[keep], matches[keep]
+
+        if categories:
+            codes = np.frombuffer(self._categories[:size], dtype=np.int8)[matched_rows]
+            keep = np.isin(codes, [CATEGORY_CODES[category] for category in categories])
+            matched_rows, scores, matches = matched_rows[keep], scores[keep], matches[keep]
+        if matched_rows.shape[0] == 0:
+            return []
+
+        if scores.shape[0] > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [(self._memories[matched_rows[i]], float(scores[i]), int(matches[i])) for i in top]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Memory]], k: int = 60, limit: int = 5) -> List[Memory]:
+    """
+    Merge ranked lists by reciprocal rank fusion
+
+    Each memory scores sum(1 / (k + rank)) over the lists it appears in, so
+    lists with incomparable scores (cosine similarity, BM25) can be combined
+
+    Args:
+        rankings: Ranked lists of memories, best first
+        k: Rank offset; larger values flatten the contribution of top ranks
+        limit: Maximum number of results
+
+    Returns:
+        Fused list of memories, best first
+    """
+    scores: Dict[str, float] = {}
+    memories: Dict[str, Memory] = {}
+    for ranking in rankings:
+        for rank, memory in enumerate(ranking, start=1):
+            scores[memory.id] = scores.get(memory.id, 0.0) + 1.0 / (k + rank)
+            memories.setdefault(memory.id, memory)
+    # Python's sort is stable, so ties keep the order of the first ranking
+    ranked = sorted(memories, key=lambda memory_id: scores[memory_id], reverse=True)
+    return [memories[memory_id] for memory_id in ranked[:limit]]
@@ -0,0 +1,447 @@
+"""
+Memory interface for REX
+The memory API shared by the local MemoryManager and the memory service client
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import hashlib
+import logging
+import numpy as np
+
+from models.memory import Memory, MemoryCategory
+from memory_system.embedding_cache import EmbeddingCache, normalize_text
+from memory_system import model_registry
+from utils.text_processing import extract_entities, extract_preferences, extract_time_range
+from utils.executor import create_encoder_pool
+
+logger = logging.getLogger(__name__)
+
+class MemoryInterface:
+    """
+    Interface of a memory manager, as used by the conversation manager and the API
+    The MemoryManager implements it on a store in this process; API workers
+    implement it with calls to a memory service
+    """
+
+    embedding_model_name: str
+
+    def store_memory(self, user_id: str, memory: Memory) -> str:
+        """Store one memory and return its ID"""
+        raise NotImplementedError
+
+    def store_memories(self, user_id: str, memories: List[Memory]) -> List[str]:
+        """Store several memories, merging repeats of stored ones; returns the stored IDs in order"""
+        raise NotImplementedError
+
+    def store_batch(self, user_id: str, items: List[Tuple[str, List[Memory]]]) -> List[Tuple[bool, List[str]]]:
+        """Store the memories of several keyed client items; returns (newly stored, IDs) per item"""
+        raise NotImplementedError
+
+    def find_duplicates(self, user_id: str, memories: List[Memory]) -> List[Optional[Memory]]:
+        """The stored memory with the same category and content, or None, per memory"""
+        raise NotImplementedError
+
+    def retrieve_memories(self,
+                          user_id: str,
+                          query: str,
+                          categories: Optional[List[MemoryCategory]] = None,
+                          limit: int = 5,
+                          query_embedding: Optional[np.ndarray] = None,
+                          since: Optional[Any] = None,
+                          until: Optional[Any] = None) -> List[Memory]:
+        """Memories relevant to a query, best first"""
+        raise NotImplementedError
+
+    def list_memories_page(self,
+                           user_id: str,
+                           category: Optional[MemoryCategory] = None,
+                           limit: int = 10,
+                           after: Optional[str] = None) -> Tuple[List[Memory], Optional[str]]:
+        """One page of a user's memories, newest first, with the cursor of the next page"""
+        raise NotImplementedError
+
+    def memory_ids(self, user_id: str) -> List[str]:
+        """IDs of a user's memories, in insertion order"""
+        raise NotImplementedError
+
+    def embedding_dim(self, user_id: str) -> Optional[int]:
+        """Dimension of a user's embeddings, or None if the user has no memories"""
+        raise NotImplementedError
+
+    def iter_memories(self, user_id: str, chunk_size: int = 1000, start: int = 0) -> Iterator[Tuple[List[Memory], np.ndarray]]:
+        """Walk a user's memories in insertion order as (memories, embeddings) chunks"""
+        raise NotImplementedError
+
+    def remove_memories(self, user_id: str, memory_ids: List[str], replacements: Optional[List[Memory]] = None) -> int:
+        """Delete memories, optionally storing replacements; returns how many were removed"""
+        raise NotImplementedError
+
+    def encode_turn(self, memories: List[Memory], queries: List[str]) -> List[np.ndarray]:
+        """Encode a turn's new memories (in place) and queries in one model call"""
+        raise NotImplementedError
+
+    def extract_memories(self, text: str, context: Dict[str, Any]) -> List[Memory]:
+        """Extract potential memories from text without storing or encoding them"""
+        raise NotImplementedError
+
+    def process_memory_trigger(self, user_id: str, trigger_phrase: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a "REX, ..." memory trigger phrase"""
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """Load the embedding model and run a dummy batch through it"""
+        raise NotImplementedError
+
+    @property
+    def ready(self) -> bool:
+        """Whether the embedding model is loaded and warm"""
+        raise NotImplementedError
+
+    def snapshot(self) -> None:
+        """Compact persisted state, where the implementation persists any"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources"""
+        raise NotImplementedError
+
+class MemoryHelpersMixin:
+    """
+    Text analysis, embedding and trigger handling shared by MemoryInterface implementations
+    None of it touches a store: memories are stored and retrieved through the
+    implementation's store_memories and retrieve_memories
+    """
+
+    def _init_helpers(self, config: Dict[str, Any]) -> None:
+        """Set up configuration, the embedding cache, the encoder pool and the trigger handlers"""
+        self.config = config
+        dedup_config = config.get("memory_dedup", {})
+        self.dedup_enabled = dedup_config.get("enabled", True)
+        self.dedup_excluded = {MemoryCategory(c) for c in dedup_config.get("exclude_categories", ["timeline"])}
+        self.embedding_model_name = config.get("embedding_model", "all-MiniLM-L6-v2")  # Loaded on first use
+        self.embedding_cache = self._create_embedding_cache()
+        self.encoder_pool = create_encoder_pool(config)  # Optional model worker processes
+        self.memory_triggers = {
+            "recall": self._handle_recall_trigger,
+            "remember": self._handle_remember_trigger,
+            "what did we say about": self._handle_what_did_we_say_trigger,
+            "update on": self._handle_update_trigger
+        }
+    
+    @property
+    def embedding_model(self) -> Any:
+        """The configured embedding model (shared by every manager in the process)"""
+        return model_registry.get_embedding_model(self.embedding_model_name)
+    
+    def warm_up(self) -> None:
+        """Load the embedding model and run a dummy batch through it"""
+        if self.encoder_pool is not None:
+            self.encoder_pool.warm_up()
+        else:
+            model_registry.warm_up(self.embedding_model_name, self.config.get("embedding_batch_size", 64))
+    
+    @property
+    def ready(self) -> bool:
+        """Whether the embedding model is loaded and warm"""
+        if self.encoder_pool is not None:
+            return self.encoder_pool.ready
+        return model_registry.is_warm(self.embedding_model_name)
+    
+    def store_memory(self, user_id: str, memory: Memory) -> str:
+        """
+        Store a new memory in the appropriate category
+        
+        Args:
+            user_id: Unique identifier for the user
+            memory: Memory object to store
+            
+        Returns:
+            memory_id: Unique identifier for the stored memory
+        """
+        return self.store_memories(user_id, [memory])[0]
+    
+    def encode_turn(self, memories: List[Memory], queries: List[str]) -> List[np.ndarray]:
+        """
+        Encode every text needed for one conversation turn in a single model call
+        
+        Args:
+            memories: Memories about to be stored (embeddings are attached in place)
+            queries: Query texts that will be used for retrieval in this turn
+            
+        Returns:
+            Query embeddings in the same order as queries
+        """
+        pending = [memory for memory in memories if memory.embedding is None]
+        embeddings = self._generate_embeddings([memory.content for memory in pending] + list(queries))
+        for memory, embedding in zip(pending, embeddings):
+            memory.embedding = embedding
+        return list(embeddings[len(pending):])
+    
+    def list_memories(self,
+                      user_id: str,
+                      category: Optional[MemoryCategory] = None,
+                      limit: int = 10) -> List[Memory]:
+        """
+        List a user's newest memories
+        
+        Args:
+            user_id: Unique identifier for the user
+            category: Only list memories in this category (optional)
+            limit: Maximum number of memories to return
+            
+        Returns:
+            Memories, newest first
+        """
+        return self.list_memories_page(user_id, category, limit)[0]
+    
+    def process_memory_trigger(self, 
+                              user_id: str, 
+                              trigger_phrase: str, 
+                              context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Process a memory trigger phrase and return relevant memories
+        
+        Args:
+            user_id: Unique identifier for the user
+            trigger_phrase: The trigger phrase used (e.g., "REX, recall...")
+            context: Additional context for the trigger
+            
+        Returns:
+            Dictionary containing recalled memories and related information
+        """
+        # Extract the trigger type and topic
+        trigger_parts = trigger_phrase.split("REX, ", 1)
+        if len(trigger_parts) < 2:
+            logger.warning(f"Invalid trigger phrase format: {trigger_phrase}")
+            return {"error": "Invalid trigger phrase format"}
+        
+        trigger_content = trigger_parts[1]
+        
+        # Identify which trigger type was used
+        for trigger_key, handler in self.memory_triggers.items():
+            if trigger_content.lower().startswith(trigger_key):
+                topic = trigger_content[len(trigger_key):].strip()
+                topic, context = self._scope_to_time_range(topic, context)
+                return handler(user_id, topic, context)
+        
+        # Default handling if no specific trigger matched
+        trigger_content, context = self._scope_to_time_range(trigger_content, context)
+        return self._default_memory_retrieval(user_id, trigger_content, context)
+    
+    def _scope_to_time_range(self, topic: str, context: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Turn a time phrase in a trigger's topic ("yesterday", "last week") into since/until in the context"""
+        time_range = extract_time_range(topic)
+        if not time_range:
+            return topic, context
+        return time_range["text"], dict(context, since=time_range["since"], until=time_range["until"])
+    
+    def extract_and_store_memories(self, 
+                                  user_id: str, 
+                                  text: str, 
+                                  context: Dict[str, Any]) -> List[str]:
+        """
+        Extract potential memories from text and store them
+        
+        Args:
+            user_id: Unique identifier for the user
+            text: Text to extract memories from
+            context: Additional context for memory extraction
+            
+        Returns:
+            List of memory IDs that were stored
+        """
+        return self.store_memories(user_id, self.extract_memories(text, context))
+    
+    def extract_memories(self, text: str, context: Dict[str, Any]) -> List[Memory]:
+        """
+        Extract potential memories from text without storing or encoding them
+        
+        Args:
+            text: Text to extract memories from
+            context: Additional context for memory extraction
+            
+        Returns:
+            List of unsaved Memory objects
+        """
+        memories = []
+        source = context.get('source', 'conversation')
+        metadata = {"extracted_from": text[:100] + "..."}
+        
+        # Extract entities and categorize them
+        entities = extract_entities(text)
+        
+        # Process people entities
+        for person in entities.get('people', []):
+            memories.append(Memory(
+                category=MemoryCategory.PEOPLE,
+                content=f"Person: {person}",
+                source=source,
+                metadata=dict(metadata)
+            ))
+        
+        # Process topic entities
+        for topic in entities.get('topics', []):
+            memories.append(Memory(
+                category=MemoryCategory.TOPICS,
+                content=f"Topic: {topic}",
+                source=source,
+                metadata=dict(metadata)
+            ))
+        
+        # Process preferences (if detected)
+        for pref in self._extract_preferences(text):
+            memories.append(Memory(
+                category=MemoryCategory.PREFERENCES,
+                content=f"Preference: {pref}",
+                source=source,
+                metadata=dict(metadata)
+            ))
+        
+        return memories
+    
+    def _content_key(self, memory: Memory) -> Optional[bytes]:
+        """Hash identifying a memory's category and normalized content, None if it is never deduplicated"""
+        if not self.dedup_enabled or memory.category in self.dedup_excluded:
+            return None
+        text = memory.category.value + "\0" + normalize_text(memory.content)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    
+    def _attach_embeddings(self, memories: List[Memory]) -> None:
+        """Encode memory contents in one batch and attach the embeddings"""
+        embeddings = self._generate_embeddings([memory.content for memory in memories])
+        for memory, embedding in zip(memories, embeddings):
+            memory.embedding = embedding
+    
+    def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate embedding vectors for several texts in a single model call"""
+        if not texts:
+            return np.zeros((0, 384), dtype=np.float32)
+        
+        # Encode each distinct text once, skipping texts that are already cached
+        unique_texts = list(dict.fromkeys(texts))
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get_many(unique_texts)
+        else:
+            cached = [None] * len(unique_texts)
+        misses = [text for text, embedding in zip(unique_texts, cached) if embedding is None]
+        
+        encoded = {}
+        if misses:
+            try:
+                batch_size = self.config.get("embedding_batch_size", 64)
+                if self.encoder_pool is not None:
+                    vectors = self.encoder_pool.encode(misses, batch_size=batch_size)
+                else:
+                    vectors = self.embedding_model.encode(misses, batch_size=batch_size)
+                encoded = dict(zip(misses, vectors))
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(misses, vectors)
+            except Exception as e:
+                logger.error(f"Error generating embeddings: {str(e)}")
+        
+        embeddings = {}
+        for text, embedding in zip(unique_texts, cached):
+            if embedding is None:
+                embedding = encoded.get(text)
+            if embedding is None:
+                embedding = np.zeros(384, dtype=np.float32)  # Default embedding size for the model
+            embeddings[text] = embedding
+        return np.array([embeddings[text] for text in texts], dtype=np.float32)
+    
+    def _create_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """Create the embedding cache described by the configuration"""
+        cache_config = self.config.get("embedding_cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        return EmbeddingCache(
+            model_name=self.embedding_model_name,
+            max_entries=cache_config.get("max_entries", 50000),
+            persist_path=cache_config.get("persist_path")
+        )
+    
+    def _generate_embedding(self, text: str) -> np.ndarray:
+        """Generate embedding vector for text"""
+        return self._generate_embeddings([text])[0]
+    
+    def _extract_preferences(self, text: str) -> List[str]:
+        """Extract user preferences from text"""
+        return extract_preferences(text)
+    
+    # Memory trigger handlers
+    def _handle_recall_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle 'recall' memory trigger"""
+        memories = self.retrieve_memories(
+            user_id=user_id,
+            query=topic,
+            limit=self.config.get("memory_recall_limit", 3),
+            since=context.get("since"),
+            until=context.get("until")
+        )
+        return {
+            "topic": topic,  # Preserve the original case of the topic
+            "memories": [memory.to_dict() for memory in memories],
+            "trigger_type": "recall"
+        }
+    
+    def _handle_remember_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle 'remember our discussion about' memory trigger"""
+        # This specifically targets conversation history
+        memories = self.retrieve_memories(
+            user_id=user_id,
+            query=f"discussion about {topic}",
+            categories=[MemoryCategory.TIMELINE],
+            limit=self.config.get("memory_recall_limit", 3),
+            since=context.get("since"),
+            until=context.get("until")
+        )
+        return {
+            "topic": topic,  # Preserve the original case of the topic
+            "memories": [memory.to_dict() for memory in memories],
+            "trigger_type": "remember_discussion"
+        }
+    
+    def _handle_what_did_we_say_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle 'what did we say about' memory trigger"""
+        # Similar to remember but with different phrasing
+        memories = self.retrieve_memories(
+            user_id=user_id,
+            query=topic,
+            limit=self.config.get("memory_recall_limit", 3),
+            since=context.get("since"),
+            until=context.get("until")
+        )
+        return {
+            "topic": topic,  # Preserve the original case of the topic
+            "memories": [memory.to_dict() for memory in memories],
+            "trigger_type": "what_did_we_say"
+        }
+    
+    def _handle_update_trigger(self, user_id: str, project: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle 'update on' memory trigger for projects"""
+        memories = self.retrieve_memories(
+            user_id=user_id,
+            query=project,
+            categories=[MemoryCategory.PROJECTS],
+            limit=self.config.get("memory_recall_limit", 5),
+            since=context.get("since"),
+            until=context.get("until")
+        )
+        return {
+            "project": project,  # Preserve the original case of the project name
+            "memories": [memory.to_dict() for memory in memories],
+            "trigger_type": "project_update"
+        }
+    
+    def _default_memory_retrieval(self, user_id: str, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Default memory retrieval when no specific trigger matches"""
+        memories = self.retrieve_memories(
+            user_id=user_id,
+            query=query,
+            limit=self.config.get("memory_recall_limit", 3),
+            since=context.get("since"),
+            until=context.get("until")
+        )
+        return {
+            "query": query,
+            "memories": [memory.to_dict() for memory in memories],
+            "trigger_type": "general"
+        }
@@ -2,20 +2,51 @@
 Memory Manager for REX
 Handles storage, retrieval, and organization of memory categories
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from array import array
+import base64
+import bisect
+import heapq
+import itertools
 import logging
 from datetime import datetime
-import json
+import hashlib
+import os
+import threading
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 
-from models.memory import Memory, MemoryCategory
-from utils.text_processing import extract_entities, extract_keywords
+from models.memory import Memory, MemoryCategory, to_timestamp_us
+from memory_system.vector_index import VectorIndex
+from memory_system.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from memory_system.embedding_cache import normalize_text
+from memory_system.result_cache import ResultCache
+from memory_system.persistence import MemoryStorage, create_storage
+from memory_system.memory_interface import MemoryHelpersMixin, MemoryInterface
+from utils.text_processing import extract_keywords
 
 logger = logging.getLogger(__name__)
 
-class MemoryManager:
+def encode_cursor(memory: Memory) -> str:
+    """Opaque pagination cursor pointing at a memory's place in time order"""
+    return base64.urlsafe_b64encode(f"{memory.timestamp_us}:{memory.id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Decode a pagination cursor
+
+    Returns:
+        (timestamp in microseconds, memory id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, memory_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8").split(":", 1)
+        return int(timestamp), memory_id
+    except (UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class MemoryManager(MemoryHelpersMixin, MemoryInterface):
     """
     Manages the memory system for REX
     Handles storage, retrieval, and organization of memories across different categories
@@ -23,280 +54,768 @@ class MemoryManager:
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize the memory manager with configuration"""
-        self.config = config
-        self.memory_store = {}  # User-based memory storage
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.memory_triggers = {
-            "recall": self._handle_recall_trigger,
-            "remember": self._handle_remember_trigger,
-            "what did we say about": self._handle_what_did_we_say_trigger,
-            "update on": self._handle_update_trigger
-        }
+        self.memory_store = {}  # User-based memory storage; each category list in (timestamp, id) order
+        self.time_keys: Dict[str, Dict[str, array]] = {}  # Per user and category: timestamp_us of each listed memory
+        self.indexes: Dict[str, VectorIndex] = {}  # Per-user embedding index
+        self.keyword_indexes: Dict[str, KeywordIndex] = {}  # Per-user inverted index
+        self.content_index: Dict[str, Dict[bytes, Memory]] = {}  # Per-user content hash -> memory, for dedup
+        self.idempotency_index: Dict[str, Dict[str, List[str]]] = {}  # Per-user batch item key -> memory IDs
+        self._reserved_keys: Dict[str, Dict[str, threading.Event]] = {}  # Per-user keys being stored by store_batch
+        self.versions: Dict[str, int] = {}  # Per-user counter bumped by every write, for result caching
+        self._init_helpers(config)
+        self.result_cache = self._create_result_cache()
+        
+        # Durable storage: replay persisted memories before serving requests
+        self._lock = threading.RLock()  # Guards memory_store, indexes and storage ordering
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._unmapped: set = set()  # Users with mapped embeddings rebuilt in memory until the next snapshot
+        self.storage: Optional[MemoryStorage] = create_storage(config)
+        if self.storage is not None:
+            self._load_from_storage()
         logger.info("Memory Manager initialized")
     
-    def store_memory(self, user_id: str, memory: Memory) -> str:
+    def store_memories(self, user_id: str, memories: List[Memory]) -> List[str]:
         """
-        Store a new memory in the appropriate category
+        Store several memories at once, encoding them in a single model call
+        
+        Memories that already carry an embedding (e.g. from encode_turn) are not re-encoded.
+        A memory whose category and content match an existing memory is not stored
+        again; the existing memory's hit_count and last_seen metadata are updated instead.
         
         Args:
             user_id: Unique identifier for the user
-            memory: Memory object to store
+            memories: Memory objects to store
             
         Returns:
-            memory_id: Unique identifier for the stored memory
+            List of memory IDs in the same order as the input (the existing memory's ID for duplicates)
         """
-        # Initialize user memory store if it doesn't exist
-        if user_id not in self.memory_store:
-            self.memory_store[user_id] = {
-                category.value: [] for category in MemoryCategory
-            }
+        if not memories:
+            return []
         
-        # Generate memory embedding
-        memory.embedding = self._generate_embedding(memory.content)
+        # Generate embeddings for every new memory that doesn't have one yet
+        self._attach_embeddings([
+            memory for memory in memories
+            if memory.embedding is None and self.find_duplicate(user_id, memory) is None
+        ])
         
         # Add timestamp if not provided
-        if not memory.timestamp:
-            memory.timestamp = datetime.now().isoformat()
+        for memory in memories:
+            if not memory.timestamp:
+                memory.timestamp = datetime.now().isoformat()
         
-        # Store memory in appropriate category
-        self.memory_store[user_id][memory.category.value].append(memory)
+        # Log and apply under one lock so snapshots see a consistent cut
+        tickets = []
+        with self._lock:
+            new_memories, touched, stored = self._deduplicate(user_id, memories)
+            if new_memories:
+                self._attach_embeddings([memory for memory in new_memories if memory.embedding is None])
+                if self.storage is not None:
+                    tickets.append(self.storage.append(user_id, new_memories))
+                self._add_to_store(user_id, new_memories)
+            if touched:
+                self._bump_version(user_id)
+                if self.storage is not None:
+                    tickets.append(self.storage.update(user_id, touched))
+        
+        if self.storage is not None:
+            for ticket in tickets:
+                self.storage.sync(ticket)
+            self._maybe_snapshot()
+        
+        logger.info(f"Stored {len(new_memories)} memories for user {user_id} ({len(memories) - len(new_memories)} duplicates)")
+        return [memory.id for memory in stored]
+    
+    def store_batch(self, user_id: str, items: List[Tuple[str, List[Memory]]]) -> List[Tuple[bool, List[str]]]:
+        """
+        Store the memories of several client items, each at most once per idempotency key
+        
+        Memories of every new item are encoded together and written in one storage
+        append. Each memory records its item's key in metadata["idempotency_key"];
+        when some of an item's memories repeat stored ones, the item's IDs are
+        recorded in metadata["idempotency_keys"] of a repeated memory. Keys are
+        thus persisted with the memories and survive restarts. Keys are reserved
+        under the lock and the memories stored outside it, so a storage sync
+        doesn't hold up other callers; a concurrent call with a reserved key
+        waits for it.
+        
+        Args:
+            user_id: Unique identifier for the user
+            items: (idempotency key, memories) pairs
+            
+        Returns:
+            (stored, memory IDs) per item; stored is False when the key was already
+            stored, and the IDs are then those recorded for the key
+        """
+        known = self.idempotency_index.get(user_id, {})
+        self._attach_embeddings([
+            memory for key, memories in items if key not in known
+            for memory in memories
+            if memory.embedding is None and self.find_duplicate(user_id, memory) is None
+        ])
+        
+        reservation = threading.Event()
+        while True:
+            with self._lock:
+                known = self.idempotency_index.get(user_id, {})
+                reserved = self._reserved_keys.setdefault(user_id, {})
+                pending = next((reserved[key] for key, _ in items if key in reserved and key not in known), None)
+                if pending is None:
+                    seen: Dict[str, int] = {}  # Key -> position of the item that stores it in this batch
+                    new_items = []
+                    for position, (key, memories) in enumerate(items):
+                        if key in known or key in seen:
+                            continue
+                        seen[key] = position
+                        reserved[key] = reservation
+                        for memory in memories:
+                            memory.metadata = dict(memory.metadata, idempotency_key=key)
+                        new_items.append(position)
+                    break
+            pending.wait()
+        
+        stored_ids: Dict[int, List[str]] = {}
+        ticket = None
+        try:
+            memory_ids = self.store_memories(
+                user_id, [memory for position in new_items for memory in items[position][1]]
+            )
+            with self._lock:
+                touched: Dict[str, Memory] = {}
+                for position in new_items:
+                    key, memories = items[position]
+                    count = len(memories)
+                    stored_ids[position], memory_ids = memory_ids[:count], memory_ids[count:]
+                    self.idempotency_index.setdefault(user_id, {})[key] = stored_ids[position]
+                    
+                    # Memories that repeated stored ones don't carry the key; record it on one of those
+                    repeated = (
+                        self.find_duplicate(user_id, memory)
+                        for memory, memory_id in zip(memories, stored_ids[position]) if memory_id != memory.id
+                    )
+                    existing = next((memory for memory in repeated if memory is not None), None)
+                    if existing is not None:
+                        item_keys = dict(existing.metadata.get("idempotency_keys", {}))
+                        item_keys[key] = stored_ids[position]
+                        existing.metadata = dict(existing.metadata, idempotency_keys=item_keys)
+                        touched[existing.id] = existing
+                if touched:
+                    self._bump_version(user_id)
+                    if self.storage is not None:
+                        ticket = self.storage.update(user_id, list(touched.values()))
+        finally:
+            with self._lock:
+                for position in new_items:
+                    self._reserved_keys[user_id].pop(items[position][0], None)
+            reservation.set()
+        if ticket is not None:
+            self.storage.sync(ticket)
+        
+        return [
+            (True, stored_ids[position]) if position in stored_ids
+            else (False, list(self.idempotency_index[user_id][key]))
+            for position, (key, _) in enumerate(items)
+        ]
+    
+    def find_duplicate(self, user_id: str, memory: Memory) -> Optional[Memory]:
+        """
+        Find a stored memory with the same category and content
+        
+        Args:
+            user_id: Unique identifier for the user
+            memory: Memory to look up
+            
+        Returns:
+            The stored memory, or None if there is none (or the category is not deduplicated)
+        """
+        key = self._content_key(memory)
+        if key is None:
+            return None
+        return self.content_index.get(user_id, {}).get(key)
+    
+    def find_duplicates(self, user_id: str, memories: List[Memory]) -> List[Optional[Memory]]:
+        """
+        find_duplicate for several memories at once
+        
+        Args:
+            user_id: Unique identifier for the user
+            memories: Memories to look up
+            
+        Returns:
+            The stored memory or None, per memory
+        """
+        return [self.find_duplicate(user_id, memory) for memory in memories]
+    
+    def memory_ids(self, user_id: str) -> List[str]:
+        """IDs of a user's memories, in insertion order"""
+        self._poll_storage(user_id)
+        index = self.indexes.get(user_id)
+        return [memory.id for memory in index.memories] if index is not None else []
+    
+    def embedding_dim(self, user_id: str) -> Optional[int]:
+        """Dimension of a user's embeddings, or None if the user has no memories"""
+        index = self.indexes.get(user_id)
+        return index.dim if index is not None else None
+    
+    def category_lists(self, user_id: str) -> Optional[Dict[str, List[Memory]]]:
+        """
+        Copies of a user's category lists, taken under the lock so concurrent writes don't interleave
         
-        logger.info(f"Stored memory for user {user_id} in category {memory.category.value}")
-        return memory.id
+        Returns:
+            Category value -> memories in (timestamp, id) order, or None if the user has no memories
+        """
+        with self._lock:
+            store = self.memory_store.get(user_id)
+            if store is None:
+                return None
+            return {category: list(memories) for category, memories in store.items()}
     
     def retrieve_memories(self, 
                          user_id: str, 
                          query: str, 
                          categories: Optional[List[MemoryCategory]] = None,
-                         limit: int = 5) -> List[Memory]:
+                         limit: int = 5,
+                         query_embedding: Optional[np.ndarray] = None,
+                         since: Optional[Any] = None,
+                         until: Optional[Any] = None) -> List[Memory]:
         """
         Retrieve relevant memories based on query and categories
         
+        Vector similarity and BM25 keyword rankings are fused by reciprocal rank;
+        when the best keyword match contains every query keyword the vector search
+        (and the query encode) is skipped. With since/until, the time window is
+        found by bisecting the time-ordered category lists and only its memories
+        are scored, so a time-scoped recall costs O(log n + window). Results are
+        cached until the user's memories next change; the cache is keyed by the
+        query text, so a query_embedding must be the embedding of query.
+        
         Args:
             user_id: Unique identifier for the user
             query: Query text to search for relevant memories
             categories: List of memory categories to search in (optional)
             limit: Maximum number of memories to return
+            query_embedding: Precomputed embedding of query (optional)
+            since: Only memories at or after this datetime or ISO timestamp (optional)
+            until: Only memories before this datetime or ISO timestamp (optional)
             
         Returns:
             List of relevant Memory objects
         """
+        self._poll_storage(user_id)
         if user_id not in self.memory_store:
             logger.info(f"No memories found for user {user_id}")
             return []
         
-        # Generate query embedding
-        query_embedding = self._generate_embedding(query)
+        if self.result_cache is None:
+            return self._search(user_id, query, categories, limit, query_embedding, since, until)
         
-        # Determine which categories to search
-        search_categories = [cat.value for cat in categories] if categories else list(self.memory_store[user_id].keys())
+        # Read the version before searching: a write during the search leaves the result already stale
+        version = self.versions.get(user_id, 0)
+        key = (
+            normalize_text(query),
+            tuple(sorted(category.value for category in categories)) if categories else None,
+            limit,
+            to_timestamp_us(since) if since is not None else None,
+            to_timestamp_us(until) if until is not None else None
+        )
+        memories = self.result_cache.get(user_id, key, version)
+        if memories is None:
+            memories = self._search(user_id, query, categories, limit, query_embedding, since, until)
+            self.result_cache.put(user_id, key, version, memories)
+        return memories
+    
+    def _search(self,
+                user_id: str,
+                query: str,
+                categories: Optional[List[MemoryCategory]],
+                limit: int,
+                query_embedding: Optional[np.ndarray],
+                since: Optional[Any],
+                until: Optional[Any]) -> List[Memory]:
+        """Rank a user's memories for a query (see retrieve_memories)"""
+        rows = None
+        if since is not None or until is not None:
+            rows = self._rows_between(user_id, categories, since, until)
+            if rows.shape[0] == 0:
+                return []
         
-        # Collect all memories from specified categories
-        all_memories = []
-        for category in search_categories:
-            all_memories.extend(self.memory_store[user_id].get(category, []))
+        retrieval_config = self.config.get("retrieval", {})
+        terms = extract_keywords(query)
+        if retrieval_config.get("mode", "hybrid") != "hybrid" or not terms:
+            if query_embedding is None:
+                query_embedding = self._generate_embedding(query)
+            return [memory for memory, _ in self.indexes[user_id].search(query_embedding, limit, categories, rows)]
         
-        if not all_memories:
-            return []
+        # Lexical candidates first: when the best match contains every query keyword
+        # (an exact project or person name) the query doesn't need to be encoded
+        candidates = limit * retrieval_config.get("candidate_multiplier", 4)
+        keyword_results = self.keyword_indexes[user_id].search(terms, candidates, categories, rows)
+        if (query_embedding is None and retrieval_config.get("keyword_fast_path", True) and keyword_results
+                and keyword_results[0][2] >= retrieval_config.get("keyword_min_coverage", 1.0) * len(terms)):
+            return [memory for memory, _, _ in keyword_results[:limit]]
         
-        # Calculate similarity scores
-        similarities = []
-        for memory in all_memories:
-            if memory.embedding is not None:
-                similarity = cosine_similarity(
-                    [query_embedding], 
-                    [memory.embedding]
-                )[0][0]
-                similarities.append((memory, similarity))
-        
-        # Sort by similarity and return top results
-        sorted_memories = sorted(similarities, key=lambda x: x[1], reverse=True)
-        return [memory for memory, _ in sorted_memories[:limit]]
+        if query_embedding is None:
+            query_embedding = self._generate_embedding(query)
+        vector_results = self.indexes[user_id].search(query_embedding, candidates, categories, rows)
+        return reciprocal_rank_fusion(
+            [[memory for memory, _ in vector_results], [memory for memory, _, _ in keyword_results]],
+            k=retrieval_config.get("rrf_k", 60),
+            limit=limit
+        )
     
-    def process_memory_trigger(self, 
-                              user_id: str, 
-                              trigger_phrase: str, 
-                              context: Dict[str, Any]) -> Dict[str, Any]:
+    def list_memories_page(self,
+                           user_id: str,
+                           category: Optional[MemoryCategory] = None,
+                           limit: int = 10,
+                           after: Optional[str] = None) -> Tuple[List[Memory], Optional[str]]:
         """
-        Process a memory trigger phrase and return relevant memories
+        One page of a user's memories, newest first
+        
+        Category lists are kept in time order, so a page costs O(limit) per
+        category: each list is read backwards from the cursor and the categories
+        are merged with heapq.merge.
         
         Args:
             user_id: Unique identifier for the user
-            trigger_phrase: The trigger phrase used (e.g., "REX, recall...")
-            context: Additional context for the trigger
+            category: Only list memories in this category (optional)
+            limit: Maximum number of memories to return
+            after: Cursor returned with the previous page (optional)
             
         Returns:
-            Dictionary containing recalled memories and related information
+            (memories, cursor of the next page or None on the last page)
+            
+        Raises:
+            ValueError: If the cursor is malformed
         """
-        # Extract the trigger type and topic
-        trigger_parts = trigger_phrase.split("REX, ", 1)
-        if len(trigger_parts) < 2:
-            logger.warning(f"Invalid trigger phrase format: {trigger_phrase}")
-            return {"error": "Invalid trigger phrase format"}
+        position = decode_cursor(after) if after else None
+        self._poll_storage(user_id)
+        if user_id not in self.memory_store or limit <= 0:
+            return [], None
         
-        trigger_content = trigger_parts[1]
+        categories = [category.value] if category else list(self.memory_store[user_id])
+        with self._lock:
+            merged = heapq.merge(
+                *(self._newest_first(user_id, cat, position, limit + 1) for cat in categories),
+                key=lambda memory: (memory.timestamp_us, memory.id),
+                reverse=True
+            )
+            page = list(itertools.islice(merged, limit + 1))
+        if len(page) > limit:
+            return page[:limit], encode_cursor(page[limit - 1])
+        return page, None
+    
+    def iter_memories(self, user_id: str, chunk_size: int = 1000, start: int = 0) -> Iterator[Tuple[List[Memory], np.ndarray]]:
+        """
+        Walk a user's memories in insertion order, a chunk at a time
         
-        # Identify which trigger type was used
-        for trigger_key, handler in self.memory_triggers.items():
-            if trigger_content.lower().startswith(trigger_key):
-                topic = trigger_content[len(trigger_key):].strip()
-                return handler(user_id, topic, context)
+        Memories stored after the walk starts are not included. Only one chunk of
+        embeddings is copied at a time, so memory use doesn't grow with the user.
         
-        # Default handling if no specific trigger matched
-        return self._default_memory_retrieval(user_id, trigger_content, context)
+        Args:
+            user_id: Unique identifier for the user
+            chunk_size: Memories per chunk
+            start: Position of the first memory (to resume a walk)
+            
+        Yields:
+            (memories, embeddings) with one float32 embedding row per memory
+        """
+        self._poll_storage(user_id)
+        index = self.indexes.get(user_id)
+        if index is None:
+            return
+        size = len(index)
+        for start in range(start, size, chunk_size):
+            end = min(start + chunk_size, size)
+            with self._lock:
+                memories = index.memories[start:end]
+                vectors = index.vectors(start, end)
+            yield memories, vectors
     
-    def extract_and_store_memories(self, 
-                                  user_id: str, 
-                                  text: str, 
-                                  context: Dict[str, Any]) -> List[str]:
+    def snapshot(self) -> None:
         """
-        Extract potential memories from text and store them
+        Compact the persisted log into a snapshot of the current state
+        
+        Users whose mapped embeddings remove_memories rebuilt in memory are
+        written with their embeddings inline, then moved back to their files
+        """
+        if self.storage is None:
+            return
+        with self._lock:
+            checkpoint, records = self._snapshot_records()
+            unmapped, self._unmapped = self._unmapped, set()
+        self.storage.write_snapshot(records, checkpoint)
+        if unmapped:
+            with self._lock:
+                for user_id in unmapped:
+                    if user_id in self.indexes:
+                        self._rebuild_user(user_id, list(self.indexes[user_id].memories))
+    
+    def remove_memories(self, user_id: str, memory_ids: List[str], replacements: Optional[List[Memory]] = None) -> int:
+        """
+        Delete memories, optionally storing replacements (e.g. digests) in the same step
+        
+        The user's indexes are rebuilt without the deleted rows, so the embedding
+        matrix, keyword postings and category lists shrink with the store. Mapped
+        embeddings are rebuilt in memory and the embedding file is left as it is,
+        since the last snapshot may refer to its rows; the next snapshot() writes
+        the user's embeddings inline and moves them back to a file. Callers
+        removing from many users (the compaction job) snapshot once at the end.
         
         Args:
             user_id: Unique identifier for the user
-            text: Text to extract memories from
-            context: Additional context for memory extraction
+            memory_ids: IDs of the memories to delete (unknown IDs are ignored)
+            replacements: New memories to store (optional)
             
         Returns:
-            List of memory IDs that were stored
-        """
-        memory_ids = []
-        
-        # Extract entities and categorize them
-        entities = extract_entities(text)
-        
-        # Process people entities
-        if entities.get('people'):
-            for person in entities['people']:
-                memory = Memory(
-                    category=MemoryCategory.PEOPLE,
-                    content=f"Person: {person}",
-                    source=context.get('source', 'conversation'),
-                    metadata={"extracted_from": text[:100] + "..."}
-                )
-                memory_id = self.store_memory(user_id, memory)
-                memory_ids.append(memory_id)
-        
-        # Process topic entities
-        if entities.get('topics'):
-            for topic in entities['topics']:
-                memory = Memory(
-                    category=MemoryCategory.TOPICS,
-                    content=f"Topic: {topic}",
-                    source=context.get('source', 'conversation'),
-                    metadata={"extracted_from": text[:100] + "..."}
-                )
-                memory_id = self.store_memory(user_id, memory)
-                memory_ids.append(memory_id)
-        
-        # Process preferences (if detected)
-        preferences = self._extract_preferences(text)
-        for pref in preferences:
-            memory = Memory(
-                category=MemoryCategory.PREFERENCES,
-                content=f"Preference: {pref}",
-                source=context.get('source', 'conversation'),
-                metadata={"extracted_from": text[:100] + "..."}
-            )
-            memory_id = self.store_memory(user_id, memory)
-            memory_ids.append(memory_id)
+            Number of memories deleted
+        """
+        replacements = list(replacements or [])
+        self._attach_embeddings([memory for memory in replacements if memory.embedding is None])
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
         
-        return memory_ids
+        tickets = []
+        with self._lock:
+            if user_id not in self.memory_store:
+                return 0
+            doomed = set(memory_ids)
+            index = self.indexes[user_id]
+            kept = [memory for memory in index.memories if memory.id not in doomed]
+            removed = [memory.id for memory in index.memories if memory.id in doomed]
+            if not removed and not replacements:
+                return 0
+            
+            if self.storage is not None:
+                # Replacements are written first: a crash in between leaves both, never neither
+                if replacements:
+                    tickets.append(self.storage.append(user_id, replacements))
+                if removed:
+                    tickets.append(self.storage.delete(user_id, removed))
+            self._rebuild_after_removal(user_id, kept + replacements)
+        
+        if self.storage is not None:
+            for ticket in tickets:
+                self.storage.sync(ticket)
+            self._maybe_snapshot()
+        
+        logger.info(f"Removed {len(removed)} memories for user {user_id} ({len(replacements)} replacements stored)")
+        return len(removed)
     
-    def _generate_embedding(self, text: str) -> np.ndarray:
-        """Generate embedding vector for text"""
-        try:
-            return self.embedding_model.encode(text)
-        except Exception as e:
-            logger.error(f"Error generating embedding: {str(e)}")
-            return np.zeros(384)  # Default embedding size for the model
-    
-    def _extract_preferences(self, text: str) -> List[str]:
-        """Extract user preferences from text"""
-        # Simple keyword-based preference extraction
-        # In a production system, this would use more sophisticated NLP
-        preference_indicators = [
-            "prefer", "like", "don't like", "dislike", 
-            "want", "need", "require", "must have"
-        ]
+    def close(self) -> None:
+        """Flush persisted state and release resources"""
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self.storage is not None:
+            self.storage.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        if self.encoder_pool is not None:
+            self.encoder_pool.shutdown()
+        logger.info("Memory Manager closed")
+    
+    def _add_to_store(self, user_id: str, memories: List[Memory], rows: Optional[List[int]] = None) -> None:
+        """
+        Add embedded memories to the in-memory store and index
         
-        preferences = []
-        for indicator in preference_indicators:
-            if indicator in text.lower():
-                # Find the sentence containing the preference
-                sentences = text.split('.')
-                for sentence in sentences:
-                    if indicator in sentence.lower():
-                        preferences.append(sentence.strip())
-        
-        return preferences
-    
-    # Memory trigger handlers
-    def _handle_recall_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle 'recall' memory trigger"""
-        memories = self.retrieve_memories(
-            user_id=user_id,
-            query=topic,
-            limit=self.config.get("memory_recall_limit", 3)
-        )
-        return {
-            "topic": topic,  # Preserve the original case of the topic
-            "memories": [memory.to_dict() for memory in memories],
-            "trigger_type": "recall"
-        }
+        rows lists where the memories' embeddings already are in the user's mapped
+        embedding file (startup only); they are adopted in place when possible
+        """
+        # Initialize user memory store if it doesn't exist
+        if user_id not in self.memory_store:
+            self._create_user(user_id, self._embedding_path(user_id))
+        
+        if rows is None:
+            memories = self._apply_updates(user_id, memories)
+            if not memories:
+                return
+        
+        index = self.indexes[user_id]
+        if rows is not None and not index.adopt(memories, rows):
+            logger.warning(f"Embedding file for user {user_id} is missing rows, re-encoding {len(memories)} memories")
+            self._attach_embeddings(memories)
+            rows = None
+        if rows is None:
+            self._attach_embeddings([memory for memory in memories if memory.embedding is None])
+            index.add_batch(memories, [memory.embedding for memory in memories])
+        self.keyword_indexes[user_id].add_batch(memories)
+        
+        # Store memory in appropriate category
+        content_index = self.content_index[user_id]
+        self._insert_by_time(user_id, memories)
+        self._bump_version(user_id)
+        for memory in memories:
+            key = self._content_key(memory)
+            if key is not None:
+                content_index.setdefault(key, memory)
+            self._index_item_keys(user_id, memory)
     
-    def _handle_remember_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle 'remember our discussion about' memory trigger"""
-        # This specifically targets conversation history
-        memories = self.retrieve_memories(
-            user_id=user_id,
-            query=f"discussion about {topic}",
-            categories=[MemoryCategory.TIMELINE],
-            limit=self.config.get("memory_recall_limit", 3)
-        )
-        return {
-            "topic": topic,  # Preserve the original case of the topic
-            "memories": [memory.to_dict() for memory in memories],
-            "trigger_type": "remember_discussion"
-        }
+    def _index_item_keys(self, user_id: str, memory: Memory) -> None:
+        """Add the store_batch item keys recorded in a memory's metadata to the idempotency index"""
+        idempotency_index = self.idempotency_index[user_id]
+        for item_key, memory_ids in memory.metadata.get("idempotency_keys", {}).items():
+            idempotency_index[item_key] = list(memory_ids)  # The item's full ID list
+        item_key = memory.metadata.get("idempotency_key")
+        if item_key is not None:
+            memory_ids = idempotency_index.setdefault(item_key, [])
+            if memory.id not in memory_ids:
+                memory_ids.append(memory.id)
     
-    def _handle_what_did_we_say_trigger(self, user_id: str, topic: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle 'what did we say about' memory trigger"""
-        # Similar to remember but with different phrasing
-        memories = self.retrieve_memories(
-            user_id=user_id,
-            query=topic,
-            limit=self.config.get("memory_recall_limit", 3)
-        )
-        return {
-            "topic": topic,  # Preserve the original case of the topic
-            "memories": [memory.to_dict() for memory in memories],
-            "trigger_type": "what_did_we_say"
+    def _create_user(self, user_id: str, embedding_path: Optional[str]) -> None:
+        """Create a user's empty store and indexes"""
+        self.memory_store[user_id] = {
+            category.value: [] for category in MemoryCategory
         }
-    
-    def _handle_update_trigger(self, user_id: str, project: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle 'update on' memory trigger for projects"""
-        memories = self.retrieve_memories(
-            user_id=user_id,
-            query=project,
-            categories=[MemoryCategory.PROJECTS],
-            limit=self.config.get("memory_recall_limit", 5)
+        self.time_keys[user_id] = {category.value: array("q") for category in MemoryCategory}
+        self.indexes[user_id] = VectorIndex(self.config, path=embedding_path)
+        self.content_index[user_id] = {}
+        self.idempotency_index[user_id] = {}
+        self.keyword_indexes[user_id] = KeywordIndex(
+            k1=self.config.get("retrieval", {}).get("bm25_k1", 1.2),
+            b=self.config.get("retrieval", {}).get("bm25_b", 0.75)
         )
-        return {
-            "project": project,  # Preserve the original case of the project name
-            "memories": [memory.to_dict() for memory in memories],
-            "trigger_type": "project_update"
-        }
     
-    def _default_memory_retrieval(self, user_id: str, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Default memory retrieval when no specific trigger matches"""
-        memories = self.retrieve_memories(
-            user_id=user_id,
-            query=query,
-            limit=self.config.get("memory_recall_limit", 3)
-        )
-        return {
-            "query": query,
-            "memories": [memory.to_dict() for memory in memories],
-            "trigger_type": "general"
-        }
+    def _rebuild_user(self, user_id: str, memories: List[Memory], mapped: bool = True) -> None:
+        """
+        Replace a user's store and indexes with compact ones holding just these memories
+        
+        The replacement is built under a staging key and swapped in, so searches
+        already running keep a consistent view of the old indexes (caller holds the lock).
+        With mapped=False the embeddings are kept in memory and any embedding file is left untouched
+        """
+        path = self._embedding_path(user_id) if mapped else None
+        if path is not None and os.path.exists(path):
+            os.remove(path)  # The old index keeps its mapping of the unlinked file until it is dropped
+        staging = f"{user_id}\0rebuild"
+        self._create_user(staging, path)
+        self._add_to_store(staging, memories)
+        for store in (self.memory_store, self.time_keys, self.indexes, self.keyword_indexes,
+                      self.content_index, self.idempotency_index):
+            store[user_id] = store.pop(staging)
+        self.versions.pop(staging, None)
+        self._bump_version(user_id)
+    
+    def _rebuild_after_removal(self, user_id: str, memories: List[Memory]) -> None:
+        """
+        Rebuild a user's indexes with the memories left after a removal (caller holds the lock)
+        
+        Mapped embeddings are rebuilt in memory until the next snapshot (see remove_memories)
+        """
+        index = self.indexes[user_id]
+        unmap = self.storage is not None and (index.mapped or user_id in self._unmapped)
+        if unmap:
+            self._unmapped.add(user_id)
+        self._rebuild_user(user_id, memories, mapped=not unmap)
+    
+    def _bump_version(self, user_id: str) -> None:
+        """Mark a user's memories as changed, invalidating their cached retrieval results"""
+        self.versions[user_id] = self.versions.get(user_id, 0) + 1
+    
+    def _insert_by_time(self, user_id: str, memories: List[Memory]) -> None:
+        """Add memories to their category lists, keeping (timestamp, id) order"""
+        by_category: Dict[str, List[Memory]] = {}
+        for memory in memories:
+            by_category.setdefault(memory.category.value, []).append(memory)
+        
+        for category, added in by_category.items():
+            listed = self.memory_store[user_id][category]
+            keys = self.time_keys[user_id][category]
+            if len(added) > 64:
+                # Bulk loads (restart replay, imports) sort once instead of inserting one by one
+                listed.extend(added)
+                listed.sort(key=lambda memory: (memory.timestamp_us, memory.id))
+                self.time_keys[user_id][category] = array("q", (memory.timestamp_us for memory in listed))
+                continue
+            for memory in added:
+                timestamp = memory.timestamp_us
+                if not keys or timestamp > keys[-1]:
+                    position = len(keys)  # The usual case: newer than everything listed
+                else:
+                    position = self._position(listed, keys, timestamp, memory.id)
+                listed.insert(position, memory)
+                keys.insert(position, timestamp)
+    
+    @staticmethod
+    def _position(memories: List[Memory], keys: array, timestamp: int, memory_id: str) -> int:
+        """Index of the first listed memory at or after (timestamp, memory_id)"""
+        low = bisect.bisect_left(keys, timestamp)
+        high = bisect.bisect_right(keys, timestamp, low)
+        # Memories with the same timestamp are ordered by id
+        while low < high:
+            middle = (low + high) // 2
+            if memories[middle].id < memory_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def _newest_first(self,
+                      user_id: str,
+                      category: str,
+                      before: Optional[Tuple[int, str]],
+                      limit: int) -> Iterator[Memory]:
+        """Up to limit memories of a category older than a (timestamp, id) position, newest first"""
+        memories = self.memory_store[user_id][category]
+        end = len(memories) if before is None else self._position(memories, self.time_keys[user_id][category], *before)
+        for position in range(end - 1, max(end - limit, 0) - 1, -1):
+            yield memories[position]
+    
+    def _rows_between(self,
+                      user_id: str,
+                      categories: Optional[List[MemoryCategory]],
+                      since: Optional[Any],
+                      until: Optional[Any]) -> np.ndarray:
+        """Index rows of a user's memories timestamped in [since, until), in ascending order"""
+        start = to_timestamp_us(since) if since is not None else None
+        end = to_timestamp_us(until) if until is not None else None
+        names = [category.value for category in categories] if categories else list(self.memory_store[user_id])
+        rows = []
+        with self._lock:
+            for name in names:
+                keys = self.time_keys[user_id][name]
+                low = bisect.bisect_left(keys, start) if start is not None else 0
+                high = bisect.bisect_left(keys, end) if end is not None else len(keys)
+                rows.extend(memory.embedding_row for memory in self.memory_store[user_id][name][low:high])
+        return np.sort(np.array(rows, dtype=np.int64))
+    
+    def _apply_updates(self, user_id: str, memories: List[Memory]) -> List[Memory]:
+        """
+        Apply records of memories that are already indexed (metadata updates replayed
+        from storage or written by another worker) to the stored memory
+        
+        Returns:
+            The memories that are not indexed yet
+        """
+        fresh = []
+        batch: Dict[bytes, Memory] = {}  # A replayed batch may hold a memory and its updates
+        for memory in memories:
+            key = self._content_key(memory)
+            existing = None
+            if key is not None:
+                existing = batch.get(key) or self.content_index[user_id].get(key)
+            if existing is not None and existing.id == memory.id:
+                existing.metadata = memory.metadata
+                self._index_item_keys(user_id, existing)
+                continue
+            if key is not None:
+                batch.setdefault(key, memory)
+            fresh.append(memory)
+        return fresh
+    
+    def _deduplicate(self, user_id: str, memories: List[Memory]) -> Tuple[List[Memory], List[Memory], List[Memory]]:
+        """
+        Split memories about to be stored into new ones and repeats of stored ones
+        
+        Repeats bump the hit_count and last_seen metadata of the memory they repeat
+        (caller holds the lock)
+        
+        Returns:
+            (new memories, stored memories whose metadata changed, memory kept for each input)
+        """
+        batch: Dict[bytes, Memory] = {}
+        new_memories, touched, stored = [], {}, []
+        for memory in memories:
+            key = self._content_key(memory)
+            existing = None
+            if key is not None:
+                existing = batch.get(key) or self.content_index.get(user_id, {}).get(key)
+            if existing is None:
+                if key is not None:
+                    batch[key] = memory
+                new_memories.append(memory)
+                stored.append(memory)
+                continue
+            
+            existing.metadata = dict(
+                existing.metadata,
+                hit_count=existing.metadata.get("hit_count", 1) + 1,
+                last_seen=memory.timestamp
+            )
+            if batch.get(key) is not existing:
+                touched[existing.id] = existing
+            stored.append(existing)
+        return new_memories, list(touched.values()), stored
+    
+    def _embedding_path(self, user_id: str) -> Optional[str]:
+        """File holding a user's memory-mapped embeddings, if mmap storage is configured"""
+        index_config = self.config.get("vector_index", {})
+        if index_config.get("storage", "memory") != "mmap":
+            return None
+        file_name = hashlib.blake2b(user_id.encode("utf-8"), digest_size=16).hexdigest() + ".f32"
+        return os.path.join(index_config.get("mmap_path", "data/embeddings"), file_name)
+    
+    def _load_from_storage(self) -> None:
+        """Rebuild the in-memory store from persisted memories"""
+        # Consecutive memories of a user are indexed together; memories whose
+        # embeddings are referenced by row are kept apart from ones carrying vectors
+        batches: Dict[str, Tuple[List[Memory], List[int]]] = {}
+        for user_id, memory, row in self.storage.load():
+            memories, rows = batches.get(user_id, ([], []))
+            if memories and ((rows[0] is None) != (row is None) or len(memories) >= 4096):
+                self._add_to_store(user_id, memories, None if rows[0] is None else rows)
+                memories, rows = [], []
+            memories.append(memory)
+            rows.append(row)
+            batches[user_id] = (memories, rows)
+        for user_id, (memories, rows) in batches.items():
+            if memories:
+                self._add_to_store(user_id, memories, None if rows[0] is None else rows)
+    
+    def _poll_storage(self, user_id: str) -> None:
+        """Apply changes that other processes sharing the storage backend have made to a user's memories"""
+        if self.storage is None:
+            return
+        memories, deleted = self.storage.poll(user_id)
+        if deleted is not None and not memories and not deleted:
+            return
+        with self._lock:
+            if user_id in self.memory_store:
+                if deleted is None:
+                    # This process fell behind the backend's change log: memories are the full state
+                    self._rebuild_after_removal(user_id, memories)
+                    return
+                doomed = set(deleted)
+                index = self.indexes[user_id]
+                if any(memory.id in doomed for memory in index.memories):
+                    self._rebuild_after_removal(user_id, [memory for memory in index.memories if memory.id not in doomed])
+            if memories:
+                self._add_to_store(user_id, memories)
+    
+    def _maybe_snapshot(self) -> None:
+        """Start a background snapshot when the storage log has grown enough"""
+        if not self.storage.needs_snapshot():
+            return
+        with self._lock:
+            if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+                return
+            self._snapshot_thread = threading.Thread(target=self._run_snapshot, name="rex-snapshot", daemon=True)
+            self._snapshot_thread.start()
+    
+    def _run_snapshot(self) -> None:
+        """Snapshot worker; failures are logged and retried on a later write"""
+        try:
+            self.snapshot()
+        except Exception as e:
+            logger.error(f"Error writing memory snapshot: {str(e)}")
+    
+    def _snapshot_records(self) -> Tuple[Any, List[Tuple[str, Memory, Optional[int]]]]:
+        """
+        Start a snapshot of the current state (caller holds the lock)
+        
+        Returns:
+            (storage checkpoint, records for write_snapshot)
+        """
+        checkpoint = self.storage.checkpoint()
+        records = []
+        for user_id, index in self.indexes.items():
+            # Mapped embeddings are flushed and referenced by row instead of copied
+            index.flush()
+            for row, memory in enumerate(index.memories):
+                records.append((user_id, memory, row if index.mapped else None))
+        return checkpoint, records
+    
+    def _create_result_cache(self) -> Optional[ResultCache]:
+        """Create the retrieval result cache described by the configuration"""
+        cache_config = self.config.get("retrieval_cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        return ResultCache(max_entries=cache_config.get("max_entries", 10000))
+    
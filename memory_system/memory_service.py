@@ -0,0 +1,581 @@
+"""
+Memory service for REX
+One store process serving memories to any number of API workers over a unix socket
+"""
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import numpy as np
+
+from models.memory import Memory, MemoryCategory
+from memory_system.memory_interface import MemoryHelpersMixin, MemoryInterface
+from memory_system.memory_manager import MemoryManager
+
+logger = logging.getLogger(__name__)
+
+# Set to the service's socket path to run API workers against a memory service
+MEMORY_SERVICE_ENV = "REX_MEMORY_SERVICE"
+
+# Frame: opcode (request) or status (response), JSON length, embedding rows, embedding dimension;
+# followed by the JSON arguments and rows * dim little-endian float32 values
+_FRAME = struct.Struct("<BIII")
+
+OP_STORE = 1
+OP_STORE_BATCH = 2
+OP_RETRIEVE = 3
+OP_LIST = 4
+OP_FIND_DUPLICATES = 5
+OP_REMOVE = 6
+OP_ITER = 7
+OP_MEMORY_IDS = 8
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_INVALID = 2  # The call raised ValueError (e.g. a malformed cursor)
+
+# Calls that change nothing, so they are resent when a connection fails before the response
+_READ_ONLY = {OP_RETRIEVE, OP_LIST, OP_FIND_DUPLICATES, OP_ITER, OP_MEMORY_IDS}
+
+class MemoryServiceError(Exception):
+    """Raised when the memory service cannot be reached or a call fails in it"""
+
+def send_frame(sock: socket.socket, op: int, args: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> None:
+    """Write one frame"""
+    payload = json.dumps(args, separators=(",", ":")).encode("utf-8")
+    rows, dim = (0, 0) if vectors is None or vectors.size == 0 else vectors.shape
+    body = b"" if not rows else np.ascontiguousarray(vectors, dtype="<f4").tobytes()
+    sock.sendall(_FRAME.pack(op, len(payload), rows, dim) + payload + body)
+
+def recv_frame(sock: socket.socket) -> Optional[Tuple[int, Dict[str, Any], np.ndarray]]:
+    """
+    Read one frame
+
+    Returns:
+        (opcode or status, arguments, float32 matrix of rows x dim), or None when
+        the peer closed the connection between frames
+    """
+    header = _recv_exact(sock, _FRAME.size, eof_ok=True)
+    if header is None:
+        return None
+    op, payload_len, rows, dim = _FRAME.unpack(header)
+    args = json.loads(_recv_exact(sock, payload_len)) if payload_len else {}
+    body = _recv_exact(sock, rows * dim * 4) if rows else b""
+    return op, args, np.frombuffer(body, dtype="<f4").reshape(rows, dim)
+
+def _recv_exact(sock: socket.socket, size: int, eof_ok: bool = False) -> Optional[bytes]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if eof_ok and received == 0:
+                return None
+            raise ConnectionError("Connection closed in the middle of a frame")
+        received += count
+    return bytes(buffer)
+
+def _stack(memories: List[Memory]) -> Optional[np.ndarray]:
+    """Embeddings of the memories that have one, as a matrix"""
+    embeddings = [np.asarray(memory.embedding, dtype=np.float32) for memory in memories if memory.embedding is not None]
+    if not embeddings:
+        return None
+    return np.stack(embeddings)
+
+def _time_arg(value: Any) -> Optional[str]:
+    """since/until as an ISO timestamp for the wire"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+class MemoryService:
+    """
+    Serves a MemoryManager on a unix socket
+    Every API worker process connects here instead of holding its own store, so
+    a memory written through one worker is visible to all of them. Each
+    connection is served by its own thread; retrieval runs in numpy and the
+    store keeps its own locking, so calls from different workers overlap.
+    Workers send memories with their embeddings already computed, so the model
+    work stays spread across the workers; only repeats of stored memories come
+    without one, and the service encodes a memory itself in the rare case its
+    original was removed in between
+    """
+
+    def __init__(self, memory_manager: MemoryManager, config: Dict[str, Any]):
+        """
+        Initialize the service
+
+        Args:
+            memory_manager: Memory manager holding the memories
+            config: Application configuration; reads the "memory_service" section
+        """
+        service_config = config.get("memory_service", {})
+        self.memory_manager = memory_manager
+        self.socket_path = service_config.get("socket_path", "data/memory.sock")
+        self.calls = 0
+        self.errors = 0
+        self._counters_lock = threading.Lock()  # Connections are served on concurrent threads
+        self._handlers: Dict[int, Callable[[Dict[str, Any], np.ndarray], Tuple[Dict[str, Any], Optional[np.ndarray]]]] = {
+            OP_STORE: self._store,
+            OP_STORE_BATCH: self._store_batch,
+            OP_RETRIEVE: self._retrieve,
+            OP_LIST: self._list,
+            OP_FIND_DUPLICATES: self._find_duplicates,
+            OP_REMOVE: self._remove,
+            OP_ITER: self._iter,
+            OP_MEMORY_IDS: self._memory_ids
+        }
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Listen on the socket and serve connections in the background"""
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left behind by a service that crashed
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                service._serve(self.request)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="rex-memory-service", daemon=True)
+        self._thread.start()
+        logger.info(f"Memory service listening on {self.socket_path}")
+
+    def stop(self) -> None:
+        """Stop accepting connections and close the open ones (calls in progress are answered first)"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        with self._connections_lock:
+            for sock in self._connections:
+                try:
+                    sock.shutdown(socket.SHUT_RD)
+                except OSError:
+                    pass
+        self._server = None
+        self._thread = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Call counters for monitoring"""
+        with self._counters_lock:
+            return {"calls": self.calls, "errors": self.errors}
+
+    def _serve(self, sock: socket.socket) -> None:
+        """Answer the frames of one connection until the worker closes it"""
+        with self._connections_lock:
+            self._connections.add(sock)
+        try:
+            self._answer(sock)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(sock)
+
+    def _answer(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                frame = recv_frame(sock)
+            except (ConnectionError, OSError, ValueError) as e:
+                logger.warning(f"Dropping memory service connection: {str(e)}")
+                return
+            if frame is None:
+                return
+            op, args, vectors = frame
+            with self._counters_lock:
+                self.calls += 1
+            try:
+                handler = self._handlers.get(op)
+                if handler is None:
+                    raise ValueError(f"Unknown memory service call {op}")
+                result, result_vectors = handler(args, vectors)
+                status = STATUS_OK
+            except ValueError as e:
+                status, result, result_vectors = STATUS_INVALID, {"error": str(e)}, None
+            except Exception as e:
+                with self._counters_lock:
+                    self.errors += 1
+                logger.error(f"Error in memory service call {op}: {str(e)}")
+                status, result, result_vectors = STATUS_ERROR, {"error": str(e)}, None
+            try:
+                send_frame(sock, status, result, result_vectors)
+            except OSError:
+                return
+
+    @staticmethod
+    def _memories(records: List[Dict[str, Any]], vectors: np.ndarray, embedded: Optional[List[bool]] = None) -> List[Memory]:
+        """Memories from their records and the embedding rows of those flagged in embedded (all by default)"""
+        memories = [Memory.from_dict(record) for record in records]
+        rows = iter(vectors)
+        for memory, has_embedding in zip(memories, embedded if embedded is not None else [True] * len(memories)):
+            if has_embedding:
+                memory.embedding = np.array(next(rows))
+        return memories
+
+    def _store(self, args, vectors):
+        memories = self._memories(args["memories"], vectors, args.get("embedded"))
+        return {"ids": self.memory_manager.store_memories(args["user_id"], memories)}, None
+
+    def _store_batch(self, args, vectors):
+        memories = self._memories(args["memories"], vectors, args.get("embedded"))
+        items = []
+        for key, count in zip(args["keys"], args["counts"]):
+            items.append((key, memories[:count]))
+            memories = memories[count:]
+        outcomes = self.memory_manager.store_batch(args["user_id"], items)
+        return {"results": [[stored, ids] for stored, ids in outcomes]}, None
+
+    def _retrieve(self, args, vectors):
+        embedded = iter(vectors)
+        results = []
+        for query in args["queries"]:
+            results.append([memory.to_dict() for memory in self.memory_manager.retrieve_memories(
+                user_id=query["user_id"],
+                query=query["query"],
+                categories=[MemoryCategory(c) for c in query["categories"]] if query.get("categories") else None,
+                limit=query.get("limit", 5),
+                query_embedding=next(embedded) if query.get("embedded") else None,
+                since=query.get("since"),
+                until=query.get("until")
+            )])
+        return {"results": results}, None
+
+    def _list(self, args, vectors):
+        memories, next_cursor = self.memory_manager.list_memories_page(
+            args["user_id"],
+            category=MemoryCategory(args["category"]) if args.get("category") else None,
+            limit=args.get("limit", 10),
+            after=args.get("after")
+        )
+        return {"memories": [memory.to_dict() for memory in memories], "next_cursor": next_cursor}, None
+
+    def _find_duplicates(self, args, vectors):
+        memories = [Memory.from_dict(record) for record in args["memories"]]
+        duplicates = self.memory_manager.find_duplicates(args["user_id"], memories)
+        return {"duplicates": [None if memory is None else memory.to_dict() for memory in duplicates]}, None
+
+    def _remove(self, args, vectors):
+        replacements = self._memories(args.get("replacements", []), vectors)
+        return {"removed": self.memory_manager.remove_memories(args["user_id"], args["ids"], replacements)}, None
+
+    def _iter(self, args, vectors):
+        chunk = next(self.memory_manager.iter_memories(args["user_id"], args["count"], args["start"]), None)
+        if chunk is None:
+            return {"memories": []}, None
+        memories, chunk_vectors = chunk
+        return {"memories": [memory.to_dict() for memory in memories]}, chunk_vectors
+
+    def _memory_ids(self, args, vectors):
+        return {
+            "ids": self.memory_manager.memory_ids(args["user_id"]),
+            "dim": self.memory_manager.embedding_dim(args["user_id"])
+        }, None
+
+class _ConnectionPool:
+    """Reusable connections to the memory service, at most max_size open at once"""
+
+    def __init__(self, socket_path: str, max_size: int, timeout: float):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def call(self, op: int, args: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> Tuple[Dict[str, Any], np.ndarray]:
+        """Send one request and wait for its response"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise MemoryServiceError("Timed out waiting for a memory service connection")
+        try:
+            for attempt in range(2):
+                sock, reused = self._connect()
+                sent = False
+                try:
+                    send_frame(sock, op, args, vectors)
+                    sent = True
+                    frame = recv_frame(sock)
+                    if frame is None:
+                        raise ConnectionError("Memory service closed the connection")
+                except (OSError, ConnectionError) as e:
+                    sock.close()
+                    # A pooled connection may predate a service restart: resend calls the
+                    # service cannot have received, and reads
+                    if attempt == 0 and reused and (not sent or op in _READ_ONLY):
+                        self.close()  # The other idle connections are as old
+                        continue
+                    raise MemoryServiceError(f"Memory service call failed: {str(e)}") from e
+                self._idle.put(sock)
+                status, result, result_vectors = frame
+                if status == STATUS_INVALID:
+                    raise ValueError(result.get("error"))
+                if status != STATUS_OK:
+                    raise MemoryServiceError(result.get("error"))
+                return result, result_vectors
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _connect(self) -> Tuple[socket.socket, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise MemoryServiceError(f"Cannot reach the memory service at {self.socket_path}: {str(e)}") from e
+        return sock, False
+
+class RemoteMemoryManager(MemoryHelpersMixin, MemoryInterface):
+    """
+    Memory manager of an API worker whose memories live in a memory service
+    Text analysis and embedding run in the worker, with its own model and
+    embedding cache; storage, indexing and retrieval are calls to the service
+    over pooled connections, one call per batch of memories or queries. Memory
+    recall triggers are handled here on top of remote retrieval
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """Initialize the client with configuration; reads the "memory_service" section"""
+        service_config = config.get("memory_service", {})
+        self._init_helpers(config)
+        self.pool = _ConnectionPool(
+            service_config.get("socket_path", "data/memory.sock"),
+            service_config.get("pool_size", 8),
+            service_config.get("timeout_seconds", 30)
+        )
+        logger.info(f"Memory Manager using the memory service at {self.pool.socket_path}")
+
+    def store_memories(self, user_id: str, memories: List[Memory]) -> List[str]:
+        """Store several memories in one service call (see MemoryManager.store_memories)"""
+        if not memories:
+            return []
+        self._prepare(user_id, memories)
+        result, _ = self.pool.call(OP_STORE, {
+            "user_id": user_id,
+            "memories": [memory.to_dict() for memory in memories],
+            "embedded": [memory.embedding is not None for memory in memories]
+        }, _stack(memories))
+        return result["ids"]
+
+    def store_batch(self, user_id: str, items: List[Tuple[str, List[Memory]]]) -> List[Tuple[bool, List[str]]]:
+        """Store the memories of several client items in one service call (see MemoryManager.store_batch)"""
+        memories = [memory for _, item_memories in items for memory in item_memories]
+        self._prepare(user_id, memories)
+        result, _ = self.pool.call(OP_STORE_BATCH, {
+            "user_id": user_id,
+            "keys": [key for key, _ in items],
+            "counts": [len(item_memories) for _, item_memories in items],
+            "memories": [memory.to_dict() for memory in memories],
+            "embedded": [memory.embedding is not None for memory in memories]
+        }, _stack(memories))
+        return [(stored, ids) for stored, ids in result["results"]]
+
+    def find_duplicate(self, user_id: str, memory: Memory) -> Optional[Memory]:
+        """Find a stored memory with the same category and content"""
+        return self.find_duplicates(user_id, [memory])[0]
+
+    def find_duplicates(self, user_id: str, memories: List[Memory]) -> List[Optional[Memory]]:
+        """find_duplicate for several memories in one service call"""
+        if not memories:
+            return []
+        result, _ = self.pool.call(OP_FIND_DUPLICATES, {
+            "user_id": user_id,
+            "memories": [memory.to_dict() for memory in memories]
+        })
+        return [None if record is None else Memory.from_dict(record) for record in result["duplicates"]]
+
+    def retrieve_memories(self,
+                          user_id: str,
+                          query: str,
+                          categories: Optional[List[MemoryCategory]] = None,
+                          limit: int = 5,
+                          query_embedding: Optional[np.ndarray] = None,
+                          since: Optional[Any] = None,
+                          until: Optional[Any] = None) -> List[Memory]:
+        """Retrieve relevant memories (see MemoryManager.retrieve_memories)"""
+        return self.retrieve_many([{
+            "user_id": user_id,
+            "query": query,
+            "categories": categories,
+            "limit": limit,
+            "query_embedding": query_embedding,
+            "since": since,
+            "until": until
+        }])[0]
+
+    def retrieve_many(self, queries: List[Dict[str, Any]]) -> List[List[Memory]]:
+        """
+        Run several retrievals in one service call
+
+        Args:
+            queries: retrieve_memories keyword arguments, one dict per retrieval
+
+        Returns:
+            Relevant memories per query, in order
+        """
+        if not queries:
+            return []
+        embeddings = [query["query_embedding"] for query in queries if query.get("query_embedding") is not None]
+        result, _ = self.pool.call(OP_RETRIEVE, {"queries": [{
+            "user_id": query["user_id"],
+            "query": query["query"],
+            "categories": [category.value for category in query["categories"]] if query.get("categories") else None,
+            "limit": query.get("limit", 5),
+            "embedded": query.get("query_embedding") is not None,
+            "since": _time_arg(query.get("since")),
+            "until": _time_arg(query.get("until"))
+        } for query in queries]}, np.stack(embeddings) if embeddings else None)
+        return [[Memory.from_dict(record) for record in records] for records in result["results"]]
+
+    def list_memories_page(self,
+                           user_id: str,
+                           category: Optional[MemoryCategory] = None,
+                           limit: int = 10,
+                           after: Optional[str] = None) -> Tuple[List[Memory], Optional[str]]:
+        """One page of a user's memories, newest first (see MemoryManager.list_memories_page)"""
+        result, _ = self.pool.call(OP_LIST, {
+            "user_id": user_id,
+            "category": category.value if category else None,
+            "limit": limit,
+            "after": after
+        })
+        return [Memory.from_dict(record) for record in result["memories"]], result["next_cursor"]
+
+    def memory_ids(self, user_id: str) -> List[str]:
+        """IDs of a user's memories, in insertion order"""
+        result, _ = self.pool.call(OP_MEMORY_IDS, {"user_id": user_id})
+        return result["ids"]
+
+    def embedding_dim(self, user_id: str) -> Optional[int]:
+        """Dimension of a user's embeddings, or None if the user has no memories"""
+        result, _ = self.pool.call(OP_MEMORY_IDS, {"user_id": user_id})
+        return result["dim"]
+
+    def iter_memories(self, user_id: str, chunk_size: int = 1000, start: int = 0):
+        """Walk a user's memories in insertion order, one service call per chunk"""
+        while True:
+            result, vectors = self.pool.call(OP_ITER, {"user_id": user_id, "count": chunk_size, "start": start})
+            if not result["memories"]:
+                return
+            yield [Memory.from_dict(record) for record in result["memories"]], vectors
+            start += len(result["memories"])
+
+    def remove_memories(self, user_id: str, memory_ids: List[str], replacements: Optional[List[Memory]] = None) -> int:
+        """Delete memories, optionally storing replacements (see MemoryManager.remove_memories)"""
+        replacements = list(replacements or [])
+        self._attach_embeddings([memory for memory in replacements if memory.embedding is None])
+        result, _ = self.pool.call(OP_REMOVE, {
+            "user_id": user_id,
+            "ids": list(memory_ids),
+            "replacements": [memory.to_dict() for memory in replacements]
+        }, _stack(replacements))
+        return result["removed"]
+
+    def snapshot(self) -> None:
+        """Snapshots are written by the service"""
+
+    def close(self) -> None:
+        """Close the service connections and release resources"""
+        self.pool.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        if self.encoder_pool is not None:
+            self.encoder_pool.shutdown()
+        logger.info("Memory Manager closed")
+
+    def _prepare(self, user_id: str, memories: List[Memory]) -> None:
+        """
+        Timestamp memories and encode those that will be stored as new before they are sent
+
+        Repeats of stored memories are merged by the service without their
+        embedding, so they are looked up (in one call) rather than encoded
+        """
+        for memory in memories:
+            if not memory.timestamp:
+                memory.timestamp = datetime.now().isoformat()
+        pending = [memory for memory in memories if memory.embedding is None]
+        checked = [memory for memory in pending if self._content_key(memory) is not None]
+        repeats = {id(memory) for memory, duplicate in zip(checked, self.find_duplicates(user_id, checked)) if duplicate is not None}
+        self._attach_embeddings([memory for memory in pending if id(memory) not in repeats])
+
+def create_memory_manager(config: Dict[str, Any]) -> MemoryInterface:
+    """
+    Memory manager for an API process: a client of the memory service when one
+    is configured (memory_service.enabled, or REX_MEMORY_SERVICE set to its
+    socket), otherwise a MemoryManager holding the memories itself
+    """
+    service_config = dict(config.get("memory_service", {}))
+    if os.environ.get(MEMORY_SERVICE_ENV):
+        service_config.update(enabled=True, socket_path=os.environ[MEMORY_SERVICE_ENV])
+    if not service_config.get("enabled", False):
+        return MemoryManager(config)
+    return RemoteMemoryManager(dict(config, memory_service=service_config))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line interface: run the memory service
+
+    python -m memory_system.memory_service [--socket PATH]
+    REX_MEMORY_SERVICE=PATH uvicorn app:app --workers N
+    """
+    from memory_system.compaction import Compactor
+    from utils.config_loader import load_config
+
+    parser = argparse.ArgumentParser(description="Serve REX memories to API workers over a unix socket")
+    parser.add_argument("--socket", help="Socket path (default: memory_service.socket_path)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    config = load_config()
+    if args.socket:
+        config["memory_service"] = dict(config.get("memory_service", {}), socket_path=args.socket)
+
+    memory_manager = MemoryManager(config)
+    compactor = Compactor(memory_manager, config)  # Compaction runs here, not in the workers
+    service = MemoryService(memory_manager, config)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+
+    service.start()
+    compactor.start()
+    stopping.wait()
+    logger.info("Stopping memory service")
+    service.stop()
+    compactor.stop()
+    memory_manager.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
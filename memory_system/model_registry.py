@@ -0,0 +1,75 @@
+"""
+Model registry for REX
+Loads embedding models on first use, once per process, and tracks which ones are warm
+"""
+from typing import Any, Dict, Set
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_models: Dict[str, Any] = {}
+_warm: Set[str] = set()
+_lock = threading.Lock()
+
+# Texts of different lengths so warm-up exercises the tokenizer and the padded batch path
+_WARM_UP_TEXTS = [
+    "warm up",
+    "REX, what did we say about the project timeline last week?",
+    "User: I talked with Jane Doe about the Apollo migration.\nAI: I'll remember that."
+]
+
+def get_embedding_model(model_name: str) -> Any:
+    """
+    Get the process-wide instance of an embedding model, loading it on first use
+
+    Args:
+        model_name: SentenceTransformer model name or path
+
+    Returns:
+        The loaded model
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _lock:
+        if model_name not in _models:
+            started = time.perf_counter()
+            # Importing sentence_transformers pulls in torch; defer it until a model is needed
+            from sentence_transformers import SentenceTransformer
+            _models[model_name] = SentenceTransformer(model_name)
+            logger.info(f"Loaded embedding model {model_name} in {time.perf_counter() - started:.2f}s")
+        return _models[model_name]
+
+def register_embedding_model(model_name: str, model: Any) -> None:
+    """
+    Use an already built model for a name instead of loading it (e.g. a test double)
+
+    Args:
+        model_name: Name the model is requested by
+        model: Object with the SentenceTransformer encode() interface
+    """
+    with _lock:
+        _models[model_name] = model
+        _warm.discard(model_name)
+
+def warm_up(model_name: str, batch_size: int = 64) -> None:
+    """
+    Load a model and run a dummy batch through it so the first real request isn't served cold
+
+    Args:
+        model_name: SentenceTransformer model name or path
+        batch_size: Batch size used for real requests
+    """
+    if model_name in _warm:
+        return
+    model = get_embedding_model(model_name)
+    started = time.perf_counter()
+    model.encode(_WARM_UP_TEXTS, batch_size=batch_size)
+    _warm.add(model_name)
+    logger.info(f"Warmed up embedding model {model_name} in {time.perf_counter() - started:.2f}s")
+
+def is_warm(model_name: str) -> bool:
+    """Whether a model has been loaded and warmed up in this process"""
+    return model_name in _warm
@@ -0,0 +1,462 @@
+"""
+Memory persistence for REX
+Durable storage backends for the memory store and the file-based persistence engine
+"""
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import glob
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+from models.memory import Memory
+
+logger = logging.getLogger(__name__)
+
+# Record operations
+OP_PUT = 1
+OP_UPDATE = 2  # New metadata for a stored memory; carries no embedding
+OP_DELETE = 3  # Removal of stored memories; metadata is {"ids": [...]}
+
+# Record header: crc32, operation, user id length, metadata length, embedding length
+_HEADER = struct.Struct("<IBHII")
+
+class MemoryStorage:
+    """
+    Interface for durable memory storage backends
+    The MemoryManager keeps the working set in memory; a backend persists every
+    change and replays the full state when the manager starts
+    """
+
+    def load(self) -> Iterator[Tuple[str, Memory, Optional[int]]]:
+        """
+        Yield every stored memory as (user_id, memory, embedding_row)
+
+        embedding_row is set when the snapshot left the embedding in the user's
+        memory-mapped embedding file; otherwise the embedding is attached to the memory
+        """
+        return iter(())
+
+    def append(self, user_id: str, memories: List[Memory]) -> Any:
+        """
+        Record newly stored memories (one write per call)
+
+        Called while the MemoryManager holds its lock, so it should not block on
+        disk; durability is awaited separately through sync()
+
+        Returns:
+            Ticket to pass to sync()
+        """
+        raise NotImplementedError
+
+    def update(self, user_id: str, memories: List[Memory]) -> Any:
+        """
+        Record new metadata of already stored memories (same locking rules as append)
+
+        Returns:
+            Ticket to pass to sync()
+        """
+        raise NotImplementedError
+
+    def delete(self, user_id: str, memory_ids: List[str]) -> Any:
+        """
+        Record that stored memories were removed (same locking rules as append)
+
+        Returns:
+            Ticket to pass to sync()
+        """
+        raise NotImplementedError
+
+    def sync(self, ticket: Any) -> None:
+        """Wait until the write identified by ticket is durable"""
+
+    def poll(self, user_id: str) -> Tuple[List[Memory], Optional[List[str]]]:
+        """
+        Fetch changes made to a user's memories by other processes since the last call
+
+        Only shared backends return anything; memories come with embeddings attached
+
+        Returns:
+            (new or updated memories, ids of deleted memories); deleted ids are None
+            when the memories are the user's full state instead of the changes
+        """
+        return [], []
+
+    def needs_snapshot(self) -> bool:
+        """Whether the backend wants a compacted snapshot of the full state"""
+        return False
+
+    def checkpoint(self) -> Any:
+        """Mark the point a snapshot will cover (called while writes are paused)"""
+        return None
+
+    def write_snapshot(self, records: Iterable[Tuple[str, Memory, Optional[int]]], checkpoint: Any) -> None:
+        """
+        Write a snapshot of the full state as of checkpoint
+
+        Args:
+            records: (user_id, memory, embedding_row) for every memory, in index row
+                order; embedding_row is set when the embedding is already durable in
+                the user's memory-mapped embedding file and need not be copied
+            checkpoint: Value returned by checkpoint()
+        """
+
+    def flush(self) -> None:
+        """Force buffered writes to durable storage"""
+
+    def close(self) -> None:
+        """Flush and release resources"""
+
+def create_storage(config: Dict[str, Any]) -> Optional[MemoryStorage]:
+    """
+    Create the storage backend selected by config["memory_persistence"]
+
+    Returns:
+        A MemoryStorage, or None when persistence is disabled
+    """
+    persistence_config = config.get("memory_persistence", {})
+    if not persistence_config.get("enabled", False):
+        return None
+
+    storage_type = persistence_config.get("storage_type", "file")
+    if storage_type == "file":
+        return FileMemoryStorage(
+            path=persistence_config.get("file_path", "data/memories"),
+            fsync=persistence_config.get("fsync", "interval"),
+            fsync_interval_ms=persistence_config.get("fsync_interval_ms", 50),
+            snapshot_min_wal_bytes=persistence_config.get("snapshot_min_wal_bytes", 8 * 1024 * 1024),
+            snapshot_wal_ratio=persistence_config.get("snapshot_wal_ratio", 0.5)
+        )
+
+    if storage_type == "redis":
+        from memory_system.redis_storage import RedisMemoryStorage
+        return RedisMemoryStorage(
+            url=persistence_config.get("redis_url", "redis://localhost:6379/0"),
+            key_prefix=persistence_config.get("redis_key_prefix", "rex"),
+            max_connections=persistence_config.get("redis_max_connections", 16),
+            log_max_entries=persistence_config.get("redis_log_max_entries", 10000)
+        )
+
+    if storage_type == "database":
+        from memory_system.sqlite_storage import SQLiteMemoryStorage
+        return SQLiteMemoryStorage(
+            path=persistence_config.get("database_path", "data/memories.sqlite3"),
+            synchronous=persistence_config.get("database_synchronous", "NORMAL")
+        )
+
+    logger.warning(f"Storage type {storage_type} is not supported, memories will not be persisted")
+    return None
+
+def encode_record(op: int, user_id: str, metadata: Dict[str, Any], embedding: Optional[np.ndarray] = None) -> bytes:
+    """Encode one log record"""
+    user_bytes = user_id.encode("utf-8")
+    meta_bytes = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+    emb_bytes = b"" if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+    body = _HEADER.pack(0, op, len(user_bytes), len(meta_bytes), len(emb_bytes))[4:] + user_bytes + meta_bytes + emb_bytes
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+def read_records(path: str) -> Iterator[Tuple[int, str, Dict[str, Any], Optional[np.ndarray]]]:
+    """
+    Read log records from a file, stopping at the first torn or corrupt record
+
+    Yields:
+        (operation, user_id, metadata, embedding) tuples
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                if header:
+                    logger.warning(f"Ignoring torn record header at end of {path}")
+                return
+            crc, op, user_len, meta_len, emb_len = _HEADER.unpack(header)
+            body = f.read(user_len + meta_len + emb_len)
+            if len(body) < user_len + meta_len + emb_len or zlib.crc32(header[4:] + body) != crc:
+                logger.warning(f"Ignoring corrupt or torn record at end of {path}")
+                return
+
+            user_id = body[:user_len].decode("utf-8")
+            metadata = json.loads(body[user_len:user_len + meta_len])
+            embedding = np.frombuffer(body, dtype=np.float32, offset=user_len + meta_len) if emb_len else None
+            yield op, user_id, metadata, embedding
+
+class FileMemoryStorage(MemoryStorage):
+    """
+    File persistence engine
+    Writes go to an append-only write-ahead log with group-commit fsync; the log
+    is periodically compacted into a snapshot so startup replays at most one
+    snapshot plus a bounded log tail
+
+    Layout of the storage directory:
+        snapshot-<seq>.bin  state covering every log segment before <seq>
+        wal-<seq>.log       log segments, replayed in order after the snapshot
+    """
+
+    def __init__(self,
+                 path: str,
+                 fsync: str = "interval",
+                 fsync_interval_ms: int = 50,
+                 snapshot_min_wal_bytes: int = 8 * 1024 * 1024,
+                 snapshot_wal_ratio: float = 0.5):
+        """
+        Initialize the engine and open a new log segment
+
+        Args:
+            path: Storage directory
+            fsync: "always" (a write returns once it is on disk; concurrent writes
+                share one fsync), "interval" (fsync in the background every
+                fsync_interval_ms) or "never" (leave flushing to the OS)
+            fsync_interval_ms: Background fsync period for "interval" mode
+            snapshot_min_wal_bytes: Never snapshot while the log is smaller than this
+            snapshot_wal_ratio: Snapshot once the log exceeds this fraction of the last
+                snapshot's size, which bounds both replay time and write amplification
+        """
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Invalid fsync mode: {fsync}")
+
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.snapshot_min_wal_bytes = snapshot_min_wal_bytes
+        self.snapshot_wal_ratio = snapshot_wal_ratio
+        os.makedirs(path, exist_ok=True)
+
+        snapshot = self._latest_snapshot()
+        self.snapshot_bytes = os.path.getsize(snapshot[1]) if snapshot else 0
+        self.wal_bytes = sum(os.path.getsize(path) for _, path in self._segments(snapshot[0] if snapshot else 0))
+
+        # Log sequence numbers count appended bytes; synced_lsn trails written_lsn
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._written_lsn = 0
+        self._synced_lsn = 0
+        self._syncing = False
+        self._closed = False
+
+        # Always start a fresh segment so nothing is appended after a torn tail
+        segments = self._segments(0)
+        self._segment_seq = (segments[-1][0] if segments else (snapshot[0] if snapshot else 0)) + 1
+        self._wal = open(self._segment_path(self._segment_seq), "ab")
+
+        self._flusher = None
+        if self.fsync == "interval":
+            self._flusher = threading.Thread(target=self._flush_periodically, name="rex-wal-flusher", daemon=True)
+            self._flusher.start()
+
+    def load(self) -> Iterator[Tuple[str, Memory, Optional[int]]]:
+        """Replay the latest snapshot followed by every later log segment"""
+        snapshot = self._latest_snapshot()
+        paths = [snapshot[1]] if snapshot else []
+        paths += [path for _, path in self._segments(snapshot[0] if snapshot else 0)]
+
+        # Snapshots hold only live memories, so deletions are found by a first pass
+        # over the (bounded) log tail; records before a memory's deletion are skipped
+        deleted: Dict[Tuple[str, str], Tuple[int, int]] = {}  # (user, memory id) -> (file, record) of its last deletion
+        for file_number, path in enumerate(paths):
+            if snapshot and file_number == 0:
+                continue
+            for record_number, (op, user_id, metadata, _) in enumerate(read_records(path)):
+                if op == OP_DELETE:
+                    for memory_id in metadata["ids"]:
+                        deleted[(user_id, memory_id)] = (file_number, record_number)
+
+        count = 0
+        started = time.time()
+        for file_number, path in enumerate(paths):
+            for record_number, (op, user_id, metadata, embedding) in enumerate(read_records(path)):
+                if op in (OP_PUT, OP_UPDATE):
+                    if deleted and deleted.get((user_id, metadata["id"]), (-1, -1)) > (file_number, record_number):
+                        continue
+                    # Updates replay as the memory itself; the manager applies them by id
+                    memory = Memory.from_dict(metadata)
+                    memory.embedding = embedding
+                    count += op == OP_PUT
+                    yield user_id, memory, metadata.get("embedding_row")
+        logger.info(f"Replayed {count} memories from {self.path} in {time.time() - started:.2f}s")
+
+    def append(self, user_id: str, memories: List[Memory]) -> int:
+        """
+        Append memories to the log as one write
+
+        Returns:
+            Log sequence number of the write
+        """
+        return self._write(b"".join(
+            encode_record(OP_PUT, user_id, memory.to_dict(), memory.embedding)
+            for memory in memories
+        ))
+
+    def update(self, user_id: str, memories: List[Memory]) -> int:
+        """
+        Append metadata updates to the log as one write
+
+        Returns:
+            Log sequence number of the write
+        """
+        return self._write(b"".join(encode_record(OP_UPDATE, user_id, memory.to_dict()) for memory in memories))
+
+    def delete(self, user_id: str, memory_ids: List[str]) -> int:
+        """
+        Append a deletion record to the log
+
+        Returns:
+            Log sequence number of the write
+        """
+        return self._write(encode_record(OP_DELETE, user_id, {"ids": list(memory_ids)}))
+
+    def sync(self, ticket: int) -> None:
+        """In "always" mode, wait until the log is durable up to the write's sequence number"""
+        if self.fsync == "always":
+            self._sync_to(ticket)
+
+    def needs_snapshot(self) -> bool:
+        """Whether the log has grown enough to be worth compacting"""
+        return self.wal_bytes > max(self.snapshot_min_wal_bytes, self.snapshot_wal_ratio * self.snapshot_bytes)
+
+    def checkpoint(self) -> int:
+        """
+        Close the current log segment and start a new one
+
+        Returns:
+            Sequence number of the new segment; a snapshot for this checkpoint covers
+            every segment before it
+        """
+        with self._lock:
+            self._fsync_locked()
+            self._wal.close()
+            self._segment_seq += 1
+            self._wal = open(self._segment_path(self._segment_seq), "ab")
+            self.wal_bytes = 0
+            return self._segment_seq
+
+    def write_snapshot(self, records: Iterable[Tuple[str, Memory, Optional[int]]], checkpoint: int) -> None:
+        """Write a snapshot atomically, then delete the files it supersedes"""
+        final_path = os.path.join(self.path, f"snapshot-{checkpoint:08d}.bin")
+        temp_path = final_path + ".tmp"
+        started = time.time()
+
+        with open(temp_path, "wb") as f:
+            batch = []
+            for user_id, memory, row in records:
+                if row is None:
+                    batch.append(encode_record(OP_PUT, user_id, memory.to_dict(), memory.embedding))
+                else:
+                    batch.append(encode_record(OP_PUT, user_id, dict(memory.to_dict(), embedding_row=row)))
+                if len(batch) >= 1024:
+                    f.write(b"".join(batch))
+                    batch = []
+            f.write(b"".join(batch))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, final_path)
+        self._fsync_directory()
+
+        self.snapshot_bytes = os.path.getsize(final_path)
+        for seq, path in self._snapshots():
+            if seq < checkpoint:
+                os.remove(path)
+        for seq, path in self._segments(0):
+            if seq < checkpoint:
+                os.remove(path)
+        logger.info(f"Wrote snapshot {final_path} ({self.snapshot_bytes} bytes) in {time.time() - started:.2f}s")
+
+    def flush(self) -> None:
+        """fsync everything written so far"""
+        with self._lock:
+            self._fsync_locked()
+
+    def close(self) -> None:
+        """Flush the log and stop the background flusher"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._fsync_locked()
+            self._wal.close()
+            self._synced.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+
+    def _write(self, data: bytes) -> int:
+        """Append encoded records to the current segment"""
+        with self._lock:
+            self._wal.write(data)
+            self._wal.flush()  # Hand the bytes to the OS; fsync happens per fsync mode
+            self._written_lsn += len(data)
+            self.wal_bytes += len(data)
+            return self._written_lsn
+
+    def _sync_to(self, lsn: int) -> None:
+        """
+        Wait until the log is durable up to lsn
+        The first waiter becomes the leader and fsyncs on behalf of every write that
+        arrived before it started; later waiters ride along on the next fsync
+        """
+        with self._lock:
+            while self._synced_lsn < lsn:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+                self._syncing = True
+                target = self._written_lsn
+                fileno = self._wal.fileno()
+                self._lock.release()
+                try:
+                    os.fsync(fileno)
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                self._synced_lsn = max(self._synced_lsn, target)
+                self._synced.notify_all()
+
+    def _fsync_locked(self) -> None:
+        """fsync the current segment (caller holds the lock)"""
+        while self._syncing:
+            self._synced.wait()
+        if self._synced_lsn < self._written_lsn and not self._wal.closed:
+            os.fsync(self._wal.fileno())
+            self._synced_lsn = self._written_lsn
+
+    def _flush_periodically(self) -> None:
+        """Background fsync loop for "interval" mode"""
+        while True:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                self._fsync_locked()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.path, f"wal-{seq:08d}.log")
+
+    def _segments(self, first_seq: int) -> List[Tuple[int, str]]:
+        """Log segments with sequence number >= first_seq, in order"""
+        return [(seq, path) for seq, path in self._numbered_files("wal-*.log") if seq >= first_seq]
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        return self._numbered_files("snapshot-*.bin")
+
+    def _latest_snapshot(self) -> Optional[Tuple[int, str]]:
+        snapshots = self._snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def _numbered_files(self, pattern: str) -> List[Tuple[int, str]]:
+        """Files matching pattern, sorted by the sequence number in their name"""
+        files = []
+        for path in glob.glob(os.path.join(self.path, pattern)):
+            name = os.path.basename(path)
+            files.append((int(name.split("-")[1].split(".")[0]), path))
+        return sorted(files)
+
+    def _fsync_directory(self) -> None:
+        """Make renames in the storage directory durable"""
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,238 @@
+"""
+Redis storage backend for REX
+Keeps memories and packed float32 embeddings in Redis so several API workers can share one store
+"""
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+import json
+import logging
+import threading
+import numpy as np
+
+from models.memory import Memory
+from memory_system.persistence import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+# Log entries for deletions are the memory id behind this marker; other entries are plain ids
+_DELETED = "\0"
+
+# Connection pools shared by every backend in the process, keyed by (url, max_connections)
+_pools: Dict[Tuple[str, int], Any] = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(url: str, max_connections: int) -> Any:
+    """Get or create the process-wide connection pool for a Redis URL"""
+    import redis  # Only needed when the Redis backend is selected
+
+    with _pools_lock:
+        key = (url, max_connections)
+        if key not in _pools:
+            _pools[key] = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+        return _pools[key]
+
+class RedisMemoryStorage(MemoryStorage):
+    """
+    Redis storage backend
+
+    Key layout (prefix defaults to "rex"):
+        <prefix>:users            set of user ids
+        <prefix>:<user>:log       list of changes: memory ids, deletions as marked ids
+        <prefix>:<user>:log_base  number of entries trimmed from the front of the log
+        <prefix>:<user>:data      hash of memory id -> JSON memory
+        <prefix>:<user>:emb       hash of memory id -> packed float32 embedding
+
+    Writes are pipelined into one MULTI/EXEC round trip per call. Other workers'
+    writes are picked up by poll(), which reads the unseen tail of a user's log
+    and fetches those memories with batched HMGETs. A metadata update rewrites the
+    memory and logs its id again, so other workers pick it up the same way. A
+    deletion removes the memory's data and embedding and logs a deletion entry,
+    so other workers drop the memory too. The data hashes are the full state and
+    the log only tells workers what changed: once a log holds more than twice
+    log_max_entries, the writer trims it to the newest log_max_entries and
+    advances log_base, so offsets stay absolute. A worker that falls behind
+    the trimmed part reloads the user's memories from the data hashes.
+    """
+
+    def __init__(self,
+                 url: str = "redis://localhost:6379/0",
+                 key_prefix: str = "rex",
+                 max_connections: int = 16,
+                 batch_size: int = 1000,
+                 log_max_entries: int = 10000,
+                 client: Any = None):
+        """
+        Initialize the backend
+
+        Args:
+            url: Redis connection URL
+            key_prefix: Prefix for every key written by REX
+            max_connections: Size of the shared connection pool
+            batch_size: Number of memories fetched per HMGET
+            log_max_entries: Log entries kept per user when the log is trimmed
+            client: Redis client to use instead of the shared pool (e.g. an in-process fake)
+        """
+        if client is None:
+            import redis
+            client = redis.Redis(connection_pool=get_connection_pool(url, max_connections))
+        self.client = client
+        self.key_prefix = key_prefix
+        self.batch_size = batch_size
+        self.log_max_entries = log_max_entries
+
+        # Per user: how much of the log this process has consumed, and ids it wrote
+        # itself that will show up in the log without needing to be fetched
+        self._lock = threading.Lock()
+        self._log_offsets: Dict[str, int] = {}
+        self._log_bases: Dict[str, int] = {}  # Last seen log_base
+        self._own_ids: Dict[str, Set[str]] = {}
+
+    def load(self) -> Iterator[Tuple[str, Memory, Optional[int]]]:
+        """Yield every memory of every user"""
+        for user_id in sorted(member.decode("utf-8") for member in self.client.smembers(self._key("users"))):
+            with self._lock:
+                self._log_offsets[user_id] = 0
+                self._log_bases[user_id] = 0
+            memories, _ = self.poll(user_id)
+            for memory in memories:
+                yield user_id, memory, None
+
+    def append(self, user_id: str, memories: List[Memory]) -> None:
+        """Write memories in a single pipelined transaction"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.sadd(self._key("users"), user_id)
+        pipe.hset(self._key(user_id, "data"), mapping={
+            memory.id: json.dumps(memory.to_dict(), separators=(",", ":")) for memory in memories
+        })
+        pipe.hset(self._key(user_id, "emb"), mapping={
+            memory.id: np.asarray(memory.embedding, dtype=np.float32).tobytes() for memory in memories
+        })
+        self._log(pipe, user_id, [memory.id for memory in memories])
+
+    def update(self, user_id: str, memories: List[Memory]) -> None:
+        """Rewrite stored memories' metadata and log them for other workers"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key(user_id, "data"), mapping={
+            memory.id: json.dumps(memory.to_dict(), separators=(",", ":")) for memory in memories
+        })
+        self._log(pipe, user_id, [memory.id for memory in memories])
+
+    def delete(self, user_id: str, memory_ids: List[str]) -> None:
+        """Remove memories' data and embeddings and log the deletions, in a single pipelined transaction"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hdel(self._key(user_id, "data"), *memory_ids)
+        pipe.hdel(self._key(user_id, "emb"), *memory_ids)
+        self._log(pipe, user_id, [_DELETED + memory_id for memory_id in memory_ids])
+
+    def poll(self, user_id: str) -> Tuple[List[Memory], Optional[List[str]]]:
+        """
+        Fetch changes other workers made to a user's memories since the last poll
+
+        Returns:
+            (memories, deleted ids): new and updated memories with embeddings
+            attached, in log order, and ids of deleted memories. Deleted ids are
+            None when the log was trimmed past this worker's position; memories
+            are then all of the user's memories
+        """
+        with self._lock:
+            offset = self._log_offsets.get(user_id, 0)
+            base = self._log_bases.get(user_id, 0)
+        while True:
+            if offset < base:
+                return self._reload(user_id, offset), None
+            # The base is read with the entries, and they are read again if a trim moved it
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(self._key(user_id, "log_base"))
+            pipe.lrange(self._key(user_id, "log"), offset - base, -1)
+            current, entries = pipe.execute()
+            current = int(current or 0)
+            if current == base:
+                break
+            base = current
+            with self._lock:
+                self._log_bases[user_id] = base
+        entries = [entry.decode("utf-8") for entry in entries]
+        if not entries:
+            return [], []
+
+        with self._lock:
+            # Another thread may have consumed the same tail concurrently
+            if self._log_offsets.get(user_id, 0) != offset:
+                return [], []
+            self._log_offsets[user_id] = offset + len(entries)
+            own_entries = self._own_ids.get(user_id, set())
+            others = [entry for entry in entries if entry not in own_entries]
+            own_entries.difference_update(entries)
+
+        deleted = [entry[len(_DELETED):] for entry in others if entry.startswith(_DELETED)]
+        missing = [entry for entry in others if not entry.startswith(_DELETED)]
+        return self._fetch(user_id, missing), deleted
+
+    def close(self) -> None:
+        """Connections belong to the shared pool and are released after every command"""
+
+    def _log(self, pipe: Any, user_id: str, entries: List[str]) -> None:
+        """Queue log entries after a write in pipe, run it and trim the log if it grew too long"""
+        pipe.rpush(self._key(user_id, "log"), *entries)
+        with self._lock:
+            self._own_ids.setdefault(user_id, set()).update(entries)
+        length = pipe.execute()[-1]
+        if length > 2 * self.log_max_entries:
+            self._trim(user_id)
+
+    def _trim(self, user_id: str) -> None:
+        """Drop the oldest log entries, keeping log_max_entries, and advance the log base"""
+        from redis.exceptions import WatchError
+
+        log_key, base_key = self._key(user_id, "log"), self._key(user_id, "log_base")
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(log_key)
+                excess = pipe.llen(log_key) - self.log_max_entries
+                if excess <= 0:
+                    return
+                pipe.multi()
+                pipe.ltrim(log_key, excess, -1)
+                pipe.incrby(base_key, excess)
+                pipe.execute()
+            except WatchError:
+                return  # Another worker wrote or trimmed meanwhile; the next long write trims again
+        logger.info(f"Trimmed {excess} entries from the memory log of user {user_id}")
+
+    def _reload(self, user_id: str, offset: int) -> List[Memory]:
+        """Every memory of a user, for a worker whose log position was trimmed away"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self._key(user_id, "log_base"))
+        pipe.llen(self._key(user_id, "log"))
+        pipe.hkeys(self._key(user_id, "data"))
+        base, length, ids = pipe.execute()
+        with self._lock:
+            if self._log_offsets.get(user_id, 0) != offset:
+                return []
+            # Changes after this point are in the log from the new position on
+            self._log_bases[user_id] = int(base or 0)
+            self._log_offsets[user_id] = int(base or 0) + length
+            self._own_ids.pop(user_id, None)
+        logger.warning(f"Memory log of user {user_id} was trimmed past this worker, reloading {len(ids)} memories")
+        memories = self._fetch(user_id, [memory_id.decode("utf-8") for memory_id in ids])
+        memories.sort(key=lambda memory: memory.timestamp_us)
+        return memories
+
+    def _fetch(self, user_id: str, memory_ids: List[str]) -> List[Memory]:
+        """Memories with embeddings attached, by id with batched HMGETs (ids without data are skipped)"""
+        memories = []
+        for start in range(0, len(memory_ids), self.batch_size):
+            chunk = memory_ids[start:start + self.batch_size]
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hmget(self._key(user_id, "data"), chunk)
+            pipe.hmget(self._key(user_id, "emb"), chunk)
+            data, embeddings = pipe.execute()
+            for raw, embedding in zip(data, embeddings):
+                if raw is None:
+                    continue
+                memory = Memory.from_dict(json.loads(raw))
+                memory.embedding = np.frombuffer(embedding, dtype=np.float32) if embedding else None
+                memories.append(memory)
+        return memories
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.key_prefix,) + parts)
@@ -0,0 +1,88 @@
+"""
+Retrieval result cache for REX
+Bounded LRU cache of retrieval results, invalidated by per-user version counters
+"""
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, List, Optional, Tuple
+import logging
+import threading
+
+from models.memory import Memory
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Cache of retrieve_memories() results
+    Every entry records the version of the user's memories it was computed from.
+    The memory manager bumps a user's version on every write, so an entry is only
+    returned while nothing has changed since; stale entries are dropped when they
+    are next looked up or aged out by LRU eviction
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of results kept (least recently used are evicted)
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[int, List[Memory]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, key: Hashable, version: int) -> Optional[List[Memory]]:
+        """
+        Look up a result
+
+        Args:
+            user_id: Unique identifier for the user
+            key: Query key (normalized query, categories, limit, ...)
+            version: Current version of the user's memories
+
+        Returns:
+            The cached memories, or None if there is no entry for this version
+        """
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None and entry[0] != version:
+                del self._entries[(user_id, key)]
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((user_id, key))
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, user_id: str, key: Hashable, version: int, memories: List[Memory]) -> None:
+        """
+        Add a result computed from the given version of the user's memories
+
+        A result computed while a write was in progress carries the version read
+        before the search, so it is already stale and never returned
+        """
+        with self._lock:
+            self._entries[(user_id, key)] = (version, list(memories))
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries
+        }
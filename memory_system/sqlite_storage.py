@@ -0,0 +1,145 @@
+"""
+SQLite storage backend for REX
+Embedded single-node storage in one database file
+"""
+from typing import Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+
+from models.memory import Memory, MemoryCategory
+from memory_system.persistence import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    content TEXT NOT NULL,
+    source TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    embedding BLOB,
+    UNIQUE (user_id, id)
+);
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses the prepared forms
+_INSERT = (
+    "INSERT OR IGNORE INTO memories (id, user_id, category, content, source, metadata, timestamp, embedding) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_UPDATE = "UPDATE memories SET metadata = ? WHERE user_id = ? AND id = ?"
+_DELETE = "DELETE FROM memories WHERE user_id = ? AND id = ?"
+_COLUMNS = "id, category, content, source, metadata, timestamp"
+_LOAD = f"SELECT user_id, {_COLUMNS}, embedding FROM memories ORDER BY seq"
+
+class SQLiteMemoryStorage(MemoryStorage):
+    """
+    SQLite storage backend
+    Runs in WAL mode so readers never block the writer; every append is a single
+    transaction and embeddings are stored as float32 BLOBs. The table has no
+    time or text indexes: the manager reads it only at startup, then answers
+    listings ("latest N in category X") from its time-ordered in-memory lists
+    and keyword queries from its in-memory BM25 index
+    """
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        """
+        Open (or create) the database
+
+        Args:
+            path: Database file
+            synchronous: SQLite synchronous pragma; NORMAL is durable against
+                application crashes in WAL mode, FULL also against power loss
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.synchronous = synchronous
+        self._write_lock = threading.Lock()
+        self._local = threading.local()  # Per-thread read connections
+        self._readers: List[sqlite3.Connection] = []  # Every read connection, closed with the storage
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(_SCHEMA)
+        self._writer.commit()
+
+    def load(self) -> Iterator[Tuple[str, Memory, Optional[int]]]:
+        """Yield every memory in insertion order"""
+        for row in self._reader().execute(_LOAD):
+            memory = self._memory(row[1:7])
+            memory.embedding = np.frombuffer(row[7], dtype=np.float32) if row[7] else None
+            yield row[0], memory, None
+
+    def append(self, user_id: str, memories: List[Memory]) -> None:
+        """Insert memories in one transaction"""
+        rows = [
+            (
+                memory.id, user_id, memory.category.value, memory.content, memory.source,
+                json.dumps(dict(memory.metadata), separators=(",", ":")), memory.timestamp,
+                None if memory.embedding is None else np.asarray(memory.embedding, dtype=np.float32).tobytes()
+            )
+            for memory in memories
+        ]
+        with self._write_lock, self._writer:
+            self._writer.executemany(_INSERT, rows)
+
+    def update(self, user_id: str, memories: List[Memory]) -> None:
+        """Replace the metadata of stored memories in one transaction"""
+        rows = [(json.dumps(dict(memory.metadata), separators=(",", ":")), user_id, memory.id) for memory in memories]
+        with self._write_lock, self._writer:
+            self._writer.executemany(_UPDATE, rows)
+
+    def delete(self, user_id: str, memory_ids: List[str]) -> None:
+        """Delete stored memories in one transaction"""
+        with self._write_lock, self._writer:
+            self._writer.executemany(_DELETE, [(user_id, memory_id) for memory_id in memory_ids])
+
+    def flush(self) -> None:
+        """Checkpoint the WAL into the main database file"""
+        with self._write_lock:
+            self._writer.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self) -> None:
+        """Close the writer and every thread's read connection"""
+        with self._write_lock:
+            self._writer.close()
+            for connection in self._readers:
+                connection.close()
+            self._readers = []
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """Read connection for the current thread (WAL readers run concurrently)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._write_lock:
+                self._readers.append(connection)
+        return connection
+
+    @staticmethod
+    def _memory(row: Tuple) -> Memory:
+        """Memory from an (id, category, content, source, metadata, timestamp) row"""
+        memory_id, category, content, source, metadata, timestamp = row
+        return Memory(
+            category=MemoryCategory(category),
+            content=content,
+            source=source,
+            metadata=json.loads(metadata),
+            timestamp=timestamp,
+            memory_id=memory_id
+        )
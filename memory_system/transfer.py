@@ -0,0 +1,324 @@
+"""
+Memory transfer for REX
+Streaming export and import of a user's memories as NDJSON or Arrow IPC
+"""
+from typing import Dict, Any, Iterator, List, Optional
+import argparse
+import base64
+import io
+import json
+import logging
+import sys
+import tempfile
+import numpy as np
+
+from models.memory import Memory
+from memory_system.memory_interface import MemoryInterface
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+EXPORT_VERSION = 1
+
+# Arrow bodies are buffered in memory up to this size, then on disk
+_SPOOL_BYTES = 16 * 1024 * 1024
+
+def _arrow():
+    """Import pyarrow, which is only needed for the Arrow format"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("The arrow format requires pyarrow (pip install pyarrow)")
+    return pyarrow
+
+def check_format(fmt: str) -> str:
+    """
+    Validate an export format name
+
+    Returns:
+        The format's media type
+
+    Raises:
+        ValueError: For an unknown format
+        ImportError: If the format's library is not installed
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(FORMATS)}")
+    if fmt == "arrow":
+        _arrow()
+    return FORMATS[fmt]
+
+def export_memories(memory_manager: MemoryInterface,
+                    user_id: str,
+                    fmt: str = "ndjson",
+                    chunk_size: int = 1000) -> Iterator[bytes]:
+    """
+    Serialize a user's memories with their embeddings, one chunk at a time
+
+    NDJSON output starts with a header line (format version, user, embedding
+    model and dimension) followed by one memory per line, its embedding as
+    base64 little-endian float32. Arrow output is an IPC stream with one record
+    batch per chunk, the header in the schema metadata and embeddings as a
+    fixed-size float32 list column.
+
+    Args:
+        memory_manager: Memory manager holding the user's memories
+        user_id: Unique identifier for the user
+        fmt: "ndjson" or "arrow"
+        chunk_size: Memories per chunk
+
+    Yields:
+        Encoded chunks
+    """
+    check_format(fmt)
+    header = {
+        "rex_export": EXPORT_VERSION,
+        "user_id": user_id,
+        "embedding_model": memory_manager.embedding_model_name,
+        "dim": memory_manager.embedding_dim(user_id)
+    }
+    chunks = memory_manager.iter_memories(user_id, chunk_size)
+    if fmt == "arrow":
+        yield from _export_arrow(header, chunks)
+        return
+
+    yield (json.dumps(header) + "\n").encode("utf-8")
+    for memories, vectors in chunks:
+        lines = []
+        for memory, vector in zip(memories, vectors.astype("<f4")):
+            record = memory.to_dict()
+            record["embedding"] = base64.b64encode(vector.tobytes()).decode("ascii")
+            lines.append(json.dumps(record))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def _export_arrow(header: Dict[str, Any], chunks: Iterator) -> Iterator[bytes]:
+    """Write chunks as record batches of an Arrow IPC stream"""
+    pa = _arrow()
+    dim = header["dim"]
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("category", pa.string()),
+        ("content", pa.string()),
+        ("source", pa.string()),
+        ("metadata", pa.string()),  # JSON
+        ("timestamp", pa.string()),
+        ("embedding", pa.list_(pa.float32(), dim) if dim else pa.list_(pa.float32()))
+    ], metadata={"rex_export": json.dumps(header)})
+
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+    for memories, vectors in chunks:
+        records = [memory.to_dict() for memory in memories]
+        writer.write_batch(pa.record_batch([
+            pa.array([r["id"] for r in records], pa.string()),
+            pa.array([r["category"] for r in records], pa.string()),
+            pa.array([r["content"] for r in records], pa.string()),
+            pa.array([r["source"] for r in records], pa.string()),
+            pa.array([json.dumps(r["metadata"]) for r in records], pa.string()),
+            pa.array([r["timestamp"] for r in records], pa.string()),
+            pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1), pa.float32()), vectors.shape[1])
+        ], schema=schema))
+        yield _drain(sink)
+    writer.close()
+    yield _drain(sink)
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """Take what has been written to a buffer so far"""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+class MemoryImporter:
+    """
+    Incremental import of an export stream into a user's memories
+    Data is fed in arbitrary pieces (e.g. request body chunks) and stored every
+    chunk_size memories. Embeddings are reused when the export was made with the
+    same embedding model, so nothing is re-encoded. Memories whose id the user
+    already has are skipped, and memories that repeat stored content are merged
+    by deduplication, so an interrupted import can simply be run again
+    """
+
+    def __init__(self, memory_manager: MemoryInterface, user_id: str, fmt: str = "ndjson", chunk_size: int = 1000):
+        """
+        Initialize the importer
+
+        Args:
+            memory_manager: Memory manager to store into
+            user_id: Unique identifier for the user receiving the memories
+            fmt: "ndjson" or "arrow"
+            chunk_size: Memories stored per call
+        """
+        check_format(fmt)
+        self.memory_manager = memory_manager
+        self.user_id = user_id
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.stats = {"imported": 0, "duplicates": 0, "skipped": 0, "reencoded": 0}
+        self._header: Optional[Dict[str, Any]] = None
+        self._use_embeddings = True
+        self._pending: List[Memory] = []
+        self._buffer = b""
+        self._spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES) if fmt == "arrow" else None
+
+        # Ids the user already has; the memories themselves are resident anyway
+        self._known_ids = set(memory_manager.memory_ids(user_id))
+
+    def feed(self, data: bytes) -> None:
+        """Consume the next piece of the stream"""
+        if self._spool is not None:
+            self._spool.write(data)
+            return
+
+        self._buffer += data
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return
+        lines, self._buffer = self._buffer[:end], self._buffer[end + 1:]
+        for line in lines.split(b"\n"):
+            self._parse_line(line)
+
+    def finish(self) -> Dict[str, int]:
+        """
+        Store whatever is left
+
+        Returns:
+            Counts of imported, duplicate (merged by content), skipped (id already
+            present) and re-encoded memories
+        """
+        if self._spool is not None:
+            self._read_arrow()
+        else:
+            self._parse_line(self._buffer)
+            self._buffer = b""
+        self._flush()
+        logger.info(f"Imported memories for user {self.user_id}: {self.stats}")
+        return dict(self.stats)
+
+    def _parse_line(self, line: bytes) -> None:
+        line = line.strip()
+        if not line:
+            return
+        record = json.loads(line)
+        if "rex_export" in record:
+            self._set_header(record)
+            return
+        embedding = record.pop("embedding", None)
+        vector = np.frombuffer(base64.b64decode(embedding), dtype="<f4") if embedding else None
+        self._add(Memory.from_dict(record), vector)
+
+    def _read_arrow(self) -> None:
+        pa = _arrow()
+        self._spool.seek(0)
+        reader = pa.ipc.open_stream(self._spool)
+        metadata = reader.schema.metadata or {}
+        if b"rex_export" in metadata:
+            self._set_header(json.loads(metadata[b"rex_export"]))
+        for batch in reader:
+            columns = batch.to_pydict()
+            vectors = batch.column("embedding").flatten().to_numpy(zero_copy_only=False)
+            vectors = vectors.reshape(batch.num_rows, -1) if batch.num_rows else vectors
+            for position in range(batch.num_rows):
+                memory = Memory.from_dict({
+                    "id": columns["id"][position],
+                    "category": columns["category"][position],
+                    "content": columns["content"][position],
+                    "source": columns["source"][position],
+                    "metadata": json.loads(columns["metadata"][position] or "{}"),
+                    "timestamp": columns["timestamp"][position]
+                })
+                self._add(memory, vectors[position] if vectors.size else None)
+        self._spool.close()
+
+    def _set_header(self, header: Dict[str, Any]) -> None:
+        self._header = header
+        if header.get("embedding_model") != self.memory_manager.embedding_model_name:
+            logger.warning(
+                f"Export was made with embedding model {header.get('embedding_model')}, "
+                f"re-encoding for {self.memory_manager.embedding_model_name}"
+            )
+            self._use_embeddings = False
+
+    def _add(self, memory: Memory, vector: Optional[np.ndarray]) -> None:
+        if memory.id in self._known_ids:
+            self.stats["skipped"] += 1
+            return
+        if self._use_embeddings and vector is not None and vector.size:
+            memory.embedding = np.array(vector, dtype=np.float32)
+        else:
+            self.stats["reencoded"] += 1
+        self._pending.append(memory)
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        memories, self._pending = self._pending, []
+        stored_ids = self.memory_manager.store_memories(self.user_id, memories)
+        for memory, stored_id in zip(memories, stored_ids):
+            self._known_ids.add(memory.id)
+            if stored_id == memory.id:
+                self.stats["imported"] += 1
+            else:
+                self.stats["duplicates"] += 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line interface: stream a user's memories from or to a REX server
+
+    python -m memory_system.transfer export USER_ID [-o FILE] [--format arrow]
+    python -m memory_system.transfer import USER_ID [-i FILE] [--format arrow]
+    """
+    import urllib.parse
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Export or import a user's REX memories")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("user_id")
+    parser.add_argument("--url", default="http://localhost:8000", help="REX server (default: %(default)s)")
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("-o", "--output", help="Export destination (default: stdout)")
+    parser.add_argument("-i", "--input", help="Import source (default: stdin)")
+    args = parser.parse_args(argv)
+
+    url = f"{args.url.rstrip('/')}/api/memory/{urllib.parse.quote(args.user_id, safe='')}/{args.command}?format={args.format}"
+    if args.command == "export":
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            with urllib.request.urlopen(url) as response:
+                while True:
+                    data = response.read(1024 * 1024)
+                    if not data:
+                        break
+                    output.write(data)
+        finally:
+            if args.output:
+                output.close()
+        return 0
+
+    source = open(args.input, "rb") if args.input else sys.stdin.buffer
+
+    def body() -> Iterator[bytes]:
+        while True:
+            data = source.read(1024 * 1024)
+            if not data:
+                return
+            yield data
+
+    # An iterable body without a length is sent with chunked transfer encoding
+    request = urllib.request.Request(url, data=body(), method="POST", headers={"Content-Type": FORMATS[args.format]})
+    try:
+        with urllib.request.urlopen(request) as response:
+            print(response.read().decode("utf-8"))
+    finally:
+        if args.input:
+            source.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
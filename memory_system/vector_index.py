@@ -0,0 +1,345 @@
+"""
+Vector index for REX
+Keeps a user's memory embeddings in one contiguous matrix for fast similarity search
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+
+from models.memory import Memory, MemoryCategory
+from memory_system.ann_index import IVFIndex
+from memory_system.embedding_store import EmbeddingMatrix, QuantizedMatrix
+
+logger = logging.getLogger(__name__)
+
+# Compact integer code for each category, stored in a parallel array
+CATEGORY_CODES = {category: code for code, category in enumerate(MemoryCategory)}
+
+class VectorIndex:
+    """
+    Per-user embedding index
+    Stores L2-normalized float32 embeddings in a growable matrix with a parallel
+    category array, so a query is a single matrix-vector product plus a partial sort.
+    Indexed memories reference their row of the matrix instead of owning an array.
+
+    With quantization enabled, candidates are scored on a float16 or int8 copy of
+    the matrix and the best limit * rescore_multiplier are rescored exactly against
+    the float32 rows. Full-precision rows are only kept when they are memory-mapped
+    (storage "mmap"), where they stay in the page cache rather than process memory;
+    otherwise the compressed matrix is the only copy and results are not rescored
+    """
+
+    def __init__(self,
+                 config: Optional[Dict[str, Any]] = None,
+                 initial_capacity: int = 256,
+                 path: Optional[str] = None):
+        """
+        Initialize an empty index
+
+        Args:
+            config: Application configuration; the "vector_index" section selects
+                exact or approximate (IVF) search and its tuning parameters
+            initial_capacity: Number of rows to preallocate
+            path: File for memory-mapped embedding storage (optional); an existing
+                file is mapped so its rows can be adopted without copying
+        """
+        index_config = (config or {}).get("vector_index", {})
+        self.index_type = index_config.get("type", "exact")
+        self.ann_min_size = index_config.get("ann_min_size", 10000)
+        self.ivf_nlist = index_config.get("ivf_nlist", 0)
+        self.ivf_nprobe = index_config.get("ivf_nprobe", 8)
+        self.ivf_retrain_growth = index_config.get("ivf_retrain_growth", 2.0)
+        self._ann = None  # Built once the index reaches ann_min_size
+        self.quantization = index_config.get("quantization", "none")
+        self.rescore_multiplier = index_config.get("rescore_multiplier", 4)
+        self._codes: Optional[QuantizedMatrix] = None  # Compressed rows used for scoring
+
+        self.initial_capacity = initial_capacity
+        self.path = path
+        self._matrix = EmbeddingMatrix.open(path) if path else None  # Otherwise created on first insert
+        self.dim = self._matrix.dim if self._matrix is not None else None
+        self._categories = np.zeros(initial_capacity, dtype=np.int8)
+        self._memories: List[Memory] = []
+
+    def __len__(self) -> int:
+        return len(self._memories)
+
+    @property
+    def memories(self) -> List[Memory]:
+        """Indexed memories in row order (do not modify)"""
+        return self._memories
+
+    @property
+    def mapped(self) -> bool:
+        """Whether embeddings are stored in a memory-mapped file"""
+        return self.path is not None
+
+    @property
+    def _vectors(self) -> np.ndarray:
+        return self._matrix.array
+
+    @property
+    def quantized(self) -> bool:
+        """Whether candidates are scored on a compressed matrix"""
+        return self.quantization != "none"
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Bytes used by the index's embeddings
+
+        Returns:
+            "resident": in process memory; "mapped": in memory-mapped files
+        """
+        resident = self._categories.nbytes
+        mapped = 0
+        if self._codes is not None:
+            resident += self._codes.nbytes
+        if self._matrix is not None:
+            if self._matrix.mapped:
+                mapped += self._matrix.array.nbytes
+            else:
+                resident += self._matrix.array.nbytes
+        return {"resident": resident, "mapped": mapped}
+
+    def add(self, memory: Memory, embedding: np.ndarray) -> int:
+        """
+        Add a single memory to the index
+
+        Returns:
+            Row of the memory in the index
+        """
+        return self.add_batch([memory], [embedding])[0]
+
+    def add_batch(self, memories: Sequence[Memory], embeddings: Sequence[np.ndarray]) -> List[int]:
+        """
+        Add several memories to the index
+
+        Args:
+            memories: Memory objects to index
+            embeddings: Embedding for each memory, in the same order
+
+        Returns:
+            Rows of the memories in the index
+        """
+        if not memories:
+            return []
+
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(memories), -1))
+        start = len(self._memories)
+        end = start + len(memories)
+        self._reserve(end, vectors.shape[1])
+
+        if self._matrix is not None:
+            self._matrix.array[start:end] = vectors
+        if self._codes is not None:
+            self._codes.set_rows(start, vectors)
+        self._append(memories, start)
+        return list(range(start, end))
+
+    def adopt(self, memories: Sequence[Memory], rows: Sequence[int]) -> bool:
+        """
+        Index memories whose embeddings are already stored in the mapped file
+
+        Used on startup, when a snapshot lists the row of every memory so nothing
+        has to be copied or decoded. Rows must continue the index contiguously.
+
+        Returns:
+            False (and nothing is indexed) if the file does not hold those rows
+        """
+        start = len(self._memories)
+        end = start + len(memories)
+        if self._matrix is None or not self._matrix.mapped or list(rows) != list(range(start, end)):
+            return False
+        if end > self._matrix.capacity:
+            return False
+
+        if self.quantized:
+            self._reserve(end, self.dim)
+            self._codes.set_rows(start, np.asarray(self._matrix.array[start:end]))
+        self._append(memories, start)
+        return True
+
+    def vectors(self, start: int, end: int) -> np.ndarray:
+        """Copy of the (normalized) float32 embeddings of rows [start, end)"""
+        return np.array(self._dense(start, end), dtype=np.float32)
+
+    def flush(self) -> None:
+        """Write a mapped matrix's dirty pages to disk"""
+        if self._matrix is not None:
+            self._matrix.flush()
+
+    def search(self,
+               query: np.ndarray,
+               limit: int,
+               categories: Optional[Sequence[MemoryCategory]] = None,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[Memory, float]]:
+        """
+        Find the memories most similar to a query embedding
+
+        Args:
+            query: Query embedding
+            limit: Maximum number of results
+            categories: Restrict the search to these categories (optional)
+            rows: Score only these rows, e.g. a time window (optional)
+
+        Returns:
+            List of (memory, cosine similarity) pairs, best match first
+        """
+        size = len(self._memories)
+        if size == 0 or limit <= 0:
+            return []
+
+        query = self._normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        if query.shape[0] != self.dim:
+            logger.warning(f"Query dimension {query.shape[0]} does not match index dimension {self.dim}")
+            return []
+
+        if rows is not None:
+            # A preselected candidate set is scored directly: cost follows its size, not the index's
+            rows = rows[rows < size]
+            if categories:
+                rows = rows[self._category_mask(rows, categories)]
+            if rows.shape[0] == 0:
+                return []
+            if self._codes is not None:
+                scores = self._codes.row_scores(rows, query)
+            else:
+                scores = self._vectors[rows] @ query
+            return self._rank(rows, scores, query, limit)
+
+        if self._ann is not None:
+            results = self._search_ann(query, limit, categories)
+            if results is not None:
+                return results
+
+        if self._codes is not None:
+            scores = self._codes.scores(query, size)
+        else:
+            scores = self._vectors[:size] @ query
+
+        if categories:
+            rows = np.flatnonzero(self._category_mask(np.arange(size), categories))
+            if rows.size == 0:
+                return []
+            scores = scores[rows]
+        else:
+            rows = np.arange(size)
+
+        return self._rank(rows, scores, query, limit)
+
+    def _search_ann(self,
+                    query: np.ndarray,
+                    limit: int,
+                    categories: Optional[Sequence[MemoryCategory]]) -> Optional[List[Tuple[Memory, float]]]:
+        """
+        Score only the rows in the closest IVF clusters
+
+        Returns None when the probed clusters hold fewer than limit matching rows,
+        so the caller can fall back to an exact search
+        """
+        rows = self._ann.candidates(query)
+        if categories:
+            rows = rows[self._category_mask(rows, categories)]
+        if rows.shape[0] < limit:
+            return None
+
+        if self._codes is not None:
+            scores = self._codes.row_scores(rows, query)
+        else:
+            scores = self._vectors[rows] @ query
+        return self._rank(rows, scores, query, limit)
+
+    def _rank(self, rows: np.ndarray, scores: np.ndarray, query: np.ndarray, limit: int) -> List[Tuple[Memory, float]]:
+        """
+        Best rows by score; approximate (compressed) scores of the top
+        limit * rescore_multiplier rows are replaced by exact ones first
+        """
+        if self._codes is not None and self._matrix is not None and self.rescore_multiplier > 0:
+            candidates = rows[self._top_k(scores, limit * self.rescore_multiplier)]
+            rows = np.sort(candidates)  # Ascending rows read the mapped file sequentially
+            scores = self._matrix.array[rows] @ query
+        top = self._top_k(scores, limit)
+        return [(self._memories[rows[i]], float(scores[i])) for i in top]
+
+    def _update_ann(self, start: int, end: int) -> None:
+        """Train, retrain or extend the IVF index after rows [start, end) were added"""
+        size = end
+        if size < self.ann_min_size:
+            return
+
+        if self._ann is None or size >= self._ann.trained_size * self.ivf_retrain_growth:
+            # Retraining at geometric growth keeps clusters balanced at amortized constant cost
+            nlist = self.ivf_nlist or int(np.sqrt(size))
+            ann = IVFIndex(nlist=nlist, nprobe=self.ivf_nprobe)
+            ann.train(self._dense(0, size))
+            self._ann = ann
+        else:
+            self._ann.add(np.arange(start, end), self._dense(start, end))
+
+    def _dense(self, start: int, end: int) -> np.ndarray:
+        """float32 vectors of rows [start, end)"""
+        if self._matrix is not None:
+            return self._vectors[start:end]
+        return self._codes.take(np.arange(start, end))
+
+    def _category_mask(self, rows: np.ndarray, categories: Sequence[MemoryCategory]) -> np.ndarray:
+        """Boolean mask of the given rows that belong to one of the categories"""
+        codes = [CATEGORY_CODES[category] for category in categories]
+        return np.isin(self._categories[rows], codes)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+        """Positions of the highest scores, best first"""
+        k = min(limit, scores.shape[0])
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def _append(self, memories: Sequence[Memory], start: int) -> None:
+        """Record metadata for memories whose vectors are in place at rows start onwards"""
+        end = start + len(memories)
+        store = self._matrix if self._matrix is not None else self._codes
+        self._reserve_categories(store.capacity)
+        self._categories[start:end] = [CATEGORY_CODES[memory.category] for memory in memories]
+        for row, memory in enumerate(memories, start):
+            memory.bind_embedding(store, row)
+        self._memories.extend(memories)
+
+        if self.index_type == "ivf":
+            self._update_ann(start, end)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """L2-normalize rows, leaving all-zero rows untouched"""
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, size: int, dim: int) -> None:
+        """Grow the backing matrix (amortized doubling) to hold at least size rows"""
+        if self._matrix is not None and dim != self.dim and not self._memories:
+            # A stale file written for another model is simply replaced
+            self._matrix = None
+        if self.dim is not None and dim != self.dim and self._memories:
+            raise ValueError(f"Embedding dimension {dim} does not match index dimension {self.dim}")
+        self.dim = dim
+        capacity = max(self.initial_capacity, size)
+
+        # Full-precision rows are kept unless quantized rows replace them in memory
+        if self._matrix is None and (not self.quantized or self.path is not None):
+            self._matrix = EmbeddingMatrix(dim, self.path, capacity)
+        if self._matrix is not None:
+            self._matrix.reserve(size)
+        if self.quantized:
+            if self._codes is None:
+                self._codes = QuantizedMatrix(dim, self.quantization, capacity)
+            self._codes.reserve(size)
+
+    def _reserve_categories(self, capacity: int) -> None:
+        """Keep the category array as long as the matrix"""
+        if capacity > self._categories.shape[0]:
+            categories = np.zeros(capacity, dtype=np.int8)
+            categories[:self._categories.shape[0]] = self._categories
+            self._categories = categories
@@ -30,3 +30,31 @@ class ConversationResponse(BaseModel):
         default_factory=dict,
         description="Additional metadata about the response"
     )
+
+class BatchItem(BaseModel):
+    """
+    One conversation (or message) in a bulk ingestion request
+    """
+    idempotency_key: str = Field(..., description="Client-chosen key; an item is stored at most once per key")
+    session_id: Optional[str] = Field(default=None, description="Session or conversation the messages belong to")
+    messages: List[Dict[str, Any]] = Field(
+        ...,
+        description="Messages in order, each with a role (user or assistant) and content"
+    )
+    timestamp: Optional[str] = Field(default=None, description="When the conversation took place (ISO 8601)")
+
+class BatchIngestInput(BaseModel):
+    """
+    Input model for bulk ingestion
+    """
+    user_id: str = Field(..., description="Unique identifier for the user")
+    items: List[BatchItem] = Field(..., description="Conversations or messages to store")
+
+class BatchItemResult(BaseModel):
+    """
+    Outcome of one bulk ingestion item
+    """
+    idempotency_key: str
+    status: str = Field(..., description="stored, duplicate or failed")
+    memory_ids: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
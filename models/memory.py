@@ -3,9 +3,11 @@ Memory models for REX
 Defines the data structures for memory storage and retrieval
 """
 from enum import Enum
-from typing import Dict, Any, Optional, List
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, List
+import sys
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import numpy as np
 
 class MemoryCategory(Enum):
@@ -17,11 +19,64 @@ class MemoryCategory(Enum):
     PREFERENCES = "preferences"
     TIMELINE = "timeline"
 
+# Integer timestamps count microseconds from this (naive, local time) epoch
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Metadata strings at least this long that occur in the content are stored as spans of it
+_MIN_SPAN_LENGTH = 16
+
+# Shorter metadata strings (e.g. "extracted_from" excerpts shared by a turn's memories) are interned
+_MAX_INTERN_LENGTH = 128
+
+def parse_timestamp(value: Any) -> datetime:
+    """
+    Convert an ISO format string to a datetime (datetimes are returned as they are)
+    
+    A trailing "Z" (JavaScript's toISOString) is read as UTC on every Python version
+    """
+    if isinstance(value, str):
+        if value.endswith(("Z", "z")):
+            value = value[:-1] + "+00:00"  # fromisoformat only accepts "Z" from Python 3.11
+        value = datetime.fromisoformat(value)
+    return value
+
+def to_timestamp_us(value: Any) -> int:
+    """
+    Convert a datetime or ISO format string to integer microseconds since 1970-01-01 (local time)
+    
+    Aware datetimes are converted to local time first, so they order correctly
+    against naive ones (Memory.timestamp keeps their UTC offset separately)
+    """
+    value = parse_timestamp(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)  # Same instant, in local time like datetime.now()
+    return (value - _EPOCH) // _MICROSECOND
+
+class _ContentSpan:
+    """Metadata value stored as a slice of the memory's content"""
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+
 class Memory:
     """
     Memory data structure for storing and retrieving contextual information
+    
+    Instances are slotted and compact: the id is kept as 16 bytes when it is a
+    canonical UUID, the timestamp as integer microseconds, source strings and
+    metadata keys are interned, and metadata values that repeat part of the
+    content (such as a timeline entry's user_input) are stored as spans of it.
+    A timestamp given with a UTC offset keeps it, so it reads back with the
+    same instant and offset. The public attributes and to_dict()/from_dict()
+    are unchanged
     """
     
+    __slots__ = ("_id", "category", "_content", "_source", "_metadata", "_timestamp", "_zone",
+                 "_embedding", "_embedding_matrix", "_embedding_row", "relevance_score")
+    
     def __init__(self, 
                 category: MemoryCategory, 
                 content: str, 
@@ -42,15 +97,150 @@ class Memory:
             embedding: Vector embedding of the memory content
             memory_id: Unique identifier (defaults to generated UUID)
         """
-        self.id = memory_id or str(uuid.uuid4())
+        self.id = memory_id or uuid.uuid4()
         self.category = category
-        self.content = content
+        self._content = content
+        self._metadata = None
         self.source = source
         self.metadata = metadata or {}
-        self.timestamp = timestamp or datetime.now().isoformat()
+        self.timestamp = timestamp or datetime.now()
         self.embedding = embedding
         self.relevance_score = 0.0  # Used during retrieval
     
+    @property
+    def id(self) -> str:
+        """Unique identifier"""
+        if isinstance(self._id, bytes):
+            return str(uuid.UUID(bytes=self._id))
+        return self._id
+    
+    @id.setter
+    def id(self, value: Any) -> None:
+        if isinstance(value, uuid.UUID):
+            self._id = value.bytes
+            return
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            parsed = None
+        # Only canonical UUID strings are packed, so every id reads back exactly as given
+        self._id = parsed.bytes if parsed is not None and str(parsed) == value else value
+    
+    @property
+    def content(self) -> str:
+        """The actual content of the memory"""
+        return self._content
+    
+    @content.setter
+    def content(self, value: str) -> None:
+        metadata = self._metadata_dict()  # Spans refer to the old content
+        self._content = value
+        self.metadata = metadata
+    
+    @property
+    def source(self) -> str:
+        """Source of the memory (conversation, document, etc.)"""
+        return self._source
+    
+    @source.setter
+    def source(self, value: str) -> None:
+        self._source = sys.intern(value)
+    
+    @property
+    def metadata(self) -> Mapping[str, Any]:
+        """
+        Additional metadata for the memory
+        
+        A read-only view, since changing it in place would not change the memory:
+        assign a whole dict to update it, e.g. memory.metadata = dict(memory.metadata, hits=2)
+        """
+        return MappingProxyType(self._metadata_dict())
+    
+    @metadata.setter
+    def metadata(self, value: Optional[Mapping[str, Any]]) -> None:
+        if not value:
+            self._metadata = None
+            return
+        # Stored as a flat (key, value, key, value, ...) tuple, a fraction of a dict's size
+        items = []
+        for key, item in value.items():
+            if isinstance(item, str):
+                position = self._content.find(item) if len(item) >= _MIN_SPAN_LENGTH else -1
+                if position >= 0:
+                    item = _ContentSpan(position, position + len(item))
+                elif len(item) <= _MAX_INTERN_LENGTH:
+                    item = sys.intern(item)
+            items.append(sys.intern(key) if isinstance(key, str) else key)
+            items.append(item)
+        self._metadata = tuple(items)
+    
+    def _metadata_dict(self) -> Dict[str, Any]:
+        """Metadata as a new plain dict"""
+        if self._metadata is None:
+            return {}
+        items = self._metadata
+        return {
+            items[i]: self._content[items[i + 1].start:items[i + 1].end]
+            if isinstance(items[i + 1], _ContentSpan) else items[i + 1]
+            for i in range(0, len(items), 2)
+        }
+    
+    @property
+    def timestamp(self) -> str:
+        """ISO format timestamp, with its UTC offset if it was given one"""
+        if self._zone is None:
+            return (_EPOCH + self._timestamp * _MICROSECOND).isoformat()
+        zone, shift = self._zone
+        return (_EPOCH + (self._timestamp + shift) * _MICROSECOND).replace(tzinfo=zone).isoformat()
+    
+    @timestamp.setter
+    def timestamp(self, value: Any) -> None:
+        value = parse_timestamp(value)
+        self._timestamp = to_timestamp_us(value)
+        offset = value.utcoffset()
+        if offset is None:
+            self._zone = None
+            return
+        # The offset and the distance from local time to the wall-clock time in that
+        # offset; reading back adds the distance instead of converting between zones
+        wall_clock = (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+        self._zone = (timezone(offset), wall_clock - self._timestamp)
+    
+    @property
+    def timestamp_us(self) -> int:
+        """Timestamp as integer microseconds since 1970-01-01 (local time), for ordering and range queries"""
+        return self._timestamp
+    
+    @property
+    def embedding(self) -> Optional[np.ndarray]:
+        """Vector embedding of the memory content"""
+        if self._embedding_matrix is not None:
+            return self._embedding_matrix.row(self._embedding_row)
+        return self._embedding
+    
+    @embedding.setter
+    def embedding(self, value: Optional[np.ndarray]) -> None:
+        self._embedding = value
+        self._embedding_matrix = None
+        self._embedding_row = None
+    
+    @property
+    def embedding_row(self) -> Optional[int]:
+        """Row of the embedding in a shared embedding matrix, if bound to one"""
+        return self._embedding_row
+    
+    def bind_embedding(self, matrix: Any, row: int) -> None:
+        """
+        Reference the embedding stored at a row of a shared matrix instead of owning an array
+        
+        Args:
+            matrix: EmbeddingMatrix holding the embedding
+            row: Row of the embedding in the matrix
+        """
+        self._embedding = None
+        self._embedding_matrix = matrix
+        self._embedding_row = row
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert memory to dictionary representation"""
         return {
@@ -58,7 +248,7 @@ class Memory:
             "category": self.category.value,
             "content": self.content,
             "source": self.source,
-            "metadata": self.metadata,
+            "metadata": self._metadata_dict(),
             "timestamp": self.timestamp,
             # Embedding is not included in dict representation
         }
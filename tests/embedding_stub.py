@@ -0,0 +1,51 @@
+"""
+Embedding model stub for REX tests
+Stands in for the SentenceTransformer model so tests don't download or load it
+"""
+import os
+import re
+import unittest
+import zlib
+import numpy as np
+
+from memory_system import model_registry
+from utils.config_loader import DEFAULT_CONFIG
+
+# Set to 1 to also run the tests that load the real embedding model
+REAL_MODEL_ENV = "REX_TEST_REAL_MODEL"
+
+requires_real_model = unittest.skipUnless(
+    os.environ.get(REAL_MODEL_ENV) == "1", f"loads the real embedding model (set {REAL_MODEL_ENV}=1)"
+)
+
+class StubEmbeddingModel:
+    """
+    Bag-of-words embeddings: every word is hashed to one of 384 dimensions and
+    the counts are normalized, so texts sharing words are similar
+    """
+
+    dim = 384
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Embed one text or a list of texts, like SentenceTransformer.encode"""
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        if not sentences:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed(sentence) for sentence in sentences])
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def use_stub_model(model_name=DEFAULT_CONFIG["embedding_model"]):
+    """Serve model_name from a stub for the rest of the process"""
+    model = StubEmbeddingModel()
+    model_registry.register_embedding_model(model_name, model)
+    return model
@@ -0,0 +1,172 @@
+"""
+Tests for REX memory compaction
+"""
+import unittest
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.compaction import Compactor
+from memory_system.memory_manager import MemoryManager
+from models.memory import Memory, MemoryCategory
+from utils.config_loader import DEFAULT_CONFIG, load_config
+from embedding_stub import use_stub_model
+
+use_stub_model()
+
+class TestCompaction(unittest.TestCase):
+    """Test cases for retention and timeline roll-up"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = DEFAULT_CONFIG.copy()
+        self.config["memory_persistence"] = dict(
+            DEFAULT_CONFIG["memory_persistence"],
+            enabled=True,
+            file_path=os.path.join(self.temp_dir.name, "memories")
+        )
+        self.config["retention"] = dict(
+            DEFAULT_CONFIG["retention"],
+            rules={"timeline": {"max_count": 4}, "topics": {"max_age_days": 30}}
+        )
+        self.memory_manager = MemoryManager(self.config)
+        self.user_id = "test_user_123"
+        self.now = datetime(2024, 6, 1, 12, 0)
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.memory_manager.close()
+        self.temp_dir.cleanup()
+
+    def _turn(self, text: str, days_ago: float, session_id: str, source: str = "conversation") -> Memory:
+        return Memory(
+            category=MemoryCategory.TIMELINE,
+            content=f"User: {text}\nAI: Noted.",
+            source=source,
+            metadata={"user_input": text, "ai_response": "Noted.", "session_id": session_id},
+            timestamp=(self.now - timedelta(days=days_ago)).isoformat()
+        )
+
+    def _store_history(self):
+        self.memory_manager.store_memories(self.user_id, [
+            self._turn("Kafka consumer lag again", 20, "s1"),
+            self._turn("Kafka partitions rebalance", 20 - 0.01, "s1"),
+            self._turn("Website redesign colours", 10, "s2"),
+            self._turn("What about the Apollo launch", 1, "s3"),
+            self._turn("recall Apollo", 2, "s3", source="memory_trigger"),
+            self._turn("recall Apollo", 0.5, "s3", source="memory_trigger"),
+            Memory(category=MemoryCategory.TOPICS, content="Topic: sourdough",
+                   timestamp=(self.now - timedelta(days=60)).isoformat()),
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe",
+                   timestamp=(self.now - timedelta(days=400)).isoformat())
+        ])
+
+    def _contents(self, manager: MemoryManager, category: MemoryCategory):
+        return [m.content.split("\n")[0] for m in manager.memory_store[self.user_id][category.value]]
+
+    def test_opt_in(self):
+        """Test that compaction only runs when a configuration file enables it"""
+        self.assertFalse(Compactor(self.memory_manager, DEFAULT_CONFIG).enabled)
+        path = os.path.join(self.temp_dir.name, "config.json")
+        with open(path, "w") as f:
+            json.dump({"retention": {"enabled": True}}, f)
+        config = load_config(path)
+        self.assertTrue(Compactor(self.memory_manager, config).enabled)
+        self.assertEqual(config["retention"]["rules"], DEFAULT_CONFIG["retention"]["rules"])
+        self.assertFalse(DEFAULT_CONFIG["retention"]["enabled"])
+
+    def test_rollup_retention_and_restart(self):
+        """Test that old turns become digests, noise and expired memories go, and the result persists"""
+        self._store_history()
+        stats = Compactor(self.memory_manager, self.config).run(now=self.now)
+        self.assertEqual(stats, {"removed": 5, "rolled_up": 3, "digests": 2})
+
+        timeline = self.memory_manager.memory_store[self.user_id][MemoryCategory.TIMELINE.value]
+        self.assertEqual([m.source for m in timeline], ["compaction", "compaction", "conversation", "memory_trigger"])
+        self.assertEqual(timeline[0].metadata["session_id"], "s1")
+        self.assertEqual(timeline[0].metadata["turns"], 2)
+        self.assertIn("kafka", timeline[0].content)
+        self.assertEqual(self._contents(self.memory_manager, MemoryCategory.TOPICS), [])
+        self.assertEqual(self._contents(self.memory_manager, MemoryCategory.PEOPLE), ["Person: Jane Doe"])
+
+        # Indexes were rebuilt without the removed rows
+        self.assertEqual(len(self.memory_manager.indexes[self.user_id]), 5)
+        self.assertEqual(len(self.memory_manager.keyword_indexes[self.user_id]), 5)
+        found = self.memory_manager.retrieve_memories(self.user_id, "Kafka partitions", limit=1)
+        self.assertEqual([m.id for m in found], [timeline[0].id])
+
+        # Running again changes nothing; a restart replays the compacted state
+        self.assertEqual(Compactor(self.memory_manager, self.config).run(now=self.now)["removed"], 0)
+        self.memory_manager.close()
+        self.memory_manager = MemoryManager(self.config)
+        restarted = self.memory_manager.memory_store[self.user_id][MemoryCategory.TIMELINE.value]
+        self.assertEqual([m.id for m in restarted], [m.id for m in timeline])
+        self.assertEqual(len(self.memory_manager.indexes[self.user_id]), 5)
+
+    def test_later_turns_merge_into_session_digest(self):
+        """Test that turns of an already rolled-up session are merged into its digest"""
+        self._store_history()
+        compactor = Compactor(self.memory_manager, self.config)
+        compactor.run(now=self.now)
+        self.memory_manager.store_memory(self.user_id, self._turn("Kafka retention settings", 19, "s1"))
+        self.assertEqual(compactor.run(now=self.now), {"removed": 2, "rolled_up": 1, "digests": 1})
+
+        timeline = self.memory_manager.memory_store[self.user_id][MemoryCategory.TIMELINE.value]
+        digests = [m for m in timeline if m.metadata.get("session_id") == "s1"]
+        self.assertEqual(len(digests), 1)
+        self.assertEqual(digests[0].metadata["turns"], 3)
+        self.assertEqual(digests[0].metadata["start"], (self.now - timedelta(days=20)).isoformat())
+        self.assertIn("Kafka consumer lag again", digests[0].content)
+        self.assertIn("Kafka retention settings", digests[0].content)
+
+    def test_max_count_with_mapped_embeddings(self):
+        """Test that compacting a memory-mapped index keeps embeddings aligned across a restart"""
+        self.memory_manager.close()
+        self.config["vector_index"] = dict(
+            DEFAULT_CONFIG["vector_index"],
+            storage="mmap",
+            mmap_path=os.path.join(self.temp_dir.name, "embeddings")
+        )
+        self.config["retention"] = dict(self.config["retention"], timeline_rollup_after_days=365)
+        self.memory_manager = MemoryManager(self.config)
+        topics = ["Kafka", "sourdough", "Apollo", "chess", "gardening", "tax returns"]
+        self.memory_manager.store_memories(self.user_id, [
+            self._turn(f"Tell me about {topic}", 6 - i, f"s{i}") for i, topic in enumerate(topics)
+        ])
+        self.memory_manager.store_memories("other_user", [
+            self._turn(f"Tell me about {topic}", 6 - i, f"o{i}") for i, topic in enumerate(topics[:4])
+        ])
+        self.memory_manager.snapshot()
+
+        # A restart before the run's snapshot replays the deletions over the old embedding file
+        self.assertEqual(Compactor(self.memory_manager, self.config).compact_user(self.user_id, now=self.now)["removed"], 2)
+        self.memory_manager.close()
+        self.memory_manager = MemoryManager(self.config)
+        self.assertEqual(self._contents(self.memory_manager, MemoryCategory.TIMELINE),
+                         [f"User: Tell me about {topic}" for topic in topics[2:]])
+
+        self.config["retention"]["rules"] = {"timeline": {"max_count": 3}}
+        storage = self.memory_manager.storage
+        with mock.patch.object(storage, "write_snapshot", wraps=storage.write_snapshot) as write_snapshot:
+            self.assertEqual(Compactor(self.memory_manager, self.config).run(now=self.now)["removed"], 2)
+        self.assertEqual(write_snapshot.call_count, 1)  # One snapshot for both users
+        self.assertTrue(self.memory_manager.indexes[self.user_id].mapped)
+        self.assertEqual(self._contents(self.memory_manager, MemoryCategory.TIMELINE),
+                         [f"User: Tell me about {topic}" for topic in topics[3:]])
+
+        self.memory_manager.close()
+        self.memory_manager = MemoryManager(self.config)
+        self.config["retrieval"] = dict(DEFAULT_CONFIG["retrieval"], mode="vector")
+        for topic in topics[3:]:
+            found = self.memory_manager.retrieve_memories(self.user_id, f"Tell me about {topic}", limit=1)
+            self.assertEqual(found[0].content.split("\n")[0], f"User: Tell me about {topic}")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,10 @@ Tests for the REX conversation manager
 import unittest
 import sys
 import os
+import tempfile
+import threading
 from datetime import datetime
+from unittest import mock
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,13 +17,22 @@ from conversation_manager.context_manager import ContextManager
 from models.memory import Memory, MemoryCategory
 from models.conversation import ConversationInput, ConversationResponse
 from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import use_stub_model
+
+use_stub_model()
 
 class TestConversationManager(unittest.TestCase):
     """Test cases for the conversation manager"""
     
     def setUp(self):
         """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
         self.config = DEFAULT_CONFIG.copy()
+        self.config["memory_persistence"] = dict(
+            DEFAULT_CONFIG["memory_persistence"],
+            enabled=True,
+            file_path=os.path.join(self.temp_dir.name, "memories")
+        )
         self.memory_manager = MemoryManager(self.config)
         self.context_manager = ContextManager(self.memory_manager, self.config)
         self.test_user_id = "test_user_123"
@@ -41,6 +53,12 @@ class TestConversationManager(unittest.TestCase):
         )
         self.memory_manager.store_memory(self.test_user_id, preference_memory)
     
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.context_manager.close()
+        self.memory_manager.close()
+        self.temp_dir.cleanup()
+    
     def test_process_conversation(self):
         """Test processing a conversation input"""
         # Process a conversation input
@@ -62,6 +80,92 @@ class TestConversationManager(unittest.TestCase):
         session_context = self.context_manager.session_contexts[context_key]
         self.assertEqual(session_context["last_interaction"]["user_input"], "Tell me about Python programming")
     
+    def _gate_ingestion(self):
+        """Hold the ingestion workers before they build their next batch until the returned event is set"""
+        gate = threading.Event()
+        collect = self.context_manager.ingestion._collect
+        
+        def gated_collect(batch):
+            gate.wait(5)
+            return collect(batch)
+        
+        patcher = mock.patch.object(self.context_manager.ingestion, "_collect", side_effect=gated_collect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(gate.set)
+        return gate
+    
+    def test_turn_encodes_only_query_before_response(self):
+        """Test that memory ingestion is moved off the response path and batched"""
+        user_input = "I talked with John Smith and Jane Doe about Python. I prefer short answers."
+        gate = self._gate_ingestion()
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            self.context_manager.process_conversation(
+                user_id=self.test_user_id,
+                session_id=self.test_session_id,
+                user_input=user_input
+            )
+            
+            # Only the query was encoded before the response
+            self.assertEqual(encode.call_count, 1)
+            self.assertEqual(encode.call_args[0][0], [user_input])
+            
+            gate.set()
+            self.assertTrue(self.context_manager.flush(timeout=5))
+        
+        # Extracted memories and the timeline entry were encoded together afterwards
+        self.assertEqual(encode.call_count, 2)
+        self.assertEqual(len(self.memory_manager.memory_store[self.test_user_id][MemoryCategory.TIMELINE.value]), 1)
+        self.assertEqual(len(self.memory_manager.memory_store[self.test_user_id][MemoryCategory.PEOPLE.value]), 2)
+    
+    def test_submit_resolves_to_stored_ids(self):
+        """Test that queued memories resolve to the IDs they were stored under, repeats to the stored memory's"""
+        stored_id = self.memory_manager.list_memories(self.test_user_id, MemoryCategory.TOPICS)[0].id
+        repeat = Memory(category=MemoryCategory.TOPICS, content="Python is a high-level programming language")
+        new = Memory(category=MemoryCategory.TOPICS, content="Rust is a systems programming language")
+        future = self.context_manager.ingestion.submit(self.test_user_id, [repeat, new])
+        self.assertEqual(future.result(timeout=5), [stored_id, new.id])
+        
+        with mock.patch.object(self.memory_manager, "store_memories", side_effect=RuntimeError("disk full")):
+            future = self.context_manager.ingestion.submit(self.test_user_id, [Memory(category=MemoryCategory.TOPICS, content="Go")])
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        self.assertEqual(self.context_manager.ingestion.submit(self.test_user_id, []).result(), [])
+    
+    def test_next_turn_reads_previous_writes(self):
+        """Test that a session waits for its earlier turns to be stored before retrieving"""
+        gate = self._gate_ingestion()
+        self.context_manager.process_conversation(
+            user_id=self.test_user_id,
+            session_id=self.test_session_id,
+            user_input="I met Ada Lovelace at the conference"
+        )
+        
+        seen = []
+        retrieve = self.memory_manager.retrieve_memories
+        
+        def record(*args, **kwargs):
+            people = self.memory_manager.memory_store[self.test_user_id][MemoryCategory.PEOPLE.value]
+            seen.append([memory.content for memory in people])
+            return retrieve(*args, **kwargs)
+        
+        with mock.patch.object(self.memory_manager, "retrieve_memories", side_effect=record):
+            turn = threading.Thread(target=self.context_manager.process_conversation, kwargs={
+                "user_id": self.test_user_id,
+                "session_id": self.test_session_id,
+                "user_input": "What do I know about Ada Lovelace?"
+            })
+            turn.start()
+            turn.join(0.2)
+            self.assertTrue(turn.is_alive())  # Waiting for the first turn's memories
+            gate.set()
+            turn.join(5)
+        
+        self.assertEqual(seen, [["Person: Ada Lovelace"]])
+    
     def test_memory_trigger_in_conversation(self):
         """Test memory trigger in conversation"""
         # Process a conversation with memory trigger
@@ -102,8 +206,14 @@ class TestConversationManager(unittest.TestCase):
         context_key = f"{self.test_user_id}:{self.test_session_id}"
         session_context = self.context_manager.session_contexts[context_key]
         self.assertEqual(session_context["last_interaction"]["user_input"], "What visualization library would work best?")
+        self.assertEqual(
+            [(message["role"], message["content"]) for message in session_context["history"]],
+            [("user", "I'm working on a React application"), ("assistant", first_response.ai_response),
+             ("user", "What visualization library would work best?"), ("assistant", second_response.ai_response)]
+        )
         
         # Verify timeline memory was created
+        self.assertTrue(self.context_manager.flush(timeout=5))
         timeline_memories = self.memory_manager.retrieve_memories(
             user_id=self.test_user_id,
             query="React application",
@@ -111,5 +221,55 @@ class TestConversationManager(unittest.TestCase):
         )
         self.assertGreaterEqual(len(timeline_memories), 1)
 
+    def test_ingest_batch_is_idempotent(self):
+        """Test bulk ingestion: one encode, per-item results, and keys honoured across retries and restarts"""
+        items = [
+            {"idempotency_key": f"conv-{i}:2", "session_id": f"conv-{i}", "timestamp": "2024-03-01T10:00:00",
+             "messages": [{"role": "user", "content": f"I met Jane Doe about release {i}"},
+                          {"role": "assistant", "content": "Noted."}]}
+            for i in range(3)
+        ]
+        items.append(dict(items[0]))  # Same key twice in one request
+        items.append({"idempotency_key": "empty", "messages": [{"role": "assistant", "content": "Hi"}]})
+        
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            results = self.context_manager.ingest_batch(self.test_user_id, items)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual([r["status"] for r in results], ["stored"] * 3 + ["duplicate", "failed"])
+        self.assertEqual(results[3]["memory_ids"], results[0]["memory_ids"])
+        timeline = self.memory_manager.memory_store[self.test_user_id][MemoryCategory.TIMELINE.value]
+        self.assertEqual(len(timeline), 3)
+        self.assertEqual(timeline[0].timestamp, "2024-03-01T10:00:00")
+        
+        # A retry after a restart stores nothing new
+        self.context_manager.close()
+        self.memory_manager.close()
+        self.memory_manager = MemoryManager(self.config)
+        self.context_manager = ContextManager(self.memory_manager, self.config)
+        retry = self.context_manager.ingest_batch(self.test_user_id, items[:3])
+        self.assertEqual([r["status"] for r in retry], ["duplicate"] * 3)
+        self.assertEqual(retry[0]["memory_ids"], results[0]["memory_ids"])
+        self.assertEqual(len(self.memory_manager.memory_store[self.test_user_id][MemoryCategory.TIMELINE.value]), 3)
+    
+    def test_session_history_is_capped(self):
+        """Test that client history is trimmed to max_session_history messages"""
+        context_manager = ContextManager(self.memory_manager, dict(self.config, max_session_history=4))
+        history = [{"role": "user", "content": f"message {i}"} for i in range(50)]
+        context_manager.process_conversation(
+            user_id=self.test_user_id,
+            session_id=self.test_session_id,
+            user_input="Tell me about Python programming",
+            conversation_history=history
+        )
+        session_context = context_manager.session_contexts[f"{self.test_user_id}:{self.test_session_id}"]
+        self.assertEqual(len(session_context["history"]), 4)
+        self.assertEqual(list(session_context["history"])[:2], history[-2:])
+        self.assertEqual(session_context["history"][-2], {"role": "user", "content": "Tell me about Python programming"})
+        self.assertEqual(session_context["history"][-1]["role"], "assistant")
+        context_manager.close()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for the REX embedding cache
+"""
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.embedding_cache import EmbeddingCache
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test cases for the embedding cache"""
+    
+    def test_hits_misses_and_normalization(self):
+        """Test hit/miss counting and that whitespace differences share an entry"""
+        cache = EmbeddingCache("test-model", max_entries=10)
+        cache.put_many(["Person: John Smith"], [np.ones(4)])
+        
+        results = cache.get_many(["Person:  John Smith ", "Topic: Python"])
+        np.testing.assert_array_equal(results[0], np.ones(4, dtype=np.float32))
+        self.assertIsNone(results[1])
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = EmbeddingCache("test-model", max_entries=2)
+        cache.put_many(["a", "b"], [np.zeros(4), np.ones(4)])
+        cache.get_many(["a"])  # "a" becomes most recently used
+        cache.put_many(["c"], [np.full(4, 2.0)])
+        
+        a, b, c = cache.get_many(["a", "b", "c"])
+        self.assertIsNotNone(a)
+        self.assertIsNone(b)
+        self.assertIsNotNone(c)
+    
+    def test_persistent_tier_survives_restart(self):
+        """Test that entries written to disk are found by a new cache instance"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache", "embeddings.sqlite3")
+            cache = EmbeddingCache("test-model", max_entries=1, persist_path=path)
+            cache.put_many(["a", "b"], [np.zeros(4), np.ones(4)])
+            cache.close()
+            
+            restarted = EmbeddingCache("test-model", persist_path=path)
+            a, b = restarted.get_many(["a", "b"])
+            np.testing.assert_array_equal(b, np.ones(4, dtype=np.float32))
+            self.assertIsNotNone(a)
+            
+            # Entries are scoped to the model that produced them
+            other_model = EmbeddingCache("other-model", persist_path=path)
+            self.assertEqual(other_model.get_many(["a"]), [None])
+            restarted.close()
+            other_model.close()
+
+if __name__ == "__main__":
+    unittest.main()
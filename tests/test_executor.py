@@ -0,0 +1,58 @@
+"""
+Tests for the REX compute executor
+"""
+import unittest
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.executor import ComputeExecutor, ExecutorBusyError
+
+class TestComputeExecutor(unittest.TestCase):
+    """Test cases for the compute executor"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.executor = ComputeExecutor({"executor": {"max_workers": 2, "max_pending": 1}})
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.executor.shutdown()
+    
+    def test_blocking_work_leaves_event_loop_free(self):
+        """Test that a slow call doesn't delay other coroutines"""
+        async def scenario():
+            slow = asyncio.ensure_future(self.executor.run(time.sleep, 0.3))
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            tick = time.perf_counter() - started
+            fast = await self.executor.run(sum, [1, 2, 3])
+            await slow
+            return tick, fast
+        
+        tick, fast = asyncio.run(scenario())
+        self.assertLess(tick, 0.2)
+        self.assertEqual(fast, 6)
+    
+    def test_rejects_when_queue_is_full(self):
+        """Test that calls beyond max_workers + max_pending are rejected instead of queued"""
+        release = threading.Event()
+        
+        async def scenario():
+            blocked = [asyncio.ensure_future(self.executor.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            with self.assertRaises(ExecutorBusyError):
+                await self.executor.run(sum, [1])
+            release.set()
+            await asyncio.gather(*blocked)
+            return await self.executor.run(sum, [1])
+        
+        self.assertEqual(asyncio.run(scenario()), 1)
+
+if __name__ == "__main__":
+    unittest.main()
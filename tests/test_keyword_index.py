@@ -0,0 +1,79 @@
+"""
+Tests for the REX keyword index
+"""
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from models.memory import Memory, MemoryCategory
+
+class TestKeywordIndex(unittest.TestCase):
+    """Test cases for the keyword index"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.memories = [
+            Memory(category=MemoryCategory.PROJECTS, content="Apollo migration project"),
+            Memory(category=MemoryCategory.TIMELINE, content="User: how is the Apollo migration going? REX: on track"),
+            Memory(category=MemoryCategory.PROJECTS, content="Website redesign project"),
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Grace Hopper"),
+        ]
+        self.index = KeywordIndex()
+        self.index.add_batch(self.memories[:2])
+        self.index.add_batch(self.memories[2:])  # Indexing is incremental
+    
+    def test_bm25_ranking(self):
+        """Test that rarer terms and shorter documents rank higher"""
+        results = self.index.search(["apollo", "migration"], limit=10)
+        self.assertEqual([memory for memory, _, _ in results], self.memories[:2])
+        self.assertEqual([matched for _, _, matched in results], [2, 2])
+        self.assertGreater(results[0][1], results[1][1])
+        
+        results = self.index.search(["project", "apollo"], limit=1)
+        self.assertEqual([memory for memory, _, _ in results], [self.memories[0]])
+        self.assertEqual(self.index.search(["unknown"], limit=10), [])
+    
+    def test_category_filter(self):
+        """Test that only memories in the requested categories are returned"""
+        results = self.index.search(["apollo", "project"], limit=10, categories=[MemoryCategory.TIMELINE])
+        self.assertEqual([memory for memory, _, _ in results], [self.memories[1]])
+        self.assertEqual(self.index.search(["grace"], limit=10, categories=[MemoryCategory.PROJECTS]), [])
+    
+    def test_reciprocal_rank_fusion(self):
+        """Test that memories ranked well in both lists win"""
+        a, b, c, d = self.memories
+        fused = reciprocal_rank_fusion([[a, b, c], [b, d, a]], k=60, limit=3)
+        self.assertEqual(fused, [b, a, d])
+
+    def test_search_during_concurrent_indexing(self):
+        """Test that searches and appends from different threads don't interfere"""
+        errors = []
+        done = threading.Event()
+        
+        def search():
+            while not done.is_set():
+                try:
+                    for memory, _, _ in self.index.search(["apollo", "migration"], 5):
+                        self.assertIn("pollo", memory.content)
+                except Exception as e:
+                    errors.append(e)
+                    return
+        
+        reader = threading.Thread(target=search)
+        reader.start()
+        try:
+            for i in range(2000):
+                self.index.add_batch([Memory(category=MemoryCategory.TIMELINE, content=f"Apollo migration step {i}")])
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.index), 2004)
+
+if __name__ == "__main__":
+    unittest.main()
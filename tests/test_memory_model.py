@@ -0,0 +1,95 @@
+"""
+Tests for the REX memory model
+"""
+import unittest
+import sys
+import os
+import pickle
+from datetime import datetime, timezone
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.memory import Memory, MemoryCategory
+
+class TestMemoryModel(unittest.TestCase):
+    """Test cases for the compact memory representation"""
+    
+    def test_dict_round_trip_is_unchanged(self):
+        """Test that to_dict/from_dict produce exactly the original values"""
+        data = {
+            "id": "0b6f4e53-2f8e-4a61-9d0c-5f1c1b3c2a10",
+            "category": "timeline",
+            "content": "User: I talked with Jane Doe about Apollo\nAI: I'll remember that.",
+            "source": "conversation",
+            "metadata": {
+                "user_input": "I talked with Jane Doe about Apollo",
+                "ai_response": "I'll remember that.",
+                "turn": 3
+            },
+            "timestamp": "2024-03-05T14:07:09.123456"
+        }
+        memory = Memory.from_dict(data)
+        self.assertEqual(memory.to_dict(), data)
+        self.assertEqual(Memory.from_dict(memory.to_dict()).to_dict(), data)
+        
+        # Non-UUID ids and timestamps without microseconds are kept as given
+        legacy = dict(data, id="memory-42", timestamp="2024-03-05T14:07:09")
+        self.assertEqual(Memory.from_dict(legacy).to_dict(), legacy)
+    
+    def test_compact_fields(self):
+        """Test the packed id, integer timestamp, interned source and content spans"""
+        memory = Memory(
+            category=MemoryCategory.TIMELINE,
+            content="User: what did we decide about the release date?\nAI: Friday.",
+            source="".join(["conver", "sation"]),
+            metadata={"user_input": "what did we decide about the release date?"},
+            timestamp="2024-01-01T00:00:01"
+        )
+        self.assertFalse(hasattr(memory, "__dict__"))
+        self.assertIsInstance(memory._id, bytes)
+        self.assertEqual(memory.timestamp_us, (54 * 365 + 13) * 86400 * 10 ** 6 + 10 ** 6)
+        self.assertIs(memory.source, sys.intern("conversation"))
+        self.assertNotIn("what did we decide about the release date?", memory._metadata)
+        self.assertEqual(memory.metadata["user_input"], "what did we decide about the release date?")
+    
+    def test_metadata_updates_and_content_changes(self):
+        """Test that metadata is updated by assignment and spans survive content changes"""
+        memory = Memory(category=MemoryCategory.TOPICS, content="Topic: long running database migrations",
+                        metadata={"topic": "long running database migrations"})
+        with self.assertRaises(TypeError):
+            memory.metadata["hits"] = 2
+        memory.metadata = dict(memory.metadata, hits=2)
+        memory.content = "Topic: something else entirely"
+        self.assertEqual(memory.metadata, {"topic": "long running database migrations", "hits": 2})
+    
+    def test_timezone_aware_timestamp_and_pickle(self):
+        """Test that aware timestamps are ordered in local time and memories pickle"""
+        memory = Memory(category=MemoryCategory.PEOPLE, content="Person: Ada Lovelace",
+                        timestamp="2024-06-01T12:00:00+00:00")
+        self.assertEqual(Memory(category=MemoryCategory.PEOPLE, content="x",
+                                timestamp=memory.timestamp).timestamp_us, memory.timestamp_us)
+        utc = Memory(category=MemoryCategory.PEOPLE, content="x", timestamp="2024-06-01T12:00:00.000Z")
+        self.assertEqual(utc.timestamp_us, memory.timestamp_us)
+        
+        copy = pickle.loads(pickle.dumps(memory))
+        self.assertEqual(copy.to_dict(), memory.to_dict())
+    
+    def test_aware_timestamp_round_trip(self):
+        """Test that an aware timestamp keeps its instant and UTC offset through to_dict/from_dict"""
+        memory = Memory(category=MemoryCategory.PEOPLE, content="Person: Ada Lovelace",
+                        timestamp="2024-06-01T14:30:00.250000+02:00")
+        self.assertEqual(memory.timestamp, "2024-06-01T14:30:00.250000+02:00")
+        copy = Memory.from_dict(memory.to_dict())
+        self.assertEqual(copy.timestamp, memory.timestamp)
+        self.assertEqual(copy.timestamp_us, memory.timestamp_us)
+        
+        # Ordered by instant against naive local timestamps
+        local = datetime(2024, 6, 1, 12, 30, 0, 250000, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertEqual(Memory(category=MemoryCategory.PEOPLE, content="x", timestamp=local).timestamp_us,
+                         memory.timestamp_us)
+        self.assertEqual(Memory(category=MemoryCategory.PEOPLE, content="x",
+                                timestamp="2024-06-01T12:30:00.250Z").timestamp, "2024-06-01T12:30:00.250000+00:00")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Tests for the REX memory service
+"""
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.memory_interface import MemoryInterface
+from memory_system.memory_manager import MemoryManager
+from memory_system.memory_service import MemoryService, MemoryServiceError, RemoteMemoryManager, OP_STORE
+from memory_system.transfer import MemoryImporter, export_memories
+from models.memory import Memory, MemoryCategory
+from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import use_stub_model
+
+use_stub_model()
+
+class TestMemoryService(unittest.TestCase):
+    """Test cases for API workers sharing one memory service"""
+
+    def setUp(self):
+        """Start a service and connect two workers to it"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = DEFAULT_CONFIG.copy()
+        self.config["memory_persistence"] = dict(
+            DEFAULT_CONFIG["memory_persistence"],
+            enabled=True,
+            file_path=os.path.join(self.temp_dir.name, "memories")
+        )
+        self.config["memory_service"] = dict(
+            DEFAULT_CONFIG["memory_service"],
+            enabled=True,
+            socket_path=os.path.join(self.temp_dir.name, "memory.sock"),
+            pool_size=2
+        )
+        self.memory_manager = MemoryManager(self.config)
+        self.service = MemoryService(self.memory_manager, self.config)
+        self.service.start()
+        self.workers = [RemoteMemoryManager(self.config), RemoteMemoryManager(self.config)]
+        self.user_id = "test_user_123"
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        for worker in self.workers:
+            worker.close()
+        self.service.stop()
+        self.memory_manager.close()
+        self.temp_dir.cleanup()
+
+    def test_writes_are_visible_to_every_worker(self):
+        """Test that a memory stored through one worker is found through another"""
+        first, second = self.workers
+        ids = first.store_memories(self.user_id, [
+            Memory(category=MemoryCategory.PROJECTS, content="Apollo migration project"),
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")
+        ])
+        self.assertEqual(ids, self.memory_manager.memory_ids(self.user_id))
+
+        memories = second.retrieve_memories(self.user_id, "Apollo migration", limit=1)
+        self.assertEqual([memory.id for memory in memories], ids[:1])
+        page, cursor = second.list_memories_page(self.user_id, limit=1)
+        self.assertEqual(len(page), 1)
+        self.assertEqual(len(second.list_memories_page(self.user_id, limit=1, after=cursor)[0]), 1)
+        with self.assertRaises(ValueError):
+            second.list_memories_page(self.user_id, after="not a cursor!")
+
+        # Repeats are merged by the service whichever worker sends them
+        duplicate, = second.find_duplicates(self.user_id, [Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")])
+        self.assertEqual(duplicate.id, ids[1])
+        self.assertEqual(second.store_memory(self.user_id, Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")), ids[1])
+
+        outcomes = first.store_batch(self.user_id, [("k1", [Memory(category=MemoryCategory.TIMELINE, content="User: hi")])])
+        self.assertEqual(second.store_batch(self.user_id, [("k1", [Memory(category=MemoryCategory.TIMELINE, content="User: hi")])]),
+                         [(False, outcomes[0][1])])
+        self.assertEqual(second.process_memory_trigger(self.user_id, "REX, recall Apollo", {})["memories"][0]["id"], ids[0])
+
+    def test_embeddings_are_computed_by_the_workers(self):
+        """Test that memories arrive with their embeddings and round-trip through export and import"""
+        worker = self.workers[0]
+        with mock.patch.object(self.memory_manager, "_generate_embeddings", wraps=self.memory_manager._generate_embeddings) as encode:
+            worker.store_memories(self.user_id, [Memory(category=MemoryCategory.TOPICS, content="Topic: Kafka")])
+        self.assertEqual([texts for texts in (call.args[0] for call in encode.call_args_list) if texts], [])
+
+        # Repeats of stored memories are merged by the service without being encoded anywhere
+        with mock.patch.object(self.memory_manager, "_generate_embeddings", wraps=self.memory_manager._generate_embeddings) as encode, \
+                mock.patch.object(worker, "_generate_embeddings", wraps=worker._generate_embeddings) as worker_encode:
+            ids = worker.store_memories(self.user_id, [
+                Memory(category=MemoryCategory.TOPICS, content="Topic: Kafka"),
+                Memory(category=MemoryCategory.TIMELINE, content="User: tell me about Kafka")
+            ])
+        self.assertEqual([texts for texts in (call.args[0] for call in encode.call_args_list) if texts], [])
+        self.assertEqual([call.args[0] for call in worker_encode.call_args_list], [["User: tell me about Kafka"]])
+        self.assertEqual(ids[0], self.memory_manager.memory_ids(self.user_id)[0])
+        worker.remove_memories(self.user_id, ids[1:])
+
+        data = b"".join(export_memories(worker, self.user_id, chunk_size=1))
+        importer = MemoryImporter(worker, "other_user")
+        importer.feed(data)
+        self.assertEqual(importer.finish()["imported"], 1)
+        self.assertEqual(self.memory_manager.memory_ids("other_user"), self.memory_manager.memory_ids(self.user_id))
+
+    def test_reads_survive_a_service_restart(self):
+        """Test that pooled connections to a restarted service are replaced"""
+        worker = self.workers[0]
+        worker.store_memory(self.user_id, Memory(category=MemoryCategory.TOPICS, content="Topic: Kafka"))
+        self.service.stop()
+        self.service.start()
+        self.assertEqual(len(worker.list_memories(self.user_id)), 1)
+
+        # Failed calls are reported without dropping the connection
+        with self.assertRaises(ValueError):
+            worker.pool.call(99, {})
+        with self.assertRaises(MemoryServiceError):
+            worker.pool.call(OP_STORE, {"memories": []})
+        self.assertEqual(len(worker.list_memories(self.user_id)), 1)
+
+    def test_client_implements_the_interface(self):
+        """Test that the worker client implements every MemoryInterface method without a local store"""
+        for cls in (MemoryManager, RemoteMemoryManager):
+            for name in vars(MemoryInterface):
+                if not name.startswith("_"):
+                    self.assertIsNot(getattr(cls, name), getattr(MemoryInterface, name), f"{cls.__name__}.{name}")
+        self.assertFalse(issubclass(RemoteMemoryManager, MemoryManager))
+        self.assertFalse(hasattr(self.workers[0], "memory_store"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,10 @@ Tests for the REX memory system
 import unittest
 import sys
 import os
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+import numpy as np
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,16 +15,30 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from memory_system.memory_manager import MemoryManager
 from models.memory import Memory, MemoryCategory
 from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import use_stub_model
+
+use_stub_model()
 
 class TestMemorySystem(unittest.TestCase):
     """Test cases for the memory system"""
     
     def setUp(self):
         """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
         self.config = DEFAULT_CONFIG.copy()
+        self.config["memory_persistence"] = dict(
+            DEFAULT_CONFIG["memory_persistence"],
+            enabled=True,
+            file_path=os.path.join(self.temp_dir.name, "memories")
+        )
         self.memory_manager = MemoryManager(self.config)
         self.test_user_id = "test_user_123"
     
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.memory_manager.close()
+        self.temp_dir.cleanup()
+    
     def test_store_and_retrieve_memory(self):
         """Test storing and retrieving a memory"""
         # Create a test memory
@@ -124,5 +141,286 @@ class TestMemorySystem(unittest.TestCase):
         )
         self.assertGreaterEqual(len(pref_memories), 0)  # May be 0 if extraction fails
 
+    def test_store_memories_encodes_in_one_call(self):
+        """Test that bulk storage sends all texts to the model in a single batch"""
+        memories = [
+            Memory(category=MemoryCategory.PEOPLE, content="Person: John Smith"),
+            Memory(category=MemoryCategory.TOPICS, content="Topic: machine learning"),
+            Memory(category=MemoryCategory.PEOPLE, content="Person: John Smith"),
+        ]
+        
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            memory_ids = self.memory_manager.store_memories(self.test_user_id, memories)
+        
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(len(encode.call_args[0][0]), 2)  # Duplicate texts are encoded once
+        self.assertEqual(memory_ids, [memories[0].id, memories[1].id, memories[0].id])
+        for memory in memories[:2]:
+            self.assertIsNotNone(memory.embedding)
+
+    def test_repeated_texts_use_embedding_cache(self):
+        """Test that texts seen before are not sent to the model again"""
+        self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Ada Lovelace")
+        )
+        
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            self.memory_manager.store_memory(
+                self.test_user_id,
+                Memory(category=MemoryCategory.TIMELINE, content="Person: Ada Lovelace")
+            )
+            self.memory_manager.encode_turn([], ["Person: Ada Lovelace"])
+        
+        self.assertEqual(encode.call_count, 0)
+        self.assertGreaterEqual(self.memory_manager.embedding_cache.stats()["hits"], 2)
+
+    def test_duplicate_memories_update_hit_count(self):
+        """Test that repeated memories are counted on the stored one instead of being stored again"""
+        first_id = self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe", timestamp="2024-01-01T09:00:00")
+        )
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            for day in (2, 3):
+                memory_id = self.memory_manager.store_memory(
+                    self.test_user_id,
+                    Memory(category=MemoryCategory.PEOPLE, content="Person:  Jane Doe",
+                           timestamp=f"2024-01-0{day}T09:00:00")
+                )
+                self.assertEqual(memory_id, first_id)
+        self.assertEqual(encode.call_count, 0)
+        
+        people = self.memory_manager.memory_store[self.test_user_id][MemoryCategory.PEOPLE.value]
+        self.assertEqual(len(people), 1)
+        self.assertEqual(len(self.memory_manager.indexes[self.test_user_id]), 1)
+        self.assertEqual(people[0].metadata["hit_count"], 3)
+        self.assertEqual(people[0].metadata["last_seen"], "2024-01-03T09:00:00")
+        
+        # Timeline entries are never merged, and counts survive a restart
+        for _ in range(2):
+            self.memory_manager.store_memory(
+                self.test_user_id, Memory(category=MemoryCategory.TIMELINE, content="User: hi\nAI: Hello!")
+            )
+        self.memory_manager.close()
+        restarted = MemoryManager(self.config)
+        store = restarted.memory_store[self.test_user_id]
+        self.assertEqual(len(store[MemoryCategory.TIMELINE.value]), 2)
+        self.assertEqual([m.metadata["hit_count"] for m in store[MemoryCategory.PEOPLE.value]], [3])
+        self.memory_manager = restarted
+    
+    def test_batch_keys_of_repeated_memories_survive_restart(self):
+        """Test that an item key is kept when the item's memories repeat stored ones"""
+        stored_id = self.memory_manager.store_memory(
+            self.test_user_id, Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")
+        )
+        items = [
+            ("repeat", [Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")]),
+            ("mixed", [Memory(category=MemoryCategory.TOPICS, content="Topic: Kafka"),
+                       Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")])
+        ]
+        outcomes = self.memory_manager.store_batch(self.test_user_id, items)
+        self.assertEqual(outcomes[0], (True, [stored_id]))
+        self.assertEqual(outcomes[1][1][1], stored_id)
+        
+        self.memory_manager.close()
+        restarted = MemoryManager(self.config)
+        self.memory_manager = restarted
+        retried = restarted.store_batch(self.test_user_id, [
+            ("repeat", [Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe")]),
+            ("mixed", [Memory(category=MemoryCategory.TOPICS, content="Topic: Kafka")])
+        ])
+        self.assertEqual(retried, [(False, outcomes[0][1]), (False, outcomes[1][1])])
+        self.assertEqual(restarted.memory_ids(self.test_user_id), [stored_id, outcomes[1][1][0]])
+    
+    def test_exact_name_lookup_skips_query_encode(self):
+        """Test that a query fully matched by the keyword index is answered without the model"""
+        memory_id = self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PROJECTS, content="Apollo migration to the new cluster")
+        )
+        self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PROJECTS, content="Website redesign for the spring launch")
+        )
+        
+        with mock.patch.object(
+            self.memory_manager.embedding_model, "encode",
+            wraps=self.memory_manager.embedding_model.encode
+        ) as encode:
+            result = self.memory_manager.process_memory_trigger(
+                self.test_user_id, "REX, update on Apollo migration", {}
+            )
+            self.assertEqual(encode.call_count, 0)
+            self.assertEqual(result["memories"][0]["id"], memory_id)
+            
+            # Partial keyword matches are fused with the vector ranking instead
+            memories = self.memory_manager.retrieve_memories(self.test_user_id, query="Apollo status report")
+            self.assertEqual(encode.call_count, 1)
+            self.assertEqual(memories[0].id, memory_id)
+    
+    def test_memories_survive_restart(self):
+        """Test that a new manager replays persisted memories with their embeddings"""
+        memory_id = self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PROJECTS, content="Apollo migration project", source="test")
+        )
+        self.memory_manager.snapshot()
+        self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.TOPICS, content="Topic: database optimization", source="test")
+        )
+        self.memory_manager.close()
+        
+        restarted = MemoryManager(self.config)
+        with mock.patch.object(
+            restarted.embedding_model, "encode",
+            wraps=restarted.embedding_model.encode
+        ) as encode:
+            memories = restarted.retrieve_memories(
+                user_id=self.test_user_id,
+                query="status of the Apollo rollout",
+                categories=[MemoryCategory.PROJECTS]
+            )
+            self.assertEqual(len(restarted.memory_store[self.test_user_id][MemoryCategory.TOPICS.value]), 1)
+        restarted.close()
+        
+        # Both memories were replayed from disk; only the query was encoded
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(encode.call_args[0][0], ["status of the Apollo rollout"])
+        self.assertEqual([memory.id for memory in memories], [memory_id])
+
+    def test_list_memories_pages_with_cursor(self):
+        """Test that cursor pages walk all categories newest first without gaps or repeats"""
+        # Stored out of time order, with timestamps shared across and within categories
+        memories = [
+            Memory(category=category, content=f"{category.value} memory {i}", source="test",
+                   timestamp=f"2024-01-0{1 + i % 3}T09:00:00", memory_id=f"{category.value}-{i}")
+            for i in range(5) for category in (MemoryCategory.PEOPLE, MemoryCategory.PROJECTS, MemoryCategory.TOPICS)
+        ]
+        self.memory_manager.store_memories(self.test_user_id, memories)
+        expected = sorted(memories, key=lambda m: (m.timestamp_us, m.id), reverse=True)
+        
+        listed, cursor, pages = [], None, 0
+        while True:
+            page, cursor = self.memory_manager.list_memories_page(self.test_user_id, limit=4, after=cursor)
+            listed.extend(page)
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual([m.id for m in listed], [m.id for m in expected])
+        
+        page, cursor = self.memory_manager.list_memories_page(self.test_user_id, MemoryCategory.PROJECTS, limit=3)
+        self.assertEqual([m.id for m in page], ["projects-2", "projects-4", "projects-1"])
+        page, cursor = self.memory_manager.list_memories_page(self.test_user_id, MemoryCategory.PROJECTS, limit=3, after=cursor)
+        self.assertEqual(([m.id for m in page], cursor), (["projects-3", "projects-0"], None))
+        
+        with self.assertRaises(ValueError):
+            self.memory_manager.list_memories_page(self.test_user_id, after="not a cursor")
+        
+        # Order is rebuilt from persisted memories on restart
+        self.memory_manager.close()
+        self.memory_manager = MemoryManager(self.config)
+        self.assertEqual(
+            [m.id for m in self.memory_manager.list_memories(self.test_user_id, limit=20)],
+            [m.id for m in expected]
+        )
+
+    def test_time_scoped_retrieval(self):
+        """Test that since/until restrict candidates to a time window, also through trigger phrases"""
+        now = datetime.now()
+        memories = [
+            Memory(category=MemoryCategory.TIMELINE, content=f"User: Kafka consumer lag {days} days ago",
+                   source="test", timestamp=(now - timedelta(days=days)).isoformat())
+            for days in (0, 1, 3, 10, 40)
+        ]
+        self.memory_manager.store_memories(self.test_user_id, memories)
+        
+        found = self.memory_manager.retrieve_memories(
+            self.test_user_id, "Kafka consumer lag", limit=5,
+            since=now - timedelta(days=5), until=now - timedelta(hours=12)
+        )
+        self.assertEqual(sorted(m.id for m in found), sorted(m.id for m in memories[1:3]))
+        
+        # Vector-only retrieval scores just the window's rows
+        self.config["retrieval"] = dict(self.config.get("retrieval", {}), mode="vector")
+        found = self.memory_manager.retrieve_memories(
+            self.test_user_id, "Kafka", limit=5, since=(now - timedelta(days=20)).isoformat()
+        )
+        self.assertEqual(len(found), 4)
+        self.assertEqual(self.memory_manager.retrieve_memories(
+            self.test_user_id, "Kafka", categories=[MemoryCategory.PEOPLE], since=now - timedelta(days=20)
+        ), [])
+        
+        result = self.memory_manager.process_memory_trigger(
+            self.test_user_id, "REX, what did we say about Kafka consumer lag yesterday", {}
+        )
+        self.assertEqual(result["topic"], "Kafka consumer lag")
+        self.assertEqual([m["id"] for m in result["memories"]], [memories[1].id])
+
+    def test_retrieval_results_cached_until_next_write(self):
+        """Test that repeated recalls are served from the cache and any write invalidates them"""
+        self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PROJECTS, content="Website redesign project kickoff", source="test")
+        )
+        with mock.patch.object(
+            self.memory_manager, "_search", wraps=self.memory_manager._search
+        ) as search:
+            first = self.memory_manager.retrieve_memories(self.test_user_id, "website  redesign")
+            again = self.memory_manager.retrieve_memories(self.test_user_id, "website redesign")
+            self.assertEqual(search.call_count, 1)
+            self.assertEqual([m.id for m in again], [m.id for m in first])
+            
+            self.memory_manager.retrieve_memories(self.test_user_id, "website redesign", limit=1)
+            self.assertEqual(search.call_count, 2)  # Different limit, different entry
+            
+            memory_id = self.memory_manager.store_memory(
+                self.test_user_id,
+                Memory(category=MemoryCategory.PROJECTS, content="Website redesign project launch", source="test")
+            )
+            after = self.memory_manager.retrieve_memories(self.test_user_id, "website redesign")
+            self.assertEqual(search.call_count, 3)
+            self.assertIn(memory_id, [m.id for m in after])
+        
+        stats = self.memory_manager.result_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stale"]), (1, 3, 1))
+
+    def test_restart_maps_embedding_files(self):
+        """Test that with mmap storage a snapshot restores embeddings by row from the mapped files"""
+        self.memory_manager.close()
+        self.config["vector_index"] = dict(
+            DEFAULT_CONFIG["vector_index"],
+            storage="mmap",
+            mmap_path=os.path.join(self.temp_dir.name, "embeddings")
+        )
+        self.memory_manager = MemoryManager(self.config)
+        memory_id = self.memory_manager.store_memory(
+            self.test_user_id,
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Grace Hopper", source="test")
+        )
+        self.memory_manager.snapshot()
+        self.memory_manager.close()
+        
+        restarted = MemoryManager(self.config)
+        memory = restarted.memory_store[self.test_user_id][MemoryCategory.PEOPLE.value][0]
+        self.assertEqual(memory.id, memory_id)
+        self.assertEqual(memory.embedding_row, 0)
+        self.assertIsInstance(memory.embedding.base, np.memmap)
+        
+        results = restarted.retrieve_memories(self.test_user_id, query="Grace Hopper")
+        self.assertEqual([m.id for m in results], [memory_id])
+        restarted.close()
+
 if __name__ == "__main__":
     unittest.main()
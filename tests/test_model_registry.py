@@ -0,0 +1,72 @@
+"""
+Tests for the REX model registry
+"""
+import unittest
+import sys
+import os
+import subprocess
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system import model_registry
+from memory_system.memory_manager import MemoryManager
+from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import requires_real_model, use_stub_model
+
+class TestModelRegistry(unittest.TestCase):
+    """Test cases for the model registry"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.config = DEFAULT_CONFIG.copy()
+        self.config["memory_persistence"] = dict(DEFAULT_CONFIG["memory_persistence"], enabled=False)
+        self.model = use_stub_model()
+    
+    def test_imports_do_not_load_torch(self):
+        """Test that importing the application modules defers the heavy model imports"""
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-c",
+             "import sys, memory_system.memory_manager, conversation_manager.context_manager, api.endpoints; "
+             "print(sorted(m for m in ('torch', 'sentence_transformers') if m in sys.modules))"],
+            cwd=repo, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+    
+    def test_model_is_loaded_once_per_process(self):
+        """Test that managers share the configured model instead of loading their own"""
+        first = MemoryManager(self.config)
+        second = MemoryManager(self.config)
+        self.assertEqual(first.embedding_model_name, DEFAULT_CONFIG["embedding_model"])
+        self.assertIs(first.embedding_model, second.embedding_model)
+        self.assertIs(first.embedding_model, self.model)
+    
+    def test_warm_up_marks_manager_ready(self):
+        """Test that warm-up runs a dummy batch and flips readiness"""
+        manager = MemoryManager(self.config)
+        with mock.patch.object(model_registry, "_warm", set()):
+            self.assertFalse(manager.ready)
+            with mock.patch.object(manager.embedding_model, "encode", wraps=manager.embedding_model.encode) as encode:
+                manager.warm_up()
+                manager.warm_up()
+            self.assertTrue(manager.ready)
+        self.assertEqual(encode.call_count, 1)
+    
+    @requires_real_model
+    def test_real_model(self):
+        """Test that the configured model loads once and embeds related texts close together"""
+        with mock.patch.dict(model_registry._models, clear=True):
+            model = model_registry.get_embedding_model(DEFAULT_CONFIG["embedding_model"])
+            self.assertIs(model_registry.get_embedding_model(DEFAULT_CONFIG["embedding_model"]), model)
+            query, related, unrelated = MemoryManager(self.config)._generate_embeddings([
+                "How is the database migration going?",
+                "Project: moving the Postgres cluster to the new servers",
+                "Person: Jane likes hiking"
+            ])
+        self.assertEqual(query.shape, (384,))
+        self.assertGreater(float(query @ related), float(query @ unrelated))
+
+if __name__ == "__main__":
+    unittest.main()
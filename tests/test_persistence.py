@@ -0,0 +1,100 @@
+"""
+Tests for the REX file persistence engine
+"""
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.persistence import FileMemoryStorage
+from models.memory import Memory, MemoryCategory
+
+class TestFileMemoryStorage(unittest.TestCase):
+    """Test cases for the file persistence engine"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "memories")
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.temp_dir.cleanup()
+    
+    def _memory(self, content, value):
+        memory = Memory(category=MemoryCategory.TOPICS, content=content, metadata={"n": value})
+        memory.embedding = np.full(8, value, dtype=np.float32)
+        return memory
+    
+    def test_log_replay(self):
+        """Test that appended memories are replayed in order with binary embeddings"""
+        storage = FileMemoryStorage(self.path, fsync="always")
+        first = [self._memory("a", 1.0), self._memory("b", 2.0)]
+        storage.sync(storage.append("user_1", first))
+        storage.sync(storage.append("user_2", [self._memory("c", 3.0)]))
+        storage.close()
+        
+        replayed = list(FileMemoryStorage(self.path).load())
+        self.assertEqual([(user, m.content) for user, m, _ in replayed], [("user_1", "a"), ("user_1", "b"), ("user_2", "c")])
+        self.assertEqual(replayed[0][1].id, first[0].id)
+        self.assertEqual(replayed[1][1].metadata, {"n": 2.0})
+        np.testing.assert_array_equal(replayed[2][1].embedding, np.full(8, 3.0, dtype=np.float32))
+    
+    def test_deletions_are_replayed(self):
+        """Test that deleted memories and their updates are skipped, while later re-stores are kept"""
+        storage = FileMemoryStorage(self.path)
+        memories = [self._memory("a", 1.0), self._memory("b", 2.0)]
+        storage.append("user_1", memories)
+        storage.append("user_2", memories[:1])  # Another user's copy (same id) survives the deletion
+        storage.update("user_1", memories[:1])
+        storage.delete("user_1", [memories[0].id])
+        storage.append("user_1", [self._memory("c", 3.0)])
+        storage.close()
+        self.assertEqual([(user, m.content) for user, m, _ in FileMemoryStorage(self.path).load()],
+                         [("user_1", "b"), ("user_2", "a"), ("user_1", "c")])
+        
+        storage = FileMemoryStorage(self.path)
+        storage.append("user_1", memories[:1])  # Stored again after its deletion
+        storage.close()
+        self.assertEqual([m.content for _, m, _ in FileMemoryStorage(self.path).load()], ["b", "a", "c", "a"])
+    
+    def test_torn_tail_is_ignored(self):
+        """Test that a partially written record at the end of the log is skipped"""
+        storage = FileMemoryStorage(self.path)
+        storage.append("user_1", [self._memory("a", 1.0), self._memory("b", 2.0)])
+        storage.close()
+        
+        segment = sorted(f for f in os.listdir(self.path) if f.startswith("wal-"))[-1]
+        with open(os.path.join(self.path, segment), "r+b") as f:
+            f.truncate(os.path.getsize(os.path.join(self.path, segment)) - 5)
+        
+        storage = FileMemoryStorage(self.path)
+        storage.append("user_1", [self._memory("c", 3.0)])
+        storage.close()
+        self.assertEqual([m.content for _, m, _ in FileMemoryStorage(self.path).load()], ["a", "c"])
+    
+    def test_snapshot_compacts_log(self):
+        """Test that a snapshot replaces older log segments and replays with the newer tail"""
+        storage = FileMemoryStorage(self.path, snapshot_min_wal_bytes=0)
+        memories = [self._memory(str(i), float(i)) for i in range(10)]
+        storage.append("user_1", memories)
+        self.assertTrue(storage.needs_snapshot())
+        
+        checkpoint = storage.checkpoint()
+        storage.append("user_1", [self._memory("after", 10.0)])
+        storage.write_snapshot([("user_1", memory, None) for memory in memories], checkpoint)
+        self.assertFalse(storage.needs_snapshot())
+        storage.close()
+        
+        files = sorted(os.listdir(self.path))
+        self.assertEqual(len([f for f in files if f.startswith("snapshot-")]), 1)
+        self.assertTrue(all(int(f[4:12]) >= checkpoint for f in files if f.startswith("wal-")))
+        contents = [m.content for _, m, _ in FileMemoryStorage(self.path).load()]
+        self.assertEqual(contents, [str(i) for i in range(10)] + ["after"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the REX Redis storage backend
+"""
+import unittest
+import sys
+import os
+from unittest import mock
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.memory_manager import MemoryManager
+from memory_system.redis_storage import RedisMemoryStorage
+from models.memory import Memory, MemoryCategory
+from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import use_stub_model
+
+use_stub_model()
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+def _redis_client():
+    """In-process fake if available, otherwise a local redis-server"""
+    if fakeredis is not None:
+        return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    import redis
+    client = redis.Redis.from_url(os.environ.get("REX_TEST_REDIS_URL", "redis://localhost:6379/15"))
+    client.ping()
+    return client
+
+class TestRedisMemoryStorage(unittest.TestCase):
+    """Test cases for the Redis storage backend"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        try:
+            self.client = _redis_client()
+        except Exception as e:
+            self.skipTest(f"No Redis available: {e}")
+        self.client.flushdb()
+    
+    def _memory(self, content, value):
+        memory = Memory(category=MemoryCategory.PEOPLE, content=content)
+        memory.embedding = np.full(8, value, dtype=np.float32)
+        return memory
+    
+    def test_append_and_load(self):
+        """Test that memories and packed embeddings round-trip in insertion order"""
+        storage = RedisMemoryStorage(client=self.client, key_prefix="test")
+        memories = [self._memory("Person: A", 1.0), self._memory("Person: B", 2.0)]
+        storage.append("user_1", memories)
+        storage.append("user_2", [self._memory("Person: C", 3.0)])
+        
+        loaded = list(RedisMemoryStorage(client=self.client, key_prefix="test", batch_size=1).load())
+        self.assertEqual([(user, m.id) for user, m, _ in loaded], [
+            ("user_1", memories[0].id), ("user_1", memories[1].id), ("user_2", loaded[2][1].id)
+        ])
+        self.assertEqual(loaded[1][1].category, MemoryCategory.PEOPLE)
+        np.testing.assert_array_equal(loaded[1][1].embedding, np.full(8, 2.0, dtype=np.float32))
+    
+    def test_poll_returns_other_workers_writes(self):
+        """Test that each worker sees the other's writes exactly once and skips its own"""
+        worker_a = RedisMemoryStorage(client=self.client, key_prefix="test")
+        worker_b = RedisMemoryStorage(client=self.client, key_prefix="test")
+        
+        worker_a.append("user_1", [self._memory("Person: A", 1.0)])
+        written_by_b = self._memory("Person: B", 2.0)
+        worker_b.append("user_1", [written_by_b])
+        
+        self.assertEqual([m.id for m in worker_a.poll("user_1")[0]], [written_by_b.id])
+        self.assertEqual(worker_a.poll("user_1"), ([], []))
+        self.assertEqual([m.content for m in worker_b.poll("user_1")[0]], ["Person: A"])
+        
+        worker_b.delete("user_1", [written_by_b.id])
+        self.assertEqual(worker_a.poll("user_1"), ([], [written_by_b.id]))
+        self.assertEqual(worker_b.poll("user_1"), ([], []))
+    
+    def test_log_is_trimmed(self):
+        """Test that long logs are trimmed and workers left behind reload the user's memories"""
+        writer = RedisMemoryStorage(client=self.client, key_prefix="test", log_max_entries=2)
+        reader = RedisMemoryStorage(client=self.client, key_prefix="test", log_max_entries=2)
+        memories = [self._memory(f"Person: {i}", float(i)) for i in range(4)]
+        writer.append("user_1", memories[:1])
+        self.assertEqual([m.id for m in reader.poll("user_1")[0]], [memories[0].id])
+        
+        writer.append("user_1", memories[1:])
+        writer.update("user_1", memories[1:2])  # The fifth entry trims the log to the last 2
+        writer.delete("user_1", [memories[0].id])
+        self.assertEqual(self.client.llen("test:user_1:log"), 3)
+        self.assertEqual(int(self.client.get("test:user_1:log_base")), 3)
+        
+        reloaded, deleted = reader.poll("user_1")
+        self.assertIsNone(deleted)
+        self.assertEqual(sorted(m.id for m in reloaded), sorted(m.id for m in memories[1:]))
+        self.assertEqual(reader.poll("user_1"), ([], []))
+        writer.append("user_1", [self._memory("Person: 4", 4.0)])
+        self.assertEqual([m.content for m in reader.poll("user_1")[0]], ["Person: 4"])
+        self.assertEqual(len(list(RedisMemoryStorage(client=self.client, key_prefix="test").load())), 4)
+    
+    def test_managers_share_deletions(self):
+        """Test that a memory removed through one manager disappears from another"""
+        config = DEFAULT_CONFIG.copy()
+        config["memory_persistence"] = dict(DEFAULT_CONFIG["memory_persistence"], enabled=True, storage_type="redis")
+        create = lambda config: RedisMemoryStorage(client=self.client, key_prefix="test", log_max_entries=2)
+        with mock.patch("memory_system.memory_manager.create_storage", create):
+            first, second = MemoryManager(config), MemoryManager(config)
+        ids = first.store_memories("user_1", [self._memory("Person: A", 1.0), self._memory("Person: B", 2.0)])
+        self.assertEqual(second.memory_ids("user_1"), ids)
+        first.remove_memories("user_1", ids[:1])
+        self.assertEqual(second.memory_ids("user_1"), ids[1:])
+        
+        # A manager that falls behind the trimmed log reloads the user
+        for i in range(3):
+            first.store_memory("user_1", self._memory(f"Person: {i}", 3.0 + i))
+        first.remove_memories("user_1", ids[1:])
+        self.assertEqual(len(second.memory_ids("user_1")), 3)
+        self.assertEqual(second.memory_ids("user_1"), first.memory_ids("user_1"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for the REX session cache
+"""
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_manager import session_cache
+from conversation_manager.session_cache import SessionCache
+
+class TestSessionCache(unittest.TestCase):
+    """Test cases for the session cache"""
+
+    def test_idle_expiry_and_lru_eviction(self):
+        """Test that idle sessions expire and the least recently used go first when full"""
+        config = {"session_cache": {"max_sessions": 2, "idle_ttl_seconds": 60}}
+        with mock.patch.object(session_cache.time, "monotonic", return_value=0.0) as clock:
+            cache = SessionCache(config)
+            a = cache.get("u", "a")
+            cache.get("u", "b")
+            self.assertIs(cache.get("u", "a"), a)  # "a" becomes most recently used
+            cache.get("u", "c")
+            self.assertIn("u:a", cache)
+            self.assertNotIn("u:b", cache)
+
+            clock.return_value = 30.0
+            cache.get("u", "a")
+            clock.return_value = 80.0
+            self.assertEqual(cache.sweep(), 1)  # "c" was idle for 80s
+            self.assertEqual(len(cache), 1)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual((stats["evicted"], stats["expired"]), (1, 1))
+
+    def test_history_is_capped(self):
+        """Test that session history keeps only the most recent max_session_history messages"""
+        cache = SessionCache({"max_session_history": 3})
+        context = cache.get("u", "s")
+        cache.set_history(context, [{"content": str(i)} for i in range(10)])
+        self.assertEqual([m["content"] for m in context["history"]], ["7", "8", "9"])
+        context["history"].append({"content": "10"})
+        self.assertEqual([m["content"] for m in context["history"]], ["8", "9", "10"])
+
+    def test_evicted_sessions_spill_and_restore(self):
+        """Test that evicted sessions are restored from the spill file, also after a restart"""
+        with tempfile.TemporaryDirectory() as directory:
+            config = {
+                "max_session_history": 5,
+                "memory_persistence": {"file_path": directory},
+                "session_cache": {"max_sessions": 1, "spill": True}
+            }
+            cache = SessionCache(config)
+            context = cache.get("u", "a")
+            cache.set_history(context, [{"content": "hello"}])
+            context["active_topics"].add("python")
+            cache.get("u", "b")  # Evicts "a"
+            self.assertNotIn("u:a", cache)
+
+            restored = cache.get("u", "a")
+            self.assertEqual(list(restored["history"]), [{"content": "hello"}])
+            self.assertEqual(restored["active_topics"], {"python"})
+            self.assertEqual(restored["history"].maxlen, 5)
+            self.assertEqual(cache.stats()["restored"], 1)
+            cache.close()
+
+            restarted = SessionCache(config)
+            self.assertEqual(list(restarted.get("u", "a")["history"]), [{"content": "hello"}])
+            restarted.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests for REX user sharding
+"""
+import unittest
+import sys
+import os
+from collections import Counter
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.shard_router import routing_user_id
+from utils.config_loader import DEFAULT_CONFIG
+from utils.sharding import shard_config, shard_for
+
+class TestSharding(unittest.TestCase):
+    """Test cases for mapping users and requests to shards"""
+
+    def test_users_spread_evenly_and_stay_put(self):
+        """Test that users spread over shards and adding a shard only moves users onto it"""
+        users = [f"user-{i}" for i in range(20000)]
+        four = {user: shard_for(user, 4) for user in users}
+        self.assertEqual(four, {user: shard_for(user, 4) for user in users})
+        for count in Counter(four.values()).values():
+            self.assertAlmostEqual(count / len(users), 0.25, delta=0.02)
+
+        moved = [user for user in users if shard_for(user, 5) != four[user]]
+        self.assertTrue(all(shard_for(user, 5) == 4 for user in moved))
+        self.assertAlmostEqual(len(moved) / len(users), 0.2, delta=0.02)
+        self.assertEqual(shard_for("anyone", 1), 0)
+        with self.assertRaises(ValueError):
+            shard_for("anyone", 0)
+
+    def test_shards_get_their_own_files(self):
+        """Test that shard configurations never share data files"""
+        config = DEFAULT_CONFIG.copy()
+        config["session_cache"] = dict(DEFAULT_CONFIG["session_cache"], spill_path="data/sessions.sqlite3")
+        first, second = shard_config(config, 0), shard_config(config, 1)
+        for section, key in [("memory_persistence", "file_path"), ("memory_persistence", "database_path"),
+                             ("memory_persistence", "redis_key_prefix"), ("vector_index", "mmap_path"),
+                             ("session_cache", "spill_path")]:
+            self.assertNotEqual(first[section][key], second[section][key])
+            self.assertNotEqual(first[section][key], config[section][key])
+        self.assertEqual(first["memory_persistence"]["database_path"], os.path.join("data", "memories.shard-0.sqlite3"))
+        self.assertIsNone(first["embedding_cache"]["persist_path"])
+        self.assertEqual(DEFAULT_CONFIG["memory_persistence"]["file_path"], "data/memories")
+
+    def test_routing_user_id(self):
+        """Test that the user id is found in the query, the path or the JSON body"""
+        self.assertEqual(routing_user_id("/api/memory/trigger", {"user_id": "u1"}), "u1")
+        self.assertEqual(routing_user_id("/api/memory/u2", {"limit": "5"}), "u2")
+        self.assertEqual(routing_user_id("/api/memory/u3/export", {}), "u3")
+        self.assertIsNone(routing_user_id("/api/memory/categories", {}))
+        self.assertIsNone(routing_user_id("/api/conversation", {}))
+        self.assertEqual(routing_user_id("/api/conversation", {}, b'{"user_id": "u4", "user_input": "hi"}'), "u4")
+        self.assertEqual(routing_user_id("/api/memory/batch", {}, b'{"user_id": "u5", "items": []}'), "u5")
+        self.assertIsNone(routing_user_id("/api/memory/batch", {}, b'not json'))
+
+if __name__ == "__main__":
+    unittest.main()
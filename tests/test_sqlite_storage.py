@@ -0,0 +1,84 @@
+"""
+Tests for the REX SQLite storage backend
+"""
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.sqlite_storage import SQLiteMemoryStorage
+from models.memory import Memory, MemoryCategory
+
+class TestSQLiteMemoryStorage(unittest.TestCase):
+    """Test cases for the SQLite storage backend"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.storage = SQLiteMemoryStorage(os.path.join(self.temp_dir.name, "memories.sqlite3"))
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        self.storage.close()
+        self.temp_dir.cleanup()
+    
+    def _memory(self, category, content, day):
+        memory = Memory(category=category, content=content, timestamp=f"2024-01-{day:02d}T12:00:00")
+        memory.embedding = np.full(8, float(day), dtype=np.float32)
+        return memory
+    
+    def test_append_and_load(self):
+        """Test that a batch round-trips with metadata and BLOB embeddings in WAL mode"""
+        memories = [
+            self._memory(MemoryCategory.PEOPLE, "Person: Ada Lovelace", 1),
+            self._memory(MemoryCategory.TOPICS, "Topic: analytical engines", 2)
+        ]
+        memories[0].metadata = {"extracted_from": "..."}
+        self.storage.append("user_1", memories)
+        
+        journal_mode = self.storage._writer.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+        
+        loaded = list(self.storage.load())
+        self.assertEqual([(user, m.id) for user, m, _ in loaded], [("user_1", m.id) for m in memories])
+        self.assertEqual(loaded[0][1].metadata, {"extracted_from": "..."})
+        np.testing.assert_array_equal(loaded[1][1].embedding, np.full(8, 2.0, dtype=np.float32))
+    
+    def test_ids_are_unique_per_user(self):
+        """Test that two users can hold the same memory id, e.g. after an import"""
+        first = self._memory(MemoryCategory.PEOPLE, "Person: Ada Lovelace", 1)
+        copy = Memory(category=first.category, content=first.content, timestamp=first.timestamp, memory_id=first.id)
+        self.storage.append("user_1", [first])
+        self.storage.append("user_2", [copy])
+        self.storage.append("user_2", [copy])  # Replayed appends are still ignored
+        self.assertEqual([(user, m.id) for user, m, _ in self.storage.load()], [("user_1", first.id), ("user_2", first.id)])
+
+        copy.metadata = {"hits": 1}
+        self.storage.update("user_2", [copy])
+        self.storage.delete("user_1", [first.id])
+        self.assertEqual([(user, m.metadata) for user, m, _ in self.storage.load()], [("user_2", {"hits": 1})])
+
+    def test_close_closes_read_connections(self):
+        """Test that the read connections opened by other threads are closed with the storage"""
+        self.storage.append("user_1", [self._memory(MemoryCategory.PEOPLE, "Person: Ada Lovelace", 1)])
+        thread = threading.Thread(target=lambda: list(self.storage.load()))
+        thread.start()
+        thread.join()
+        list(self.storage.load())
+        readers = list(self.storage._readers)
+        self.assertEqual(len(readers), 2)
+        
+        self.storage.close()
+        for connection in readers:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                connection.execute("SELECT 1")
+        self.storage = SQLiteMemoryStorage(self.storage.path)  # Closed again by tearDown
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests for the REX text processing utilities
+"""
+import unittest
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_processing import extract_entities, extract_preferences, extract_time_range, detect_memory_triggers
+
+class TestTextProcessing(unittest.TestCase):
+    """Test cases for text analysis"""
+
+    def test_topic_and_project_phrases(self):
+        """Test that every indicator yields its phrase, including indicators inside another's phrase"""
+        entities = extract_entities(
+            "We talked about data pipelines regarding Spark. "
+            "The Apollo migration project task list is due; assignment of owners next"
+        )
+        self.assertEqual(sorted(entities["topics"]), ["Spark", "data pipelines regarding Spark"])
+        self.assertEqual(sorted(entities["projects"]), [
+            " The Apollo migration", " The Apollo migration project",
+            "list is due", "of owners next", "task list is due"
+        ])
+        self.assertEqual(entities["people"], ["The Apollo"])
+
+    def test_preferences_grouped_by_indicator(self):
+        """Test that preference sentences are listed per indicator they contain"""
+        preferences = extract_preferences("I prefer tabs. I don't like spaces. We need CI. Nothing here")
+        self.assertEqual(preferences, ["I prefer tabs", "I don't like spaces", "I don't like spaces", "We need CI"])
+        self.assertEqual(extract_preferences("No opinions here"), [])
+
+    def test_large_input(self):
+        """Test that a pasted document with long unpunctuated runs is analyzed"""
+        text = "the migration project with Jane Doe about the rollout " * 2000 + ". I prefer short notes"
+        entities = extract_entities(text)
+        self.assertIn("Jane Doe", entities["people"])
+        self.assertEqual(len(entities["topics"]), 1)
+        self.assertEqual(extract_preferences(text), ["I prefer short notes"])
+        self.assertEqual(detect_memory_triggers("rex, recall the Apollo launch")["topic"], "the Apollo launch")
+
+    def test_time_ranges(self):
+        """Test that relative time phrases map to calendar windows and are removed from the text"""
+        now = datetime(2024, 3, 14, 15, 30)  # A Thursday
+        last_week = extract_time_range("what we said last week about Kafka?", now)
+        self.assertEqual((last_week["since"], last_week["until"]), (datetime(2024, 3, 4), datetime(2024, 3, 11)))
+        self.assertEqual(last_week["text"], "what we said about Kafka?")
+        self.assertEqual(extract_time_range("the launch yesterday", now)["until"], datetime(2024, 3, 14))
+        self.assertEqual(extract_time_range("budget from last month", now)["since"], datetime(2024, 2, 1))
+        self.assertEqual(extract_time_range("in the past 3 days", now)["since"], datetime(2024, 3, 11, 15, 30))
+        self.assertIsNone(extract_time_range("since last week", now)["until"])
+        self.assertEqual(extract_time_range("the latest release", now), {})
+        
+        trigger = detect_memory_triggers("REX, recall the Apollo launch this year")
+        self.assertEqual(trigger["topic"], "the Apollo launch")
+        self.assertEqual(trigger["since"].month, 1)
+
+if __name__ == "__main__":
+    unittest.main()
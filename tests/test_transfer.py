@@ -0,0 +1,105 @@
+"""
+Tests for REX memory export and import
+"""
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.memory_manager import MemoryManager
+from memory_system.transfer import MemoryImporter, export_memories
+from models.memory import Memory, MemoryCategory
+from utils.config_loader import DEFAULT_CONFIG
+from embedding_stub import use_stub_model
+
+use_stub_model()
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+class TestTransfer(unittest.TestCase):
+    """Test cases for streaming export and import"""
+
+    def setUp(self):
+        """Set up a source and a target manager"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.managers = []
+        self.source = self._manager("source")
+        self.target = self._manager("target")
+        self.user_id = "test_user_123"
+        self.source.store_memories(self.user_id, [
+            Memory(category=MemoryCategory.PEOPLE, content="Person: Jane Doe", metadata={"hit_count": 3}),
+            Memory(category=MemoryCategory.PROJECTS, content="Apollo migration project"),
+            Memory(category=MemoryCategory.TIMELINE, content="User: hi\nAI: Hello!", timestamp="2024-01-01T09:00:00"),
+        ])
+
+    def tearDown(self):
+        """Clean up test fixtures"""
+        for manager in self.managers:
+            manager.close()
+        self.temp_dir.cleanup()
+
+    def _manager(self, name: str) -> MemoryManager:
+        config = DEFAULT_CONFIG.copy()
+        config["memory_persistence"] = dict(
+            DEFAULT_CONFIG["memory_persistence"],
+            enabled=True,
+            file_path=os.path.join(self.temp_dir.name, name)
+        )
+        manager = MemoryManager(config)
+        self.managers.append(manager)
+        return manager
+
+    def _round_trip(self, fmt: str, piece_size: int) -> dict:
+        """Export from the source in small chunks and feed the target in arbitrary pieces"""
+        data = b"".join(export_memories(self.source, self.user_id, fmt, chunk_size=2))
+        importer = MemoryImporter(self.target, self.user_id, fmt, chunk_size=2)
+        for start in range(0, len(data), piece_size):
+            importer.feed(data[start:start + piece_size])
+        return importer.finish()
+
+    def _assert_same_memories(self):
+        source = self.source.indexes[self.user_id]
+        target = self.target.indexes[self.user_id]
+        self.assertEqual([m.to_dict() for m in target.memories], [m.to_dict() for m in source.memories])
+        np.testing.assert_allclose(target.vectors(0, len(target)), source.vectors(0, len(source)), atol=1e-6)
+
+    def test_ndjson_round_trip_without_reencoding(self):
+        """Test that an NDJSON export imports with ids, metadata and embeddings intact"""
+        with mock.patch.object(self.target.embedding_model, "encode", wraps=self.target.embedding_model.encode) as encode:
+            stats = self._round_trip("ndjson", piece_size=7)
+        self.assertEqual(encode.call_count, 0)
+        self.assertEqual(stats["imported"], 3)
+        self._assert_same_memories()
+
+        # Importing again changes nothing
+        stats = self._round_trip("ndjson", piece_size=1024)
+        self.assertEqual((stats["imported"], stats["skipped"]), (0, 3))
+        self.assertEqual(len(self.target.indexes[self.user_id]), 3)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow_round_trip(self):
+        """Test that an Arrow IPC export imports with ids, metadata and embeddings intact"""
+        stats = self._round_trip("arrow", piece_size=100)
+        self.assertEqual(stats["imported"], 3)
+        self.assertEqual(stats["reencoded"], 0)
+        self._assert_same_memories()
+
+    def test_other_model_is_reencoded(self):
+        """Test that embeddings from a different model are not reused"""
+        data = b"".join(export_memories(self.source, self.user_id))
+        data = data.replace(self.source.embedding_model_name.encode(), b"other-model", 1)
+        importer = MemoryImporter(self.target, self.user_id)
+        importer.feed(data)
+        stats = importer.finish()
+        self.assertEqual((stats["imported"], stats["reencoded"]), (3, 3))
+
+if __name__ == "__main__":
+    unittest.main()
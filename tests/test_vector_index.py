@@ -0,0 +1,159 @@
+"""
+Tests for the REX vector index
+"""
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_system.vector_index import VectorIndex
+from models.memory import Memory, MemoryCategory
+
+class TestVectorIndex(unittest.TestCase):
+    """Test cases for the vector index"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.rng = np.random.default_rng(42)
+        self.index = VectorIndex(initial_capacity=4)
+        self.memories = []
+        for i in range(50):
+            category = MemoryCategory.TIMELINE if i % 2 else MemoryCategory.TOPICS
+            self.memories.append(Memory(category=category, content=f"memory {i}"))
+        self.embeddings = self.rng.normal(size=(50, 16))
+        self.index.add_batch(self.memories, self.embeddings)
+    
+    def _brute_force(self, query, categories=None):
+        """Reference ranking computed one memory at a time"""
+        scored = []
+        for memory, embedding in zip(self.memories, self.embeddings):
+            if categories and memory.category not in categories:
+                continue
+            score = np.dot(query, embedding) / (np.linalg.norm(query) * np.linalg.norm(embedding))
+            scored.append((memory, score))
+        return sorted(scored, key=lambda x: x[1], reverse=True)
+    
+    def test_search_matches_brute_force(self):
+        """Test that top-k results match an exhaustive cosine ranking"""
+        query = self.rng.normal(size=16)
+        results = self.index.search(query, limit=5)
+        expected = self._brute_force(query)[:5]
+        
+        self.assertEqual(len(self.index), 50)
+        self.assertEqual([m.id for m, _ in results], [m.id for m, _ in expected])
+        for (_, score), (_, expected_score) in zip(results, expected):
+            self.assertAlmostEqual(score, expected_score, places=5)
+    
+    def test_search_respects_categories(self):
+        """Test that category filtering only returns memories from those categories"""
+        query = self.rng.normal(size=16)
+        results = self.index.search(query, limit=10, categories=[MemoryCategory.TOPICS])
+        expected = self._brute_force(query, categories=[MemoryCategory.TOPICS])[:10]
+        
+        self.assertEqual([m.id for m, _ in results], [m.id for m, _ in expected])
+        self.assertEqual(self.index.search(query, limit=10, categories=[MemoryCategory.PEOPLE]), [])
+    
+    def test_zero_embedding_and_small_limit(self):
+        """Test that zero vectors are indexed safely and limit larger than the index is handled"""
+        index = VectorIndex()
+        memory = Memory(category=MemoryCategory.TOPICS, content="empty")
+        index.add(memory, np.zeros(16))
+        
+        results = index.search(np.ones(16), limit=10)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], 0.0)
+
+    def test_ivf_search_recall(self):
+        """Test that the IVF mode finds the true nearest neighbours on clustered data"""
+        config = {"vector_index": {"type": "ivf", "ann_min_size": 200, "ivf_nlist": 8, "ivf_nprobe": 2}}
+        index = VectorIndex(config)
+        centers = self.rng.normal(size=(8, 16)) * 5
+        embeddings = np.repeat(centers, 100, axis=0) + self.rng.normal(size=(800, 16))
+        memories = [Memory(category=MemoryCategory.TIMELINE, content=f"turn {i}") for i in range(800)]
+        # Add incrementally so the index trains, then extends its clusters
+        for start in range(0, 800, 100):
+            index.add_batch(memories[start:start + 100], embeddings[start:start + 100])
+        self.assertIsNotNone(index._ann)
+        
+        hits = 0
+        for query in embeddings[::40] + self.rng.normal(size=(20, 16)) * 0.1:
+            approximate = [m.id for m, _ in index.search(query, limit=5)]
+            normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            exact = [memories[i].id for i in np.argsort(-(normalized @ query))[:5]]
+            hits += len(set(approximate) & set(exact))
+        self.assertGreaterEqual(hits / (20 * 5), 0.9)
+    
+    def test_ivf_falls_back_to_exact_search(self):
+        """Test exact search below the size threshold and for sparse categories"""
+        config = {"vector_index": {"type": "ivf", "ann_min_size": 40, "ivf_nlist": 4, "ivf_nprobe": 1}}
+        index = VectorIndex(config)
+        index.add_batch(self.memories[:30], self.embeddings[:30])
+        self.assertIsNone(index._ann)
+        
+        index.add_batch(self.memories[30:], self.embeddings[30:])
+        self.assertIsNotNone(index._ann)
+        
+        # A category with fewer matches in the probed cluster than the limit is searched exactly
+        query = self.rng.normal(size=16)
+        results = index.search(query, limit=25, categories=[MemoryCategory.TOPICS])
+        expected = self._brute_force(query, categories=[MemoryCategory.TOPICS])[:25]
+        self.assertEqual([m.id for m, _ in results], [m.id for m, _ in expected])
+
+    def test_mapped_storage_is_adopted_on_reopen(self):
+        """Test that a memory-mapped index can be reopened and its rows adopted without copying"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "embeddings", "user.f32")
+            index = VectorIndex(path=path, initial_capacity=4)
+            index.add_batch(self.memories, self.embeddings)
+            index.flush()
+            query = self.rng.normal(size=16)
+            expected = [m.id for m, _ in index.search(query, limit=5)]
+            
+            reopened = VectorIndex(path=path)
+            copies = [Memory(category=m.category, content=m.content, memory_id=m.id) for m in self.memories]
+            self.assertFalse(reopened.adopt(copies, range(1, 51)))  # Rows must continue the index
+            self.assertTrue(reopened.adopt(copies, range(50)))
+            
+            self.assertEqual([m.id for m, _ in reopened.search(query, limit=5)], expected)
+            self.assertEqual(copies[3].embedding_row, 3)
+            self.assertIsInstance(copies[3].embedding.base, np.memmap)
+            np.testing.assert_allclose(
+                copies[3].embedding,
+                self.embeddings[3] / np.linalg.norm(self.embeddings[3]),
+                rtol=1e-5
+            )
+
+    def test_quantized_scoring_with_exact_rescoring(self):
+        """Test that int8 candidates rescored against mapped float32 rows give exact results"""
+        with tempfile.TemporaryDirectory() as directory:
+            config = {"vector_index": {"quantization": "int8", "rescore_multiplier": 4}}
+            index = VectorIndex(config, path=os.path.join(directory, "user.f32"))
+            index.add_batch(self.memories, self.embeddings)
+            
+            for query in self.rng.normal(size=(10, 16)):
+                results = index.search(query, limit=5, categories=[MemoryCategory.TOPICS])
+                expected = self._brute_force(query, categories=[MemoryCategory.TOPICS])[:5]
+                self.assertEqual([m.id for m, _ in results], [m.id for m, _ in expected])
+                self.assertAlmostEqual(results[0][1], expected[0][1], places=5)
+    
+    def test_quantized_rows_replace_float32_in_memory(self):
+        """Test that without mapped storage only the compressed rows are kept"""
+        for quantization, tolerance in (("float16", 1e-3), ("int8", 1e-2)):
+            index = VectorIndex({"vector_index": {"quantization": quantization}}, initial_capacity=64)
+            index.add_batch(self.memories, self.embeddings)
+            self.assertIsNone(index._matrix)
+            self.assertEqual(index._codes.array.nbytes, 64 * 16 * (2 if quantization == "float16" else 1))
+            self.assertEqual(index.memory_usage()["resident"], index._codes.nbytes + 64)
+            
+            # Memories read their (dequantized) embedding from the compressed matrix
+            normalized = self.embeddings[7] / np.linalg.norm(self.embeddings[7])
+            np.testing.assert_allclose(self.memories[7].embedding, normalized, atol=tolerance)
+            query = self.rng.normal(size=16)
+            self.assertEqual(index.search(query, limit=1)[0][0].id, self._brute_force(query)[0][0].id)
+
+if __name__ == "__main__":
+    unittest.main()
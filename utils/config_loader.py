@@ -10,16 +10,108 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Path of a JSON configuration file read by every entry point (app.py, the shard router, the memory service)
+CONFIG_ENV = "REX_CONFIG"
+
 DEFAULT_CONFIG = {
     "memory_recall_limit": 5,
     "context_memory_limit": 3,
     "embedding_model": "all-MiniLM-L6-v2",
+    "embedding_batch_size": 64,  # Maximum number of texts per model call
+    "embedding_cache": {
+        "enabled": True,
+        "max_entries": 50000,  # Embeddings kept in memory (least recently used are evicted)
+        "persist_path": None  # Optional SQLite file so cached embeddings survive restarts
+    },
+    "memory_dedup": {
+        "enabled": True,  # Repeated memories update hit_count/last_seen instead of being stored again
+        "exclude_categories": ["timeline"]  # Categories where every entry is kept
+    },
     "memory_threshold": 0.7,  # Similarity threshold for memory retrieval
     "max_session_history": 100,  # Maximum number of messages to keep in session history
-    "memory_persistence": {
+    "session_cache": {
+        "max_sessions": 10000,  # Active sessions kept in memory (least recently used are evicted)
+        "idle_ttl_seconds": 3600,  # Sessions idle for longer are evicted
+        "spill": False,  # Write evicted sessions to disk and restore them when they return
+        "spill_path": None,  # SQLite file for spilled sessions (default: sessions.sqlite3 next to the memories)
+        "spill_max_age_seconds": 7 * 24 * 3600  # Spilled sessions older than this are dropped at startup
+    },
+    "vector_index": {
+        "type": "exact",  # Options: exact, ivf (approximate, for very large stores)
+        "storage": "memory",  # Options: memory, mmap (per-user embedding files shared via the page cache)
+        "mmap_path": "data/embeddings",
+        "ann_min_size": 10000,  # Users with fewer memories are always searched exactly
+        "ivf_nlist": 0,  # Number of IVF clusters (0 = square root of the index size)
+        "ivf_nprobe": 8,  # Clusters scanned per query; higher improves recall, lowers speed
+        "ivf_retrain_growth": 2.0,  # Retrain clusters when the index grows by this factor
+        "quantization": "none",  # Options: none, float16, int8 (compressed copy used for scoring)
+        "rescore_multiplier": 4  # Exactly rescore limit * multiplier candidates (needs mmap storage)
+    },
+    "executor": {
+        "max_workers": 4,  # Threads running retrieval and inference for the async endpoints
+        "max_pending": 64,  # Queued calls beyond the running ones before requests get 503
+        "inference": "thread",  # Options: thread (model runs in the calling thread), process
+        "inference_workers": 2  # Model worker processes when inference is "process"
+    },
+    "ingestion": {
+        "enabled": True,  # Store conversation memories in the background instead of before responding
+        "max_queue": 1000,  # Queued submissions before callers block
+        "workers": 1,
+        "batch_size": 64,  # Memories encoded per model call
+        "batch_wait_ms": 5,  # How long a worker waits for more memories to fill a batch
+        "max_batch_items": 1000  # Items accepted per POST /api/memory/batch request
+    },
+    "retrieval": {
+        "mode": "hybrid",  # Options: hybrid (BM25 + vector, fused by reciprocal rank), vector
+        "candidate_multiplier": 4,  # Each ranking contributes limit * multiplier candidates to the fusion
+        "rrf_k": 60,  # Reciprocal rank fusion offset
+        "keyword_fast_path": True,  # Skip the query encode when keyword matching is conclusive
+        "keyword_min_coverage": 1.0,  # Fraction of query keywords the best match must contain for the fast path
+        "bm25_k1": 1.2,
+        "bm25_b": 0.75
+    },
+    "retention": {
+        "enabled": False,  # Opt in: the compaction job deletes and rolls up stored memories (see README)
+        "interval_seconds": 3600,
+        "timeline_rollup_after_days": 7,  # Older conversation turns are replaced by one digest memory per session
+        "recall_event_max_age_hours": 24,  # Memory recall events are dropped after this
+        "digest_max_chars": 2000,
+        "rules": {  # Per category: max_age_days and/or max_count (the newest are kept)
+            "timeline": {"max_count": 20000}
+        }
+    },
+    "retrieval_cache": {
         "enabled": True,
+        "max_entries": 10000  # Retrieval results kept until the user's memories change (least recently used are evicted)
+    },
+    "memory_service": {  # Shared store for API workers (python -m memory_system.memory_service)
+        "enabled": False,  # Workers use the service instead of their own store (also enabled by setting REX_MEMORY_SERVICE to its socket)
+        "socket_path": "data/memory.sock",
+        "pool_size": 8,  # Connections per worker
+        "timeout_seconds": 30
+    },
+    "sharding": {  # Sharded deployment (python -m api.shard_router); python app.py runs a single process
+        "shards": 0,  # Shard processes users are hashed to (0 = one per CPU core)
+        "socket_dir": "data/shards",  # Unix sockets the router forwards to
+        "host": "0.0.0.0",  # Router address
+        "port": 8000,
+        "request_timeout_seconds": 300,  # Longest forwarded request (e.g. a large import)
+        "start_timeout_seconds": 120  # How long the router waits for shards to listen at startup
+    },
+    "memory_persistence": {
+        "enabled": False,  # Off by default so runs and tests don't write under data/
         "storage_type": "file",  # Options: file, redis, database
-        "file_path": "data/memories"
+        "file_path": "data/memories",
+        "fsync": "interval",  # Options: always (group commit per write), interval, never
+        "fsync_interval_ms": 50,  # Background fsync period in interval mode
+        "snapshot_min_wal_bytes": 8 * 1024 * 1024,  # Never snapshot a smaller log
+        "snapshot_wal_ratio": 0.5,  # Snapshot once the log exceeds this fraction of the snapshot
+        "redis_url": "redis://localhost:6379/0",  # Used by the redis storage type
+        "redis_key_prefix": "rex",
+        "redis_max_connections": 16,
+        "redis_log_max_entries": 10000,  # Change log entries kept per user; workers further behind reload the user
+        "database_path": "data/memories.sqlite3",  # Used by the database (SQLite) storage type
+        "database_synchronous": "NORMAL"  # SQLite synchronous pragma (NORMAL or FULL)
     }
 }
 
@@ -27,20 +119,27 @@ def load_config(config_path: str = None) -> Dict[str, Any]:
     """
     Load configuration from file or use defaults
     
+    Sections of the file are merged into the default sections, so a file only
+    needs the settings it changes, e.g. {"retention": {"enabled": true}}
+    
     Args:
-        config_path: Path to configuration file (optional)
+        config_path: Path to configuration file (optional, defaults to $REX_CONFIG)
         
     Returns:
         Configuration dictionary
     """
     config = DEFAULT_CONFIG.copy()
+    config_path = config_path or os.environ.get(CONFIG_ENV)
     
     if config_path and os.path.exists(config_path):
         try:
             with open(config_path, 'r') as f:
                 user_config = json.load(f)
                 # Update default config with user settings
-                config.update(user_config)
+                for key, value in user_config.items():
+                    if isinstance(value, dict) and isinstance(config.get(key), dict):
+                        value = dict(config[key], **value)
+                    config[key] = value
             logger.info(f"Loaded configuration from {config_path}")
         except Exception as e:
             logger.error(f"Error loading configuration from {config_path}: {str(e)}")
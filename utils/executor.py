@@ -0,0 +1,123 @@
+"""
+Executors for REX
+Runs model inference and retrieval off the asyncio event loop
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+import asyncio
+import functools
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ExecutorBusyError(Exception):
+    """Raised when the executor's queue is full; the request should be retried later"""
+
+class ComputeExecutor:
+    """
+    Bounded pool for blocking work started from async endpoints
+    Memory retrieval and model calls are synchronous (numpy and torch release the
+    GIL while they compute), so endpoints await them here instead of running them
+    on the event loop. At most max_workers calls run at once and at most
+    max_pending more wait in the queue; beyond that calls are rejected so a burst
+    of slow requests can't push every other request's latency up behind it
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the pool
+
+        Args:
+            config: Application configuration; reads the "executor" section
+        """
+        executor_config = config.get("executor", {})
+        self.max_workers = executor_config.get("max_workers", 4)
+        self.max_pending = executor_config.get("max_pending", 64)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rex-compute")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking function in the pool and wait for its result
+
+        Raises:
+            ExecutorBusyError: If max_workers + max_pending calls are already in flight
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                raise ExecutorBusyError(f"{self._in_flight} calls already in flight")
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        """Wait for running calls and stop the worker threads"""
+        self._pool.shutdown(wait=True)
+
+# Model loaded by each encoder process
+_worker_model = None
+
+def _init_encoder(model_name: str, batch_size: int) -> None:
+    """Encoder process initializer: load and warm up the embedding model once per process"""
+    global _worker_model
+    from memory_system import model_registry
+    model_registry.warm_up(model_name, batch_size)
+    _worker_model = model_registry.get_embedding_model(model_name)
+
+def _encode(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+class EncoderPool:
+    """
+    Process pool for embedding model inference
+    Each worker process holds its own copy of the model, so encodes from
+    different requests run in parallel even where the model itself holds the GIL
+    """
+
+    def __init__(self, model_name: str, workers: int = 2, batch_size: int = 64):
+        """
+        Create the pool; worker processes start on first use or warm_up()
+
+        Args:
+            model_name: SentenceTransformer model loaded by every worker
+            workers: Number of worker processes
+            batch_size: Batch size for the workers' warm-up batch
+        """
+        self.model_name = model_name
+        self.workers = workers
+        self.ready = False
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_encoder, initargs=(model_name, batch_size))
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Encode texts in a worker process (blocks the calling thread, not the others)"""
+        return self._pool.submit(_encode, texts, batch_size).result()
+
+    def warm_up(self) -> None:
+        """Start the worker processes; each one warms up its model as it starts"""
+        # Concurrent submissions make the pool start one process per pending call
+        futures = [self._pool.submit(len, ()) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+        self.ready = True
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        self._pool.shutdown(wait=True)
+
+def create_encoder_pool(config: Dict[str, Any]) -> Optional[EncoderPool]:
+    """Create the encoder process pool if the configuration asks for one"""
+    executor_config = config.get("executor", {})
+    if executor_config.get("inference", "thread") != "process":
+        return None
+    return EncoderPool(
+        config.get("embedding_model", "all-MiniLM-L6-v2"),
+        workers=executor_config.get("inference_workers", 2),
+        batch_size=config.get("embedding_batch_size", 64)
+    )
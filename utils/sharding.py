@@ -0,0 +1,95 @@
+"""
+Sharding helpers for REX
+Maps users to shard processes and gives every shard its own data files
+"""
+from typing import Dict, Any, Optional
+import copy
+import hashlib
+import os
+
+# Set by the shard supervisor (api/shard_router.py) in each shard process
+SHARD_ENV = "REX_SHARD"
+
+def shard_for(user_id: str, shards: int) -> int:
+    """
+    Shard that owns a user's memories
+
+    Jump consistent hash of a stable digest of the user id (Python's hash() is
+    salted per process), so growing from N to N+1 shards only moves the users
+    that land on the new shard, about 1/(N+1) of them
+
+    Args:
+        user_id: Unique identifier for the user
+        shards: Number of shards
+
+    Returns:
+        Shard number in [0, shards)
+    """
+    if shards < 1:
+        raise ValueError(f"Number of shards must be positive, got {shards}")
+    key = int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "little")
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def count_shards(config: Dict[str, Any]) -> int:
+    """Number of shards configured in the "sharding" section (0 means one per CPU core)"""
+    shards = config.get("sharding", {}).get("shards", 0)
+    return shards if shards > 0 else (os.cpu_count() or 1)
+
+def socket_path(config: Dict[str, Any], shard: int) -> str:
+    """Unix socket a shard listens on"""
+    socket_dir = config.get("sharding", {}).get("socket_dir", "data/shards")
+    return os.path.join(socket_dir, f"shard-{shard}.sock")
+
+def current_shard() -> Optional[int]:
+    """Shard number of this process, or None outside a sharded deployment"""
+    shard = os.environ.get(SHARD_ENV)
+    return int(shard) if shard else None
+
+def shard_config(config: Dict[str, Any], shard: int) -> Dict[str, Any]:
+    """
+    Configuration for one shard process
+
+    The same settings with the shard's own memory log, database, Redis keys,
+    embedding files and caches, so shards never write to each other's files.
+    Users keep their shard as long as the number of shards stays the same.
+    After changing it, the router sends each moved user (shard_for differs
+    between the old and new counts) to a shard that has none of their
+    memories, so exporting through the router returns nothing. Export a moved
+    user straight from the old shard's socket, e.g.
+    curl --unix-socket data/shards/shard-1.sock http://rex-shard/api/memory/USER/export,
+    and POST that to /api/memory/USER/import on the router, which forwards it
+    to the new shard. The old shard keeps an unreachable copy.
+
+    Args:
+        config: Application configuration
+        shard: Shard number
+
+    Returns:
+        A new configuration dictionary (config is not modified)
+    """
+    config = copy.deepcopy(config)
+    name = f"shard-{shard}"
+
+    persistence_config = config.setdefault("memory_persistence", {})
+    persistence_config["file_path"] = os.path.join(persistence_config.get("file_path", "data/memories"), name)
+    persistence_config["database_path"] = _add_suffix(persistence_config.get("database_path", "data/memories.sqlite3"), name)
+    persistence_config["redis_key_prefix"] = f"{persistence_config.get('redis_key_prefix', 'rex')}:{name}"
+
+    index_config = config.setdefault("vector_index", {})
+    index_config["mmap_path"] = os.path.join(index_config.get("mmap_path", "data/embeddings"), name)
+
+    for section, key in (("embedding_cache", "persist_path"), ("session_cache", "spill_path")):
+        path = config.get(section, {}).get(key)
+        if path:
+            config[section][key] = _add_suffix(path, name)
+    return config
+
+def _add_suffix(path: str, name: str) -> str:
+    """data/memories.sqlite3 -> data/memories.shard-0.sqlite3"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{name}{extension}"
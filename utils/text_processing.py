@@ -2,12 +2,89 @@
 Text processing utilities for REX
 Provides functions for entity extraction, keyword analysis, and memory trigger detection
 """
+import bisect
 import re
-from typing import Dict, List, Any, Set
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Set
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Patterns are compiled once at import; every scan below is a single linear pass
+
+# Simple person detection (names with capital letters)
+_NAME_PATTERN = re.compile(r'\b[A-Z][a-z]+ [A-Z][a-z]+\b')
+
+# Simple thing detection (products, technologies)
+_TECH_PATTERN = re.compile(r'\b[A-Z][a-zA-Z0-9]+(\.js|\.py|\.NET)?\b')
+
+# Topic and project phrases never cross characters outside this class, so each
+# maximal run of it is analyzed on its own
+_PHRASE_RUN = re.compile(r'[A-Za-z0-9 ]+', re.IGNORECASE)
+
+TOPIC_INDICATORS = ["about", "regarding", "concerning", "on the topic of"]
+PROJECT_INDICATORS = ["project", "initiative", "task", "assignment"]
+
+# Every occurrence of every indicator (the lookahead also reports overlapping ones);
+# each indicator has its own group so the match tells which one it was
+_INDICATORS = TOPIC_INDICATORS + PROJECT_INDICATORS
+_INDICATOR_PATTERN = re.compile(
+    "(?=(?:" + "|".join(f"({re.escape(i)})" for i in _INDICATORS) + "))",
+    re.IGNORECASE
+)
+
+PREFERENCE_INDICATORS = ["prefer", "like", "don't like", "dislike", "want", "need", "require", "must have"]
+_PREFERENCE_PATTERN = re.compile("(?=(" + "|".join(re.escape(i) for i in PREFERENCE_INDICATORS) + "))")
+
+MEMORY_TRIGGER_PATTERN = re.compile(r"REX,\s+(recall|remember|what did we say about|update on)\s+(.+)", re.IGNORECASE)
+
+_WORD_PATTERN = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# Relative time phrases ("yesterday", "last week", "in the past 3 days"), with a leading preposition
+_TIME_RANGE_PATTERN = re.compile(
+    r"\b(?:(?P<preposition>from|in|during|over|since)\s+(?:the\s+)?)?"
+    r"(?:(?P<day>today|yesterday)"
+    r"|(?P<which>this|last)\s+(?P<period>week|month|year)"
+    r"|(?:last|past)\s+(?P<count>\d+)\s+(?P<unit>hour|day|week)s?)\b",
+    re.IGNORECASE
+)
+
+def _indicator_phrases(text: str) -> Dict[str, List[str]]:
+    """
+    Find topic and project phrases in one scan over all indicators
+
+    Equivalent to running "{indicator} (phrase)" for every indicator and
+    "(phrase) {indicator}" for every project indicator, where a phrase is a run
+    of letters, digits and spaces. Within one run, the first case yields the
+    rest of the run after the first "indicator " and the second yields the run
+    up to the last " indicator", so one occurrence list per run is enough.
+    """
+    topics: List[str] = []
+    projects: List[str] = []
+    occurrences = [(m.start(), m.lastindex - 1) for m in _INDICATOR_PATTERN.finditer(text)]
+    if not occurrences:
+        return {"topics": topics, "projects": projects}
+
+    position = 0
+    for run in _PHRASE_RUN.finditer(text):
+        run_start, run_end = run.span()
+        while position < len(occurrences) and occurrences[position][0] < run_start:
+            position += 1
+        first: Dict[int, str] = {}  # indicator -> phrase after its first occurrence
+        last: Dict[int, str] = {}  # project indicator -> phrase before its last occurrence
+        while position < len(occurrences) and occurrences[position][0] < run_end:
+            start, indicator = occurrences[position]
+            end = start + len(_INDICATORS[indicator])
+            if indicator not in first and end + 1 < run_end and text[end] == " ":
+                first[indicator] = text[end + 1:run_end]
+            if indicator >= len(TOPIC_INDICATORS) and start - 1 > run_start and text[start - 1] == " ":
+                last[indicator] = text[run_start:start - 1]
+            position += 1
+        for indicator, phrase in first.items():
+            (topics if indicator < len(TOPIC_INDICATORS) else projects).append(phrase)
+        projects.extend(last.values())
+    return {"topics": topics, "projects": projects}
+
 def extract_entities(text: str) -> Dict[str, List[str]]:
     """
     Extract named entities from text
@@ -20,48 +97,67 @@ def extract_entities(text: str) -> Dict[str, List[str]]:
     """
     # In a production system, this would use a proper NER model
     # For this implementation, we'll use simple pattern matching
-    
+    phrases = _indicator_phrases(text)
     entities = {
-        "people": [],
-        "topics": [],
-        "things": [],
-        "projects": []
+        "people": _NAME_PATTERN.findall(text),
+        "topics": phrases["topics"],
+        "things": _TECH_PATTERN.findall(text),
+        "projects": phrases["projects"]
     }
     
-    # Simple person detection (names with capital letters)
-    name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-    potential_names = re.findall(name_pattern, text)
-    entities["people"].extend(potential_names)
-    
-    # Simple topic detection (look for common topic indicators)
-    topic_indicators = ["about", "regarding", "concerning", "on the topic of"]
-    for indicator in topic_indicators:
-        pattern = f"{indicator} ([A-Za-z0-9 ]+)"
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["topics"].extend(matches)
-    
-    # Simple project detection (look for project indicators)
-    project_indicators = ["project", "initiative", "task", "assignment"]
-    for indicator in project_indicators:
-        pattern = f"([A-Za-z0-9 ]+) {indicator}"
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["projects"].extend(matches)
-        
-        pattern = f"{indicator} ([A-Za-z0-9 ]+)"
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        entities["projects"].extend(matches)
-    
-    # Simple thing detection (products, technologies)
-    tech_pattern = r'\b[A-Z][a-zA-Z0-9]+(\.js|\.py|\.NET)?\b'
-    potential_tech = re.findall(tech_pattern, text)
-    entities["things"].extend(potential_tech)
-    
     # Remove duplicates
     for category in entities:
         entities[category] = list(set(entities[category]))
     
     return entities
 
+def extract_preferences(text: str) -> List[str]:
+    """
+    Extract sentences stating user preferences
+    
+    Args:
+        text: Input text to extract preferences from
+        
+    Returns:
+        Sentences containing a preference indicator, grouped by indicator in
+        PREFERENCE_INDICATORS order (a sentence is listed once per indicator it contains)
+    """
+    # Simple keyword-based preference extraction
+    # In a production system, this would use more sophisticated NLP
+    lowered = text.lower()
+    hits: Dict[str, List[int]] = {}  # indicator -> sentences containing it
+    
+    # Segment sentences once and find every indicator in one scan
+    sentences = text.split('.')
+    boundaries = []
+    offset = 0
+    for sentence in lowered.split('.'):
+        offset += len(sentence) + 1
+        boundaries.append(offset)
+    for match in _PREFERENCE_PATTERN.finditer(lowered):
+        sentence_index = bisect.bisect_right(boundaries, match.start())
+        rows = hits.setdefault(match.group(1), [])
+        if not rows or rows[-1] != sentence_index:
+            rows.append(sentence_index)
+    
+    return [sentences[i].strip() for indicator in PREFERENCE_INDICATORS for i in hits.get(indicator, [])]
+
+# Common stopwords ignored by keyword extraction and the keyword index
+STOPWORDS = {"the", "and", "is", "in", "to", "a", "of", "for", "with", "on", "at", "from", "by", "about", "as"}
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase keyword terms (words of 3+ letters, stopwords removed)
+    
+    Args:
+        text: Input text to tokenize
+        
+    Returns:
+        Terms in order of appearance, including repeats
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    return [word for word in words if word not in STOPWORDS]
+
 def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     """
     Extract important keywords from text
@@ -75,13 +171,7 @@ def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     """
     # In a production system, this would use a proper keyword extraction algorithm
     # For this implementation, we'll use simple frequency-based extraction
-    
-    # Tokenize and clean text
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    
-    # Remove common stopwords
-    stopwords = {"the", "and", "is", "in", "to", "a", "of", "for", "with", "on", "at", "from", "by", "about", "as"}
-    filtered_words = [word for word in words if word not in stopwords]
+    filtered_words = tokenize(text)
     
     # Count word frequencies
     word_counts = {}
@@ -94,6 +184,59 @@ def extract_keywords(text: str, max_keywords: int = 10) -> List[str]:
     # Return top keywords
     return [word for word, count in sorted_words[:max_keywords]]
 
+def extract_time_range(text: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Detect a relative time phrase such as "yesterday" or "last week"
+    
+    Calendar periods are whole days, weeks (starting Monday), months or years;
+    "last N days" style phrases count back from now.
+    
+    Args:
+        text: Input text to analyze
+        now: Reference time (defaults to the current local time)
+        
+    Returns:
+        Dictionary with since, until (datetime or None, until exclusive), the
+        matched phrase and the text without it; empty dict if there is no phrase
+    """
+    match = _TIME_RANGE_PATTERN.search(text)
+    if not match:
+        return {}
+    
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    until = None
+    if match.group("day"):
+        since = today
+        if match.group("day").lower() == "yesterday":
+            since, until = today - timedelta(days=1), today
+    elif match.group("period"):
+        period = match.group("period").lower()
+        if period == "week":
+            since = today - timedelta(days=today.weekday())
+            previous = since - timedelta(days=7)
+        elif period == "month":
+            since = today.replace(day=1)
+            previous = (since - timedelta(days=1)).replace(day=1)
+        else:
+            since = today.replace(month=1, day=1)
+            previous = since.replace(year=since.year - 1)
+        if match.group("which").lower() == "last":
+            since, until = previous, since
+    else:
+        since = now - timedelta(**{match.group("unit").lower() + "s": int(match.group("count"))})
+    
+    if (match.group("preposition") or "").lower() == "since":
+        until = None  # "since last week" runs up to now
+    
+    remainder = text[:match.start()] + text[match.end():]
+    return {
+        "since": since,
+        "until": until,
+        "phrase": match.group(0),
+        "text": re.sub(r"\s+([?.!,])", r"\1", " ".join(remainder.split()))
+    }
+
 def detect_memory_triggers(text: str) -> Dict[str, Any]:
     """
     Detect memory trigger phrases in text
@@ -105,17 +248,22 @@ def detect_memory_triggers(text: str) -> Dict[str, Any]:
         Dictionary with trigger information if found, empty dict otherwise
     """
     # Check for REX memory triggers
-    trigger_pattern = r"REX,\s+(recall|remember|what did we say about|update on)\s+(.+)"
-    match = re.search(trigger_pattern, text, re.IGNORECASE)
+    match = MEMORY_TRIGGER_PATTERN.search(text)
     
     if match:
         trigger_type = match.group(1).lower()
         topic = match.group(2).strip()
         
-        return {
+        trigger = {
             "trigger_type": trigger_type,
             "topic": topic,
             "full_trigger": match.group(0)
         }
+        
+        # A time phrase in the topic becomes a since/until filter
+        time_range = extract_time_range(topic)
+        if time_range:
+            trigger.update(topic=time_range["text"], since=time_range["since"], until=time_range["until"])
+        return trigger
     
     return {}